@@ -1,29 +1,20 @@
 import pytest
-import yaml
-import glob
+from batch_export_tests.metadata_loader import load_metadata
 
-def read_yaml_file(filename):
-    with open(filename, 'r') as f:
-        try:
-            return yaml.safe_load(f)
-        except yaml.YAMLError as exc:
-            print(exc)
-            return None
+# Loaded once per run; only files whose content changed since the last run are
+# read as YAML, the cached rows of the others are validated again (see metadata_loader.py)
+@pytest.fixture(scope="session")
+def file_exports():
+    return load_metadata("terraform/metadata/file_exports/*.yml", "file_exports")
+
+@pytest.fixture(scope="session")
+def kafka_exports():
+    return load_metadata("terraform/metadata/kafka_exports/*.yml", "kafka_exports")
 
 @pytest.fixture
-def file_exports_metadata():
-    files = glob.glob("terraform/metadata/file_exports/*.yml")
-    all_metadata = []
-    for yaml_data in [read_yaml_file(f) for f in files]:
-        for integration in yaml_data["files_batch"]:
-            all_metadata.append(integration)
-    return all_metadata
+def file_exports_metadata(file_exports):
+    return file_exports.raw
 
 @pytest.fixture
-def kafka_metadata():
-    files = glob.glob("terraform/metadata/kafka_exports/*.yml")
-    all_metadata = []
-    for yaml_data in [read_yaml_file(f) for f in files]:
-        for integration in yaml_data["kafka_batch"]:
-            all_metadata.append(integration)
-    return all_metadata
\ No newline at end of file
+def kafka_metadata(kafka_exports):
+    return kafka_exports.raw
@@ -0,0 +1,139 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Union
+
+import pyarrow as pa
+
+from batch_export_tests.metadata_models import (
+    FileExportsMetadata, KafkaMetadata, SourceFilesExports, SourceKafka,
+)
+
+# Upper bound on streams read at the same time, whatever the session returns
+MAX_READ_WORKERS = 8
+# Record batches buffered between the stream readers and the consumer
+BATCH_QUEUE_SIZE = 16
+
+_DONE = object()
+
+
+class ExportReader:
+    """
+    Reads the source table of a batch export through the BigQuery Storage
+    Read API and yields Arrow record batches as they arrive.
+
+    The session asks for ``requested_streams`` streams (0 lets BigQuery
+    decide), with ``column_list`` and ``row_filter`` pushed down so only the
+    exported columns and rows leave BigQuery. All streams are read at once;
+    a bounded queue between them and the consumer keeps memory flat however
+    large the table is.
+    """
+
+    def __init__(
+        self,
+        source: Union[SourceFilesExports, SourceKafka],
+        project_id: Optional[str] = None,
+        client=None,
+        max_workers: int = MAX_READ_WORKERS,
+        queue_size: int = BATCH_QUEUE_SIZE,
+    ):
+        self.source = source
+        self.project_id = project_id or getattr(source, "project_id", None)
+        if not self.project_id:
+            raise ValueError("A project_id is needed to read this source.")
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._client = client
+        self.session = None
+
+    @classmethod
+    def from_metadata(
+        cls, metadata: Union[FileExportsMetadata, KafkaMetadata], project_id: Optional[str] = None, **kwargs
+    ) -> "ExportReader":
+        return cls(metadata.source, project_id=project_id, **kwargs)
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google.cloud.bigquery_storage import BigQueryReadClient
+            self._client = BigQueryReadClient()
+        return self._client
+
+    @property
+    def table_path(self) -> str:
+        return "projects/{}/datasets/{}/tables/{}".format(self.project_id, self.source.dataset, self.source.table)
+
+    def session_request(self) -> dict:
+        read_options = {}
+        if self.source.column_list:
+            read_options["selected_fields"] = list(self.source.column_list)
+        if self.source.row_filter:
+            read_options["row_restriction"] = self.source.row_filter
+        return {
+            "parent": "projects/{}".format(self.project_id),
+            "read_session": {"table": self.table_path, "data_format": "ARROW", "read_options": read_options},
+            "max_stream_count": self.source.requested_streams or 0,
+        }
+
+    def create_session(self):
+        self.session = self.client.create_read_session(request=self.session_request())
+        return self.session
+
+    def schema(self) -> pa.Schema:
+        session = self.session or self.create_session()
+        return pa.ipc.read_schema(pa.py_buffer(session.arrow_schema.serialized_schema))
+
+    def read_batches(self) -> Iterator[pa.RecordBatch]:
+        """Record batches of every stream, in arrival order; stops the readers when closed early."""
+        session = self.session or self.create_session()
+        streams = [stream.name for stream in session.streams]
+        if not streams:
+            return
+        schema = self.schema()
+        batches = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read_stream(name: str) -> None:
+            try:
+                for response in self.client.read_rows(name):
+                    if not response.row_count:
+                        continue
+                    batch = pa.ipc.read_record_batch(
+                        pa.py_buffer(response.arrow_record_batch.serialized_record_batch), schema
+                    )
+                    if not put(batch):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(_DONE)
+
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(streams)), thread_name_prefix="export-read")
+        try:
+            for name in streams:
+                pool.submit(read_stream, name)
+            remaining = len(streams)
+            while remaining:
+                item = batches.get()
+                if item is _DONE:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def read_table(self) -> pa.Table:
+        """The whole result as one table; only for sources known to fit in memory."""
+        return pa.Table.from_batches(list(self.read_batches()), schema=self.schema())
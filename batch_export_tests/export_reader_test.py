@@ -0,0 +1,94 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pytest
+
+from batch_export_tests.export_reader import ExportReader
+from batch_export_tests.metadata_models import SourceFilesExports, SourceKafka
+
+
+class FakeReadClient:
+    """Serves a pyarrow table the way the BigQuery Storage Read API does: schema, then batches per stream."""
+
+    def __init__(self, table: pa.Table, batch_rows: int = 10, delay: float = 0.0, fail_stream: int = None):
+        self.table = table
+        self.batch_rows = batch_rows
+        self.delay = delay
+        self.fail_stream = fail_stream
+        self.requests = []
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def create_read_session(self, request):
+        self.requests.append(request)
+        options = request["read_session"]["read_options"]
+        table = self.table.select(options["selected_fields"]) if "selected_fields" in options else self.table
+        count = request["max_stream_count"] or 1
+        size = -(-table.num_rows // count)
+        self.slices = {f"stream-{i}": table.slice(i * size, size) for i in range(count)}
+        return SimpleNamespace(
+            streams=[SimpleNamespace(name=name) for name in self.slices],
+            arrow_schema=SimpleNamespace(serialized_schema=table.schema.serialize().to_pybytes()),
+        )
+
+    def read_rows(self, name):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            for i, batch in enumerate(self.slices[name].to_batches(max_chunksize=self.batch_rows)):
+                if self.fail_stream is not None and name == f"stream-{self.fail_stream}" and i == 1:
+                    raise RuntimeError("stream reset")
+                time.sleep(self.delay)
+                yield SimpleNamespace(
+                    row_count=batch.num_rows,
+                    arrow_record_batch=SimpleNamespace(serialized_record_batch=batch.serialize().to_pybytes()),
+                )
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def orders(rows: int = 100) -> pa.Table:
+    return pa.table({"id": list(range(rows)), "store": [f"s{i % 7}" for i in range(rows)], "qty": [i % 3 for i in range(rows)]})
+
+
+def test_reads_all_streams_concurrently_with_pushdown():
+    client = FakeReadClient(orders(), delay=0.005)
+    source = SourceFilesExports(
+        project_id="p", dataset="d", table="orders", requested_streams=4,
+        column_list=["id", "store"], row_filter="qty > 0",
+    )
+    reader = ExportReader(source, client=client)
+    batches = list(reader.read_batches())
+
+    request = client.requests[0]
+    assert request["max_stream_count"] == 4
+    assert request["read_session"]["table"] == "projects/p/datasets/d/tables/orders"
+    assert request["read_session"]["read_options"] == {"selected_fields": ["id", "store"], "row_restriction": "qty > 0"}
+    assert client.peak == 4
+    assert all(batch.schema.names == ["id", "store"] for batch in batches)
+    assert sorted(i for batch in batches for i in batch.column("id").to_pylist()) == list(range(100))
+
+
+def test_batches_arrive_incrementally_and_closing_stops_readers():
+    client = FakeReadClient(orders(10_000), batch_rows=10)
+    reader = ExportReader(SourceKafka(dataset="d", table="orders", requested_streams=2), project_id="p",
+                          client=client, queue_size=2)
+    batches = reader.read_batches()
+    first = next(batches)
+    assert first.num_rows == 10
+    batches.close()
+    time.sleep(0.3)
+    assert client.active == 0
+
+
+def test_stream_errors_reach_the_consumer():
+    client = FakeReadClient(orders(), fail_stream=1)
+    reader = ExportReader(SourceFilesExports(project_id="p", dataset="d", table="t", requested_streams=2), client=client)
+    with pytest.raises(RuntimeError, match="stream reset"):
+        reader.read_table()
+    with pytest.raises(ValueError):
+        ExportReader(SourceKafka(dataset="d", table="t"))
@@ -0,0 +1,250 @@
+import codecs
+import gzip
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from batch_export_tests.metadata_models import FileCompression, FileFormat, FileSink
+
+# Rows serialized at a time; bounds memory and how far a file can overshoot file_max_size
+CHUNK_ROWS = 16_384
+# Open files (one per partition) kept at once; the least recently used is closed beyond this
+MAX_OPEN_FILES = 64
+GZIP_LEVEL = 6
+# Directory name used for rows whose split column is null
+NULL_PARTITION = "__null__"
+
+_json_line = json.JSONEncoder(default=str, ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _json_ready(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """Dates, times and decimals cast to strings by Arrow, which beats formatting them row by row."""
+    columns = [
+        pc.cast(column, pa.string())
+        if any(check(column.type) for check in (pa.types.is_timestamp, pa.types.is_date, pa.types.is_time, pa.types.is_decimal))
+        else column
+        for column in batch.columns
+    ]
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+def _partition_dir(column: str, value) -> str:
+    """``column=value`` with both quoted, so a value cannot add or climb directories."""
+    value = NULL_PARTITION if value is None else quote(str(value), safe="")
+    return f"{quote(column, safe='')}={value}"
+
+
+@dataclass
+class WrittenFile:
+    path: str
+    rows: int
+    bytes: int
+    partition: Tuple[Tuple[str, object], ...] = ()
+
+
+class _CountingFile:
+    """Write-only file that counts the bytes that reach the disk."""
+
+    def __init__(self, path: str):
+        self.raw = open(path, "wb")
+        self.bytes = 0
+
+    def write(self, data) -> int:
+        self.bytes += len(data)
+        return self.raw.write(data)
+
+    def flush(self) -> None:
+        self.raw.flush()
+
+    def close(self) -> None:
+        self.raw.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.raw.closed
+
+
+class _OpenFile:
+    """One output file being written: the serializer for the sink format and its byte count."""
+
+    def __init__(self, sink: FileSink, path: str, schema: pa.Schema):
+        self.sink = sink
+        self.path = path
+        self.rows = 0
+        self.counter = _CountingFile(path)
+        gzipped = sink.file_compression == FileCompression.gzip
+        if sink.file_format == FileFormat.parquet:
+            # Parquet compresses its pages itself; gzip around the file would make it unreadable
+            self.out = None
+            self.parquet = pq.ParquetWriter(
+                self.counter, schema, compression="gzip" if gzipped else "snappy",
+                compression_level=GZIP_LEVEL if gzipped else None,
+            )
+        else:
+            self.parquet = None
+            self.out = gzip.GzipFile(fileobj=self.counter, mode="wb", compresslevel=GZIP_LEVEL) if gzipped else self.counter
+        encoding = (sink.file_encoding or "utf-8").lower()
+        self.encoder = None if encoding.replace("_", "-") in ("utf-8", "utf8") else codecs.getincrementalencoder(encoding)("replace")
+
+    @property
+    def bytes(self) -> int:
+        return self.counter.bytes
+
+    def _text(self, data: bytes) -> None:
+        self.out.write(data if self.encoder is None else self.encoder.encode(data.decode("utf-8")))
+
+    def write(self, batch: pa.RecordBatch) -> None:
+        if self.parquet is not None:
+            self.parquet.write_batch(batch)
+        elif self.sink.file_format == FileFormat.csv:
+            options = pa_csv.WriteOptions(
+                include_header=self.rows == 0 and self.sink.file_iclude_header is not False,
+                delimiter=self.sink.file_delimiter or ",",
+            )
+            buffer = pa.BufferOutputStream()
+            pa_csv.write_csv(batch, buffer, options)
+            self._text(buffer.getvalue().to_pybytes())
+        else:
+            lines = "".join(_json_line(row) + "\n" for row in _json_ready(batch).to_pylist())
+            self._text(lines.encode("utf-8"))
+        if self.sink.file_max_size and self.out is not self.counter and self.out is not None:
+            # Push compressed data out so the size check sees it
+            self.out.flush()
+        self.rows += batch.num_rows
+
+    def close(self) -> None:
+        if self.parquet is not None:
+            self.parquet.close()
+        else:
+            if self.encoder is not None:
+                self.out.write(self.encoder.encode("", final=True))
+            if self.out is not self.counter:
+                self.out.close()
+        self.counter.close()
+
+
+def _split_name(file_name: str) -> Tuple[str, str]:
+    """``orders.csv.gz`` -> (``orders``, ``.csv.gz``)."""
+    base, ext = os.path.splitext(file_name)
+    if ext == ".gz":
+        base, inner = os.path.splitext(base)
+        ext = inner + ext
+    return base, ext
+
+
+class FileSinkWriter:
+    """
+    Streams Arrow record batches into the output files a ``FileSink`` describes.
+
+    Rows go to one file per value of ``file_split_columns`` (comma separated,
+    as ``column=value`` directories), and a new numbered file is started once
+    the current one reaches ``file_split_rows`` rows or ``file_max_size``
+    bytes on disk. CSV and JSON (one object per line) are gzipped on the fly;
+    parquet uses gzip page compression instead. Batches are written in
+    slices of ``CHUNK_ROWS`` rows, so memory does not grow with the export.
+    """
+
+    def __init__(
+        self,
+        sink: FileSink,
+        directory: str,
+        processing_date: Optional[datetime] = None,
+        max_open_files: int = MAX_OPEN_FILES,
+        chunk_rows: int = CHUNK_ROWS,
+    ):
+        self.sink = sink
+        self.directory = directory
+        self.max_open_files = max_open_files
+        self.chunk_rows = chunk_rows
+        file_name = processing_date.strftime(sink.file_name) if processing_date else sink.file_name
+        self.stem, self.ext = _split_name(file_name)
+        self.split_columns = [c.strip() for c in (sink.file_split_columns or "").split(",") if c.strip()]
+        self.rolls = bool(sink.file_max_size or sink.file_split_rows)
+        self.schema = None
+        self.written: List[WrittenFile] = []
+        self._open = OrderedDict()
+        self._parts = {}
+
+    def __enter__(self) -> "FileSinkWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _path(self, partition: tuple) -> str:
+        directory = os.path.join(self.directory, *(_partition_dir(column, value) for column, value in partition))
+        os.makedirs(directory, exist_ok=True)
+        part = self._parts[partition] = self._parts.get(partition, 0) + 1
+        # Without size or row limits a partition has one file, unless it was closed to free a slot
+        if not self.rolls and part == 1:
+            return os.path.join(directory, self.stem + self.ext)
+        return os.path.join(directory, f"{self.stem}_{part:05d}{self.ext}")
+
+    def _finish(self, partition: tuple) -> None:
+        current = self._open.pop(partition)
+        current.close()
+        self.written.append(WrittenFile(current.path, current.rows, current.bytes, partition))
+
+    def _file(self, partition: tuple) -> _OpenFile:
+        current = self._open.get(partition)
+        if current is not None:
+            full = (self.sink.file_split_rows and current.rows >= self.sink.file_split_rows) or (
+                self.sink.file_max_size and current.bytes >= self.sink.file_max_size
+            )
+            if not full:
+                self._open.move_to_end(partition)
+                return current
+            self._finish(partition)
+        if len(self._open) >= self.max_open_files:
+            self._finish(next(iter(self._open)))
+        current = self._open[partition] = _OpenFile(self.sink, self._path(partition), self.schema)
+        return current
+
+    def _partitions(self, batch: pa.RecordBatch) -> Iterable[Tuple[tuple, pa.RecordBatch]]:
+        if not self.split_columns:
+            yield (), batch
+            return
+        # One stable sort puts each partition's rows next to each other, in their original order
+        order = pc.sort_indices(batch, sort_keys=[(column, "ascending") for column in self.split_columns])
+        batch = batch.take(order)
+        keys = batch.select(self.split_columns).append_column("__row", pa.array(range(batch.num_rows), pa.int64()))
+        runs = pa.Table.from_batches([keys]).group_by(self.split_columns, use_threads=False).aggregate(
+            [("__row", "min"), ("__row", "count")]
+        )
+        for run in runs.to_pylist():
+            partition = tuple((column, run[column]) for column in self.split_columns)
+            yield partition, batch.slice(run["__row_min"], run["__row_count"])
+
+    def write_batch(self, batch: pa.RecordBatch) -> None:
+        if self.schema is None:
+            self.schema = batch.schema
+        for partition, rows in self._partitions(batch):
+            offset = 0
+            while offset < rows.num_rows:
+                current = self._file(partition)
+                size = self.chunk_rows
+                if self.sink.file_split_rows:
+                    size = min(size, self.sink.file_split_rows - current.rows)
+                current.write(rows.slice(offset, size))
+                offset += size
+
+    def write(self, batches: Iterable[pa.RecordBatch]) -> List[WrittenFile]:
+        """Write every batch, close the files and return them."""
+        with self:
+            for batch in batches:
+                self.write_batch(batch)
+        return self.written
+
+    def close(self) -> List[WrittenFile]:
+        while self._open:
+            self._finish(next(iter(self._open)))
+        return self.written
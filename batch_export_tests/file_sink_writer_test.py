@@ -0,0 +1,64 @@
+import gzip
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from batch_export_tests.file_sink_writer import FileSinkWriter
+from batch_export_tests.metadata_models import FileSink
+
+
+def orders(rows: int = 1000) -> pa.Table:
+    return pa.table({
+        "id": list(range(rows)),
+        "store": [f"s{i % 3}" for i in range(rows)],
+        "name": [f"café {i}" for i in range(rows)],
+    })
+
+
+def test_csv_rolls_over_on_rows_with_options(tmp_path):
+    sink = FileSink(file_name="orders.csv.gz", file_format="csv", file_compression="gzip",
+                    file_delimiter=";", file_iclude_header=True, file_encoding="latin-1", file_split_rows=300)
+    files = FileSinkWriter(sink, str(tmp_path), chunk_rows=128).write(orders().to_batches(max_chunksize=250))
+
+    assert [os.path.basename(f.path) for f in files] == [f"orders_0000{i}.csv.gz" for i in range(1, 5)]
+    assert [f.rows for f in files] == [300, 300, 300, 100]
+    text = gzip.open(files[1].path).read().decode("latin-1")
+    lines = text.splitlines()
+    assert lines[0] == '"id";"store";"name"' and lines[1] == '300;"s0";"café 300"'
+    assert len(lines) == 301
+
+
+def test_partitions_and_size_limit(tmp_path):
+    sink = FileSink(file_name="orders_%Y%m%d.json", file_format="json", file_split_columns="store", file_max_size=4000)
+    writer = FileSinkWriter(sink, str(tmp_path), chunk_rows=50)
+    files = writer.write(orders().to_batches(max_chunksize=100))
+
+    assert len(files) > 3
+    assert {f.partition for f in files} == {(("store", "s0"),), (("store", "s1"),), (("store", "s2"),)}
+    assert all(f.bytes < 4000 + 50 * 60 for f in files)
+    assert all(os.path.dirname(f.path).endswith(f"store={dict(f.partition)['store']}") for f in files)
+    rows = [json.loads(line) for f in files for line in open(f.path, encoding="utf-8")]
+    assert sorted(r["id"] for r in rows) == list(range(1000))
+    assert all(r["store"] == dict(f.partition)["store"] for f in files for r in map(json.loads, open(f.path)))
+
+
+def test_parquet_with_few_open_files(tmp_path):
+    sink = FileSink(file_name="orders.parquet", file_format="parquet", file_split_columns="store")
+    files = FileSinkWriter(sink, str(tmp_path), max_open_files=1).write(orders(30).to_batches(max_chunksize=1))
+    # Rows alternate between stores, so every batch closes the previous file
+    assert len(files) == 30
+    assert sum(pq.read_table(f.path).num_rows for f in files) == 30
+    assert sorted(os.listdir(tmp_path / "store=s0"))[:2] == ["orders.parquet", "orders_00002.parquet"]
+
+
+def test_partition_values_stay_inside_the_directory(tmp_path):
+    sink = FileSink(file_name="orders.csv", file_format="csv", file_split_columns="store")
+    batch = pa.record_batch({"store": ["a/b", "../../escape", None, "a/b"], "qty": [1, 2, 3, 4]})
+    files = FileSinkWriter(sink, str(tmp_path / "out")).write([batch])
+
+    names = sorted(os.path.relpath(f.path, tmp_path / "out") for f in files)
+    assert names == ["store=..%2F..%2Fescape/orders.csv", "store=__null__/orders.csv", "store=a%2Fb/orders.csv"]
+    assert {f.partition: f.rows for f in files}[(("store", "a/b"),)] == 2
+    assert sorted(os.listdir(tmp_path)) == ["out"]
@@ -0,0 +1,87 @@
+import json
+import shutil
+
+from batch_export_tests import metadata_loader
+from batch_export_tests.metadata_loader import MetadataLoader
+
+EXPORT = """files_batch:
+  - integration: export-{n}
+    id: {n}
+    trigger: schedule
+    source:
+      project_id: p
+      dataset: d
+      table: t{n}
+    sink:
+      file_name: t{n}_%Y%m%d.parquet
+      file_format: parquet
+    deployment:
+      schedule: 0 9 * 1 *
+      cloud_run:
+        - prd
+"""
+
+
+def write_exports(directory, count):
+    directory.mkdir(exist_ok=True)
+    for n in range(count):
+        (directory / f"export_{n}.yml").write_text(EXPORT.format(n=n))
+    return str(directory / "*.yml")
+
+
+def test_only_changed_files_are_parsed_again(tmp_path):
+    pattern = write_exports(tmp_path / "file_exports", 5)
+    cache_dir = str(tmp_path / "cache")
+
+    first = MetadataLoader("file_exports", cache_dir).load(pattern)
+    assert (first.files, first.parsed, first.errors) == (5, 5, {})
+    assert [row.id for row in first.rows] == [0, 1, 2, 3, 4]
+    assert first.raw[0]["integration"] == "export-0"
+
+    # A new loader (the next CI run) reads the cache from disk
+    second = MetadataLoader("file_exports", cache_dir).load(pattern)
+    assert second.parsed == 0 and second.rows == first.rows
+
+    (tmp_path / "file_exports" / "export_3.yml").write_text(EXPORT.format(n=33))
+    third = MetadataLoader("file_exports", cache_dir).load(pattern)
+    assert third.parsed == 1
+    assert [row.id for row in third.rows] == [0, 1, 2, 33, 4]
+
+
+def test_errors_name_the_file_and_parallel_parsing_matches(tmp_path, monkeypatch):
+    pattern = write_exports(tmp_path / "file_exports", 20)
+    (tmp_path / "file_exports" / "export_7.yml").write_text(EXPORT.format(n=7).replace("file_format: parquet", "file_format: xml"))
+    (tmp_path / "file_exports" / "export_8.yml").write_text("files_batch: [unclosed\n")
+
+    sequential = MetadataLoader("file_exports", cache_dir=None).load(pattern)
+    monkeypatch.setattr(metadata_loader, "PARALLEL_MIN_FILES", 2)
+    parallel = MetadataLoader("file_exports", cache_dir=None, workers=2).load(pattern)
+
+    assert sorted(sequential.errors) == [str(tmp_path / "file_exports" / f"export_{n}.yml") for n in (7, 8)]
+    assert "file_format" in sequential.errors[str(tmp_path / "file_exports" / "export_7.yml")]
+    assert parallel.errors == sequential.errors
+    assert parallel.rows == sequential.rows and len(parallel.rows) == 18
+
+
+def test_repository_template_validates(tmp_path):
+    shutil.copy("templates/file_export.yml", tmp_path / "file_export.yml")
+    loaded = MetadataLoader("file_exports", cache_dir=None).load(str(tmp_path / "*.yml"))
+    assert not loaded.errors and loaded.rows
+
+
+def test_cache_is_plain_json_and_revalidated(tmp_path):
+    pattern = write_exports(tmp_path / "file_exports", 2)
+    cache_dir = tmp_path / "cache"
+    MetadataLoader("file_exports", str(cache_dir)).load(pattern)
+
+    (cache_file,) = cache_dir.iterdir()
+    assert cache_file.name == f"file_exports-{metadata_loader.SCHEMA_VERSION}.json"
+    cache = json.loads(cache_file.read_text())
+    for entry in cache.values():
+        entry["rows"][0]["sink"]["file_format"] = "xml"
+    cache_file.write_text(json.dumps(cache))
+
+    # Rows that no longer validate are not trusted; the files are parsed again
+    loaded = MetadataLoader("file_exports", str(cache_dir)).load(pattern)
+    assert loaded.parsed == 2 and not loaded.errors
+    assert [row.sink.file_format.value for row in loaded.rows] == ["parquet", "parquet"]
@@ -1,9 +1,16 @@
-from collections import Counter
 from pydantic import BaseModel, Field, ValidationInfo, field_validator
 from enum import Enum
 from typing import List, Optional
 from typing import Union
 
+from batch_export_tests.metadata_registry import MetadataRegistry
+
+def check_conflicts(rows) -> None:
+    """Raise listing every duplicate id and every integration deployed twice to one env."""
+    conflicts = MetadataRegistry(rows).conflicts()
+    if conflicts:
+        raise Exception("Conflicting integrations found:\n" + "\n".join(str(conflict) for conflict in conflicts))
+
 class BackupBucket(BaseModel):
     needed: bool
     data_viewer_group: Optional[str] = None
@@ -161,21 +168,9 @@ class FileExportsMetadataList(BaseModel):
 
     @field_validator("rows")
     def check_unique_integrations(cls, rows):
-        # The ids should be unique
-        if len(set(rows)) != len(rows):
-            duplicates = [
-                name for name, count in Counter(rows).items() if count > 1
-            ]
-            raise Exception(f"Integrations with duplicate 'id' fields found: {duplicates}")
-        
-        integrations = []
-        # Duplicate integrations for the same env are not allowed
-        for i in rows:
-            for env in i.deployment.cloud_run:
-                integrations.append((i.integration, env))
-        duplicates = [k for k, v in Counter(integrations).items() if v > 1]
-        if duplicates:
-            raise Exception(f"Duplicate integrations found: {duplicates}")
+        # The ids should be unique and no integration deployed twice to the same env
+        check_conflicts(rows)
+        return rows
         
 class KafkaSink(BaseModel):
     topic: str
@@ -209,18 +204,6 @@ class KafkaMetadataList(BaseModel):
 
     @field_validator("rows")
     def check_unique_integrations(cls, rows):
-        # The ids should be unique
-        if len(set(rows)) != len(rows):
-            duplicates = [
-                name for name, count in Counter(rows).items() if count > 1
-            ]
-            raise Exception(f"Integrations with duplicate 'id' fields found: {duplicates}")
-        
-        integrations = []
-        # Duplicate integrations for the same env are not allowed
-        for i in rows:
-            for env in i.deployment.cloud_run:
-                integrations.append((i.integration, env))
-        duplicates = [k for k, v in Counter(integrations).items() if v > 1]
-        if duplicates:
-            raise Exception(f"Duplicate integrations found: {duplicates}")
+        # The ids should be unique and no integration deployed twice to the same env
+        check_conflicts(rows)
+        return rows
@@ -0,0 +1,152 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from batch_export_tests.metadata_models import FileExportsMetadata, KafkaMetadata
+
+    Metadata = Union[FileExportsMetadata, KafkaMetadata]
+
+# Conflict kinds, in the order they are reported
+DUPLICATE_ID = "id"
+DUPLICATE_INTEGRATION = "integration"
+
+
+def _env(env) -> str:
+    return getattr(env, "value", env)
+
+
+def source_key(row: "Metadata") -> str:
+    """``project_id.dataset.table``; Kafka sources have no project, so just ``dataset.table``."""
+    source = row.source
+    return ".".join(part for part in (getattr(source, "project_id", None), source.dataset, source.table) if part)
+
+
+@dataclass(frozen=True)
+class Conflict:
+    kind: str
+    key: Hashable
+    rows: Tuple["Metadata", ...]
+
+    def __str__(self) -> str:
+        if self.kind == DUPLICATE_ID:
+            return f"Integrations with duplicate 'id' {self.key}: {list(self.rows)}"
+        integration, env = self.key
+        return f"Duplicate integration '{integration}' in {env}: {list(self.rows)}"
+
+
+class MetadataRegistry:
+    """
+    Export definitions indexed by id, by (integration, env) and by source table.
+
+    Inserting, updating or removing a definition touches only its own index
+    entries, and returns the conflicts it is part of straight away: two
+    definitions with the same id, or the same integration deployed twice to
+    one environment (``deployment.cloud_run``). Conflicting definitions are
+    kept, so ``conflicts()`` can report every one of them instead of the
+    first.
+
+    The index keys of a definition are recorded when it is added, so one
+    edited in place is still removed (or updated) from where it was filed.
+    """
+
+    def __init__(self, rows: Iterable["Metadata"] = ()):
+        self._by_id: Dict[int, List["Metadata"]] = {}
+        self._by_integration: Dict[Tuple[str, str], List["Metadata"]] = {}
+        self._by_name: Dict[str, List["Metadata"]] = {}
+        self._by_source: Dict[str, List["Metadata"]] = {}
+        # id() of every added definition -> (conflict keys, integration, source) it was filed under
+        self._filed: Dict[int, Tuple[Tuple[Tuple[str, Hashable], ...], str, str]] = {}
+        # (kind, key) of every index entry holding more than one definition
+        self._conflicts: Dict[Tuple[str, Hashable], None] = {}
+        for row in rows:
+            self.add(row)
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._by_id.values())
+
+    def __iter__(self) -> Iterator["Metadata"]:
+        for rows in self._by_id.values():
+            yield from rows
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._by_id
+
+    def _keys(self, row: "Metadata") -> Iterator[Tuple[str, Hashable]]:
+        yield DUPLICATE_ID, row.id
+        for env in row.deployment.cloud_run:
+            yield DUPLICATE_INTEGRATION, (row.integration, _env(env))
+
+    def _index(self, kind: str) -> Dict[Hashable, List["Metadata"]]:
+        return self._by_id if kind == DUPLICATE_ID else self._by_integration
+
+    def _conflict(self, kind: str, key: Hashable) -> Conflict:
+        return Conflict(kind, key, tuple(self._index(kind)[key]))
+
+    def add(self, row: "Metadata") -> List[Conflict]:
+        """Insert a definition; returns the conflicts it now takes part in."""
+        if id(row) in self._filed:
+            raise ValueError(f"Integration '{row.integration}' with id {row.id} is already in the registry")
+        keys = tuple(self._keys(row))
+        self._filed[id(row)] = keys, row.integration, source_key(row)
+        conflicts = []
+        for kind, key in keys:
+            rows = self._index(kind).setdefault(key, [])
+            rows.append(row)
+            if len(rows) > 1:
+                self._conflicts[kind, key] = None
+                conflicts.append(self._conflict(kind, key))
+        self._by_name.setdefault(row.integration, []).append(row)
+        self._by_source.setdefault(source_key(row), []).append(row)
+        return conflicts
+
+    def _discard(self, index: Dict[Hashable, list], key: Hashable, row: "Metadata") -> None:
+        rows = index.get(key, [])
+        # Rows compare equal by id, so look for this very object
+        index[key] = [candidate for candidate in rows if candidate is not row]
+        if not index[key]:
+            del index[key]
+
+    def remove(self, row: "Metadata") -> None:
+        """Remove a definition previously added (the same object, even if edited since)."""
+        filed = self._filed.pop(id(row), None)
+        if filed is None:
+            raise KeyError(f"Integration '{row.integration}' with id {row.id} is not in the registry")
+        keys, integration, source = filed
+        for kind, key in keys:
+            self._discard(self._index(kind), key, row)
+            if len(self._index(kind).get(key, ())) < 2:
+                self._conflicts.pop((kind, key), None)
+        self._discard(self._by_name, integration, row)
+        self._discard(self._by_source, source, row)
+
+    def update(self, row: "Metadata") -> List[Conflict]:
+        """Replace the definitions sharing ``row.id`` with ``row``; returns its conflicts.
+
+        ``row`` may be a definition already in the registry that was edited in place.
+        """
+        if id(row) in self._filed:
+            self.remove(row)
+        for previous in list(self._by_id.get(row.id, ())):
+            self.remove(previous)
+        return self.add(row)
+
+    def conflicts(self) -> List[Conflict]:
+        """Every current conflict, duplicate ids first."""
+        conflicts = [self._conflict(kind, key) for kind, key in self._conflicts]
+        return sorted(conflicts, key=lambda conflict: conflict.kind != DUPLICATE_ID)
+
+    def get(self, id: int) -> Optional["Metadata"]:
+        rows = self._by_id.get(id)
+        return rows[0] if rows else None
+
+    def by_integration(self, integration: str, env: Optional[str] = None) -> List["Metadata"]:
+        if env is None:
+            return list(self._by_name.get(integration, ()))
+        return list(self._by_integration.get((integration, _env(env)), ()))
+
+    def by_source(self, table: str, env: Optional[str] = None) -> List["Metadata"]:
+        """Exports of ``project_id.dataset.table`` (``dataset.table`` for Kafka), optionally deployed to ``env``."""
+        rows = self._by_source.get(table, ())
+        if env is None:
+            return list(rows)
+        return [row for row in rows if _env(env) in {_env(e) for e in row.deployment.cloud_run}]
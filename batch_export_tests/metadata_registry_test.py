@@ -0,0 +1,101 @@
+import pytest
+
+from batch_export_tests.metadata_models import FileExportsMetadata, FileExportsMetadataList, KafkaMetadata, KafkaMetadataList
+from batch_export_tests.metadata_registry import DUPLICATE_ID, DUPLICATE_INTEGRATION, MetadataRegistry
+
+
+def export(id, integration=None, table="orders", envs=("dev", "prd")):
+    return FileExportsMetadata(
+        integration=integration or f"export-{id}",
+        id=id,
+        trigger="schedule",
+        source={"project_id": "p", "dataset": "d", "table": table},
+        sink={"file_name": f"{table}.csv", "file_format": "csv"},
+        deployment={"schedule": "0 9 * * *", "cloud_run": list(envs)},
+    )
+
+
+def kafka(id, integration=None):
+    return KafkaMetadata(
+        integration=integration or f"kafka-{id}",
+        id=id,
+        trigger="event",
+        source={"dataset": "d", "table": "orders"},
+        sink={"topic": "t", "business_object": 1, "ica_integration_id": 2, "ica_message_version": "1"},
+        deployment={"cloud_run": ["prd"]},
+    )
+
+
+def test_queries_by_id_integration_and_source():
+    registry = MetadataRegistry([export(1), export(2, envs=["dev"]), export(3, table="stores")])
+
+    assert len(registry) == 3 and 2 in registry
+    assert registry.get(3).source.table == "stores"
+    assert registry.by_integration("export-2") == [export(2)]
+    assert registry.by_integration("export-2", "prd") == []
+    assert [row.id for row in registry.by_source("p.d.orders")] == [1, 2]
+    assert [row.id for row in registry.by_source("p.d.orders", "prd")] == [1]
+    assert MetadataRegistry([kafka(1)]).by_source("d.orders") == [kafka(1)]
+
+
+def test_conflicts_are_reported_on_insert_and_cleared_on_remove():
+    registry = MetadataRegistry([export(1), export(2)])
+
+    duplicate = export(1, integration="other")
+    assert [(c.kind, c.key) for c in registry.add(duplicate)] == [(DUPLICATE_ID, 1)]
+    same_integration = export(3, integration="export-2", envs=["prd"])
+    assert [(c.kind, c.key) for c in registry.add(same_integration)] == [(DUPLICATE_INTEGRATION, ("export-2", "prd"))]
+    assert len(registry.conflicts()) == 2
+
+    registry.remove(duplicate)
+    assert registry.get(1).integration == "export-1"
+    assert [c.kind for c in registry.conflicts()] == [DUPLICATE_INTEGRATION]
+
+    # Moving export 3 to dev only leaves its old conflict for a new one there
+    assert [c.key for c in registry.update(export(3, integration="export-2", envs=["dev"]))] == [("export-2", "dev")]
+    assert registry.update(export(3, envs=["dev"])) == [] and registry.conflicts() == []
+    assert len(registry) == 3
+
+
+def test_list_models_report_every_conflict():
+    with pytest.raises(Exception) as e:
+        FileExportsMetadataList(rows=[export(1), export(1, integration="x"), export(2, integration="x")])
+    message = str(e.value)
+    assert "duplicate 'id' 1" in message
+    assert "Duplicate integration 'x' in dev" in message and "Duplicate integration 'x' in prd" in message
+
+    assert FileExportsMetadataList(rows=[export(1), export(2)]).rows == [export(1), export(2)]
+    assert KafkaMetadataList(rows=[kafka(1), kafka(2)]).rows == [kafka(1), kafka(2)]
+    with pytest.raises(Exception, match="Duplicate integration 'k' in prd"):
+        KafkaMetadataList(rows=[kafka(1, "k"), kafka(2, "k")])
+
+
+def test_removing_an_unknown_definition_names_it():
+    registry = MetadataRegistry([export(1)])
+    with pytest.raises(KeyError, match="id 2"):
+        registry.remove(export(2))
+    # Equal by id is not enough: only the object that was added can be removed
+    with pytest.raises(KeyError, match="id 1"):
+        registry.remove(export(1))
+    added = registry.get(1)
+    registry.remove(added)
+    with pytest.raises(KeyError, match="id 1"):
+        registry.remove(added)
+    assert len(registry) == 0
+
+
+def test_definitions_edited_in_place_are_refiled():
+    registry = MetadataRegistry([export(1), export(2, envs=["prd"])])
+    row = registry.get(1)
+
+    row.integration, row.source.table = "export-2", "stores"
+    assert [c.key for c in registry.update(row)] == [("export-2", "prd")]
+    assert registry.by_integration("export-1") == [] and registry.by_source("p.d.orders") == [export(2)]
+    assert registry.by_source("p.d.stores") == [row]
+
+    row.deployment.cloud_run = ["dev"]
+    registry.remove(row)
+    assert len(registry) == 1 and registry.conflicts() == []
+    assert registry.by_integration("export-2") == [export(2)]
+    with pytest.raises(ValueError, match="already in the registry"):
+        registry.add(registry.get(2))
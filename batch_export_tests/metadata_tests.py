@@ -1,9 +1,10 @@
-from batch_export_tests.metadata_models import FileExportsMetadata, FileExportsMetadataList
+from batch_export_tests.metadata_models import FileExportsMetadataList
 
-def test_file_exports_metadata_collection(file_exports_metadata):
-    FileExportsMetadataList(rows=file_exports_metadata)
+def test_file_exports_metadata_collection(file_exports):
+    # Rows are already validated models, so only the cross-row checks run here
+    FileExportsMetadataList(rows=file_exports.rows)
 
-def test_file_exports_metadata(file_exports_metadata):
-    for integration in file_exports_metadata:
-        print(integration)
-        FileExportsMetadata(**integration)
\ No newline at end of file
+def test_file_exports_metadata(file_exports):
+    for path, error in file_exports.errors.items():
+        print(f"{path}:\n{error}")
+    assert not file_exports.errors
@@ -0,0 +1,213 @@
+"""
+End-to-end throughput benchmark of the PR-Bot and translator.
+
+Starts the fake GitHub/OpenAI upstreams from ``benchmarks/fakes.py``, both
+FastAPI apps pointed at them, then drives concurrent load:
+  * ``requests``:  ``POST /requests`` on the PR-Bot, polled until the job ends
+  * ``translate``: ``POST /translate-and-forward`` on the translator, likewise
+
+    python benchmarks/e2e.py --requests 200 --concurrency 16 --openai-latency-ms 500
+
+For each scenario it reports p50/p95/p99 of the time until the request was
+accepted and until its job finished, completed requests per second, failures,
+upstream calls per request and the mean time per pipeline stage (from the
+PR-Bot's ``/metrics``). Results are appended to ``--output`` as JSON lines.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+FINISHED = {"succeeded", "failed", "cancelled"}
+STAGE_RE = re.compile(r'^ai_dbt_bot_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$', re.MULTILINE)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+def start(args: list[str], env: dict, url: str, timeout: float) -> subprocess.Popen:
+    """Launch a server and wait until ``url`` answers."""
+    proc = subprocess.Popen(args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + timeout
+    with httpx.Client(timeout=1) as client:
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{' '.join(args)} exited with {proc.returncode}")
+            try:
+                if client.get(url).status_code == 200:
+                    return proc
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+    proc.terminate()
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def stage_totals(metrics: str) -> dict[str, list[float]]:
+    totals = {}
+    for kind, stage, value in STAGE_RE.findall(metrics):
+        totals.setdefault(stage, [0.0, 0.0])[kind == "count"] = float(value)
+    return totals
+
+
+async def one_request(client: httpx.AsyncClient, bot: str, url: str, body: dict, poll: float) -> dict:
+    started = time.perf_counter()
+    resp = await client.post(url, json=body)
+    accepted = time.perf_counter() - started
+    if resp.status_code >= 400 or "job_id" not in resp.json():
+        return {"accepted": accepted, "finished": None, "status": f"http {resp.status_code}"}
+    job_url = f"{bot}/jobs/{resp.json()['job_id']}"
+    while True:
+        job = (await client.get(job_url)).json()
+        if job["status"] in FINISHED:
+            return {"accepted": accepted, "finished": time.perf_counter() - started, "status": job["status"]}
+        await asyncio.sleep(poll)
+
+
+async def run_scenario(name: str, url: str, bodies: list[dict], bot: str, fakes: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await client.post(f"{fakes}/_reset")
+        before = stage_totals((await client.get(f"{bot}/metrics")).text)
+        gate = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(body):
+            async with gate:
+                return await one_request(client, bot, url, body, args.poll)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(bounded(body) for body in bodies))
+        elapsed = time.perf_counter() - started
+        upstream = (await client.get(f"{fakes}/_stats")).json()
+        after = stage_totals((await client.get(f"{bot}/metrics")).text)
+
+    ok = [r for r in results if r["status"] == "succeeded"]
+    stages = {
+        stage: round((total - before.get(stage, [0, 0])[0]) / count, 4)
+        for stage, (total, n) in after.items()
+        if (count := n - before.get(stage, [0, 0])[1]) > 0
+    }
+    return {
+        "scenario": name,
+        "requests": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 2) if elapsed else None,
+        "accepted": {f"p{p}": percentile([r["accepted"] for r in results], p) for p in (50, 95, 99)},
+        "finished": {f"p{p}": percentile([r["finished"] for r in ok], p) for p in (50, 95, 99)},
+        "upstream_calls_per_request": {
+            upstream_name: round(sum(counts.values()) / max(1, len(results)), 2)
+            for upstream_name, counts in upstream.items()
+        },
+        "upstream_calls": upstream,
+        "stage_mean_seconds": stages,
+    }
+
+
+def request_bodies(scenario: str, n: int, models: int) -> list[dict]:
+    bodies = []
+    for i in range(n):
+        model = f"d_model_{i % models}"
+        if scenario == "requests":
+            bodies.append({
+                "analyst_prompt": f"Add a loaded_at column to {model} (request {i})",
+                "file_names": [f"models/{model}.sql", f"models/{model}.yml"],
+            })
+        else:
+            bodies.append({"prompt": f"Please track when models/{model}.sql rows were loaded (request {i})"})
+    return bodies
+
+
+def fmt(seconds: float | None) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.0f}ms"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent load against both apps with fake upstreams.")
+    parser.add_argument("--scenarios", default="requests,translate")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--models", type=int, default=50, help="dbt models in the fake repository")
+    parser.add_argument("--github-latency-ms", type=float, default=50)
+    parser.add_argument("--openai-latency-ms", type=float, default=300)
+    parser.add_argument("--github-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--github-rate-limit", type=int, default=5000)
+    parser.add_argument("--poll", type=float, default=0.02, help="seconds between job status checks")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="append one JSON line per run to this file")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC_DIR, env.get("PYTHONPATH")]))
+    fakes_port, bot_port, translator_port = free_port(), free_port(), free_port()
+    fakes, bot = f"http://127.0.0.1:{fakes_port}", f"http://127.0.0.1:{bot_port}"
+    translator = f"http://127.0.0.1:{translator_port}"
+    env.update({
+        "GITHUB_API_URL": fakes, "GITHUB_TOKEN": "bench", "GITHUB_REPO": "bench/dbt",
+        "OPENAI_API_BASE": f"{fakes}/v1", "OPENAI_API_KEY": "bench",
+        "TECH_SERVICE_URL": f"{bot}/requests", "TECH_SERVICE_TOKEN": "bench",
+        "SESSION_STORE_URL": "memory://", "LLM_CACHE_PATH": "", "STARTUP_WARMUP": "blocking",
+        "DBT_MANIFEST_PATH": os.path.join(BENCH_DIR, "missing-manifest.json"),
+    })
+    fake_args = [
+        f"--{name.replace('_', '-')}={getattr(args, name)}"
+        for name in ("models", "github_latency_ms", "openai_latency_ms",
+                     "github_error_rate", "openai_error_rate", "github_rate_limit")
+    ]
+    uvicorn = [sys.executable, "-m", "uvicorn", "--log-level", "warning", "--port"]
+
+    procs = []
+    try:
+        procs.append(start([sys.executable, os.path.join(BENCH_DIR, "fakes.py"), "--port", str(fakes_port), *fake_args],
+                           env, f"{fakes}/_stats", args.timeout))
+        procs.append(start([*uvicorn, str(bot_port), "ai_dbt_bot.main:app"], env, f"{bot}/ready", args.timeout))
+        procs.append(start([*uvicorn, str(translator_port), "ai_dbt_bot.translator_service:app"],
+                           env, f"{translator}/ready", args.timeout))
+
+        urls = {"requests": f"{bot}/requests", "translate": f"{translator}/translate-and-forward"}
+        results = []
+        for name in args.scenarios.split(","):
+            bodies = request_bodies(name, args.requests, args.models)
+            result = asyncio.run(run_scenario(name, urls[name], bodies, bot, fakes, args))
+            results.append(result)
+            print(
+                f"{name:<10} {result['succeeded']}/{result['requests']} ok  {result['rps']} req/s  "
+                f"finished p50={fmt(result['finished']['p50'])} p95={fmt(result['finished']['p95'])} "
+                f"p99={fmt(result['finished']['p99'])}  accepted p99={fmt(result['accepted']['p99'])}  "
+                + "  ".join(f"{k}={v}/req" for k, v in result["upstream_calls_per_request"].items())
+            )
+            print(" " * 11 + "  ".join(f"{stage}={fmt(s)}" for stage, s in result["stage_mean_seconds"].items()))
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            proc.wait(10)
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"at": time.time(), "args": vars(args), "results": results}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+Local stand-ins for GitHub and OpenAI, for benchmarking without the network.
+
+One FastAPI app serves the GitHub REST and GraphQL calls the PR-Bot makes
+(repository, refs, trees, commits, pull requests, file reads) at the root,
+and the chat-completions API under ``/v1``. Point the services at it with
+``GITHUB_API_URL=http://127.0.0.1:PORT`` and ``OPENAI_API_BASE=http://127.0.0.1:PORT/v1``.
+
+    python benchmarks/fakes.py --port 9000 --github-latency-ms 80 --openai-latency-ms 800
+
+Every upstream can be given a latency, an error rate (502 from GitHub,
+429 from OpenAI) and, for GitHub, an hourly budget reported through the
+usual ``X-RateLimit-*`` headers. ``GET /_stats`` returns the number of
+calls per upstream and route; ``POST /_reset`` zeroes them.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SQL_TEMPLATE = """with source as (
+    select * from {{{{ ref('stg_{name}') }}}}
+),
+
+renamed as (
+    select
+        id,
+        created_at,
+        status
+    from source
+)
+
+select * from renamed
+"""
+
+YAML_TEMPLATE = """version: 2
+
+models:
+  - name: {name}
+    description: Benchmark model {name}
+    columns:
+      - name: id
+        tests:
+          - unique
+          - not_null
+      - name: created_at
+      - name: status
+"""
+
+FILE_RE = re.compile(r"[\w/.-]+\.(?:sql|ya?ml)")
+PATH_RE = re.compile(r"--- a/(\S+?)'")
+
+
+@dataclass
+class Config:
+    models: int = 50
+    github_latency_ms: float = 0.0
+    openai_latency_ms: float = 0.0
+    github_error_rate: float = 0.0
+    openai_error_rate: float = 0.0
+    github_rate_limit: int = 5000
+    owner: str = "bench"
+    repo: str = "dbt"
+
+
+def _sha(*parts) -> str:
+    return hashlib.sha1("\0".join(map(str, parts)).encode()).hexdigest()
+
+
+def model_files(models: int) -> dict[str, str]:
+    files = {}
+    for i in range(models):
+        name = f"d_model_{i}"
+        files[f"models/{name}.sql"] = SQL_TEMPLATE.format(name=name)
+        files[f"models/{name}.yml"] = YAML_TEMPLATE.format(name=name)
+    return files
+
+
+def appended_diff(path: str, original: str, line: str) -> str:
+    """Unified diff adding ``line`` after the last line of ``original``."""
+    lines = original.rstrip("\n").split("\n")
+    context = lines[-3:]
+    start = len(lines) - len(context) + 1
+    body = "".join(f" {text}\n" for text in context) + f"+{line}\n"
+    return f"--- a/{path}\n+++ b/{path}\n@@ -{start},{len(context)} +{start},{len(context) + 1} @@\n{body}"
+
+
+def completion_text(messages: list[dict]) -> str:
+    """A plausible reply for each kind of request the two services send."""
+    system = messages[0]["content"] if messages else ""
+    user = messages[-1]["content"] if messages else ""
+    if "Return ONLY a JSON object" in system:
+        files = FILE_RE.findall(user) or ["models/d_model_0.sql"]
+        return json.dumps({"files": files, "prompt": f"Add a loaded_at column. {user}"})
+    if "concise PR titles" in system:
+        return "Benchmark change"
+    match = PATH_RE.search(system)
+    comment = "-- benchmark edit" if not match or match.group(1).endswith(".sql") else "# benchmark edit"
+    if match:
+        return appended_diff(match.group(1), user, comment)
+    return user.rstrip("\n") + f"\n{comment}\n"
+
+
+def create_app(config: Config) -> FastAPI:
+    app = FastAPI(title="Benchmark upstreams")
+    files = model_files(config.models)
+    calls = {"github": Counter(), "openai": Counter()}
+    budget = {"remaining": config.github_rate_limit, "reset": time.time() + 3600}
+    pulls, lock = {}, threading.Lock()
+    repo_path = f"/repos/{config.owner}/{config.repo}"
+
+    def base(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    async def github(request: Request, route: str, body=None, status: int = 200):
+        calls["github"][route] += 1
+        if config.github_latency_ms:
+            await asyncio.sleep(config.github_latency_ms / 1000)
+        with lock:
+            if time.time() >= budget["reset"]:
+                budget.update(remaining=config.github_rate_limit, reset=time.time() + 3600)
+            budget["remaining"] = max(0, budget["remaining"] - 1)
+            remaining = budget["remaining"]
+        headers = {
+            "X-RateLimit-Limit": str(config.github_rate_limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(budget["reset"])),
+            "X-RateLimit-Resource": "graphql" if route == "graphql" else "core",
+        }
+        if remaining == 0:
+            return JSONResponse({"message": "API rate limit exceeded"}, status_code=403, headers=headers)
+        if random.random() < config.github_error_rate:
+            return JSONResponse({"message": "Injected error"}, status_code=502, headers=headers)
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    def ref_body(request: Request, ref: str, sha: str) -> dict:
+        url = f"{base(request)}{repo_path}/git/refs/{ref}"
+        return {"ref": f"refs/{ref}", "url": url, "object": {"sha": sha, "type": "commit", "url": url}}
+
+    def pull_body(request: Request, number: int) -> dict:
+        return {
+            "number": number, "draft": pulls[number].get("draft", True), "title": pulls[number]["title"],
+            "url": f"{base(request)}{repo_path}/pulls/{number}",
+            "html_url": f"https://github.test/{config.owner}/{config.repo}/pull/{number}",
+        }
+
+    @app.get(repo_path)
+    async def get_repo(request: Request):
+        return await github(request, "repo", {
+            "name": config.repo, "full_name": f"{config.owner}/{config.repo}",
+            "owner": {"login": config.owner}, "default_branch": "main",
+            "url": f"{base(request)}{repo_path}",
+        })
+
+    @app.get(repo_path + "/git/ref/{ref:path}")
+    @app.get(repo_path + "/git/refs/{ref:path}")
+    async def get_ref(request: Request, ref: str):
+        return await github(request, "get_ref", ref_body(request, ref, _sha("head", ref)))
+
+    @app.post(repo_path + "/git/refs")
+    async def create_ref(request: Request):
+        data = await request.json()
+        return await github(request, "create_ref", ref_body(request, data["ref"][len("refs/"):], data["sha"]), 201)
+
+    @app.patch(repo_path + "/git/refs/{ref:path}")
+    async def update_ref(request: Request, ref: str):
+        data = await request.json()
+        return await github(request, "update_ref", ref_body(request, ref, data["sha"]))
+
+    @app.get(repo_path + "/git/trees/{sha}")
+    async def get_tree(request: Request, sha: str):
+        tree = [{"path": path, "type": "blob", "mode": "100644", "sha": _sha(path)} for path in files]
+        return await github(request, "get_tree", {"sha": _sha("tree", sha), "tree": tree, "truncated": False})
+
+    @app.post(repo_path + "/git/trees")
+    async def create_tree(request: Request):
+        data = await request.json()
+        sha = _sha("tree", data.get("base_tree"), json.dumps(data["tree"], sort_keys=True))
+        return await github(request, "create_tree", {"sha": sha, "url": f"{base(request)}{repo_path}/git/trees/{sha}"}, 201)
+
+    @app.get(repo_path + "/git/commits/{sha}")
+    async def get_commit(request: Request, sha: str):
+        tree = _sha("tree", sha)
+        return await github(request, "get_commit", {
+            "sha": sha, "url": f"{base(request)}{repo_path}/git/commits/{sha}",
+            "tree": {"sha": tree, "url": f"{base(request)}{repo_path}/git/trees/{tree}"},
+        })
+
+    @app.post(repo_path + "/git/commits")
+    async def create_commit(request: Request):
+        data = await request.json()
+        sha = _sha("commit", data["tree"], *data.get("parents", []), data["message"])
+        return await github(request, "create_commit", {"sha": sha, "url": f"{base(request)}{repo_path}/git/commits/{sha}"}, 201)
+
+    @app.post(repo_path + "/pulls")
+    async def create_pull(request: Request):
+        data = await request.json()
+        with lock:
+            number = len(pulls) + 1
+            pulls[number] = {"title": data["title"], "draft": data.get("draft", False)}
+        return await github(request, "create_pull", pull_body(request, number), 201)
+
+    @app.get(repo_path + "/pulls/{number}")
+    async def get_pull(request: Request, number: int):
+        return await github(request, "get_pull", pull_body(request, number))
+
+    @app.patch(repo_path + "/pulls/{number}")
+    async def edit_pull(request: Request, number: int):
+        pulls[number].update(await request.json())
+        return await github(request, "edit_pull", pull_body(request, number))
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        data = await request.json()
+        if data["query"].lstrip().startswith("mutation"):
+            number = int(data.get("variables", {}).get("number", 0))
+            result = {"markPullRequestReadyForReview": {"pullRequest": {"number": number, "isDraft": False}}}
+        else:
+            # CommitBuilder.read: one aliased object(expression: "branch:path") per file
+            repository = {}
+            for name, value in data.get("variables", {}).items():
+                if name.startswith("e"):
+                    text = files.get(value.split(":", 1)[1])
+                    repository[f"f{name[1:]}"] = None if text is None else {"text": text}
+            result = {"repository": repository}
+        return await github(request, "graphql", {"data": result})
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        data = await request.json()
+        calls["openai"]["chat_completions"] += 1
+        if config.openai_latency_ms:
+            await asyncio.sleep(config.openai_latency_ms / 1000)
+        if random.random() < config.openai_error_rate:
+            return JSONResponse({"error": {"message": "Injected rate limit", "type": "rate_limit_error"}}, status_code=429)
+        text = completion_text(data.get("messages", []))
+        model = data.get("model", "gpt-4o-mini")
+        usage = {"prompt_tokens": sum(len(m["content"]) // 4 for m in data.get("messages", [])),
+                 "completion_tokens": len(text) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if not data.get("stream"):
+            return {
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        async def events():
+            for piece in re.findall(r"\S+\s*|\s+", text):
+                chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/_stats")
+    def stats():
+        return {name: dict(counter) for name, counter in calls.items()}
+
+    @app.post("/_reset")
+    def reset():
+        for counter in calls.values():
+            counter.clear()
+        return {"reset": True}
+
+    return app
+
+
+def main(argv=None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake GitHub and OpenAI servers for benchmarks.")
+    parser.add_argument("--port", type=int, default=9000)
+    for field, default in vars(Config()).items():
+        if field not in ("owner", "repo"):
+            parser.add_argument(f"--{field.replace('_', '-')}", type=type(default), default=default)
+    args = parser.parse_args(argv)
+    config = Config(**{k: v for k, v in vars(args).items() if k != "port"})
+    uvicorn.run(create_app(config), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Throughput of the batch-export file sink writer per output format.
+
+Generates an in-memory Arrow table shaped like a typical export (ids,
+strings, decimals, timestamps) and writes it through ``FileSinkWriter``
+once per format/compression, reporting MB/s of Arrow input and of bytes
+written.
+
+    python benchmarks/file_sink.py --rows 1000000 --split-rows 250000 --output file_sink.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch_export_tests.file_sink_writer import FileSinkWriter  # noqa: E402
+from batch_export_tests.metadata_models import FileSink  # noqa: E402
+
+CASES = {
+    "csv":          {"file_name": "export.csv", "file_format": "csv"},
+    "csv.gz":       {"file_name": "export.csv.gz", "file_format": "csv", "file_compression": "gzip"},
+    "json":         {"file_name": "export.json", "file_format": "json"},
+    "json.gz":      {"file_name": "export.json.gz", "file_format": "json", "file_compression": "gzip"},
+    "parquet":      {"file_name": "export.parquet", "file_format": "parquet"},
+    "parquet.gz":   {"file_name": "export.parquet.gz", "file_format": "parquet", "file_compression": "gzip"},
+}
+
+
+def sample_batches(rows: int, batch_rows: int) -> list[pa.RecordBatch]:
+    start = datetime(2024, 1, 1)
+    table = pa.table({
+        "id": pa.array(range(rows), pa.int64()),
+        "store": pa.array([f"store_{i % 40:03d}" for i in range(rows)]),
+        "article": pa.array([f"article number {i % 5000}" for i in range(rows)]),
+        "quantity": pa.array([(i % 97) / 4 for i in range(rows)], pa.float64()),
+        "updated_at": pa.array([start + timedelta(seconds=i) for i in range(rows)], pa.timestamp("us")),
+    })
+    return table.to_batches(max_chunksize=batch_rows)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="MB/s of FileSinkWriter per output format.")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-rows", type=int, default=65_536, help="rows per incoming record batch")
+    parser.add_argument("--split-rows", type=int, help="file_split_rows for every case")
+    parser.add_argument("--split-columns", help="file_split_columns for every case, e.g. store")
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--output", help="append one JSON line per run to this file")
+    args = parser.parse_args(argv)
+
+    batches = sample_batches(args.rows, args.batch_rows)
+    input_mb = sum(batch.nbytes for batch in batches) / 1e6
+    results = {}
+    for name in args.cases.split(","):
+        sink = FileSink(**CASES[name], file_split_rows=args.split_rows, file_split_columns=args.split_columns)
+        with tempfile.TemporaryDirectory() as directory:
+            started = time.perf_counter()
+            files = FileSinkWriter(sink, directory).write(batches)
+            seconds = time.perf_counter() - started
+        output_mb = sum(f.bytes for f in files) / 1e6
+        results[name] = {
+            "seconds": round(seconds, 3), "files": len(files), "output_mb": round(output_mb, 2),
+            "input_mb_per_s": round(input_mb / seconds, 1), "output_mb_per_s": round(output_mb / seconds, 1),
+        }
+        print(f"{name:<11} {seconds:7.2f}s  {input_mb / seconds:7.1f} MB/s in  "
+              f"{output_mb / seconds:7.1f} MB/s out  {len(files)} files, {output_mb:.1f} MB")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"at": time.time(), "rows": args.rows, "input_mb": round(input_mb, 2), "results": results}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Startup benchmark for the PR-Bot and translator apps.
+
+For each app it measures, in fresh processes:
+  * import time of the app module
+  * time from launching uvicorn to the first 200 from ``GET /ready``
+  * for the PR-Bot, time until the background warm-up has finished
+
+    python benchmarks/startup.py --runs 5 --output startup.jsonl
+
+``--offline`` fills in dummy credentials and in-memory stores so the numbers
+measure the services themselves rather than GitHub; results are appended to
+``--output`` as one JSON line per invocation so they can be tracked over time.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+APPS = {
+    "pr_bot":     "ai_dbt_bot.main",
+    "translator": "ai_dbt_bot.translator_service",
+}
+IMPORT_SNIPPET = (
+    "import importlib, time; t = time.perf_counter(); "
+    "importlib.import_module({module!r}); print(time.perf_counter() - t)"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(module: str, env: dict) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        env=env, check=True, capture_output=True, text=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def ready_seconds(module: str, env: dict, timeout: float) -> tuple[float, float | None]:
+    """Seconds until /ready answers, and until the warm-up is done (when the app has one)."""
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    ready = warmed = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    body = client.get("/ready").json()
+                except httpx.TransportError:
+                    time.sleep(0.01)
+                    continue
+                if ready is None:
+                    ready = time.perf_counter() - started
+                warm_up = body.get("warm_up") or {"mode": "off"}
+                if warm_up["mode"] == "off":
+                    break
+                if warm_up["state"] == "done":
+                    warmed = time.perf_counter() - started
+                    break
+                time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    if ready is None:
+        raise TimeoutError(f"{module} did not become ready within {timeout}s")
+    return ready, warmed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import time and time-to-ready of both FastAPI apps.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--offline", action="store_true", help="dummy credentials, in-memory stores")
+    parser.add_argument("--output", help="append one JSON line per run to this file")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    if args.offline:
+        env.update({
+            "GITHUB_TOKEN": "offline", "GITHUB_REPO": "offline/offline",
+            "SESSION_STORE_URL": "memory://", "LLM_CACHE_PATH": "",
+            "STARTUP_WARMUP": env.get("STARTUP_WARMUP", "off"),
+        })
+
+    results = {}
+    for name, module in APPS.items():
+        runs = []
+        for _ in range(args.runs):
+            ready, warmed = ready_seconds(module, env, args.timeout)
+            runs.append({"import": import_seconds(module, env), "ready": ready, "warmed": warmed})
+        results[name] = runs
+        print(f"{name:<11} " + "  ".join(
+            f"{key} p50={statistics.median(values):.3f}s max={max(values):.3f}s"
+            for key in ("import", "ready", "warmed")
+            if (values := [run[key] for run in runs if run[key] is not None])
+        ))
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"at": time.time(), "offline": args.offline, "results": results}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,6 +21,9 @@ interface PRData {
   [key: string]: any;
 }
 
+// Last preview per PR with its ETag, so re-opening only costs a 304
+const previewCache = new Map<string, { etag: string; data: PRData }>();
+
 export default function PRPreview({ requestId }: { requestId: string }) {
   const [open, setOpen] = useState(false);
   const [loading, setLoading] = useState(false);
@@ -35,11 +38,33 @@ export default function PRPreview({ requestId }: { requestId: string }) {
     }
   }, [open, requestId]);
 
+  // Refetch when GitHub tells the server the PR changed, instead of polling
+  useEffect(() => {
+    if (!open) return;
+    const source = new EventSource(`http://localhost:8000/events?pr_number=${requestId}`);
+    const refresh = () => fetchPRPreview();
+    source.addEventListener('pull_request', refresh);
+    source.addEventListener('push', refresh);
+    return () => source.close();
+  }, [open, requestId]);
+
   async function fetchPRPreview() {
     setLoading(true);
     try {
       const url = `http://localhost:8000/preview/${requestId}`;
-      const res = await axios.get<PRData>(url);
+      const cached = previewCache.get(requestId);
+      const res = await axios.get<PRData>(url, {
+        headers: cached ? { 'If-None-Match': cached.etag } : {},
+        validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+      });
+      if (res.status === 304 && cached) {
+        setPrData(cached.data);
+        return;
+      }
+      const etag = res.headers['etag'];
+      if (etag) {
+        previewCache.set(requestId, { etag, data: res.data });
+      }
       setPrData(res.data);
     } catch (err: any) {
       if (!err.response) {
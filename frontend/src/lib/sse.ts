@@ -0,0 +1,57 @@
+export interface StreamEvent {
+  event: string;
+  data: any;
+}
+
+// POSTs a JSON body and calls onEvent for every Server-Sent Event in the
+// response. EventSource only supports GET, so the stream is parsed by hand.
+export async function postEventStream(
+  url: string,
+  body: unknown,
+  onEvent: (event: StreamEvent) => void,
+  signal?: AbortSignal
+): Promise<void> {
+  const response = await fetch(url, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+    },
+    body: JSON.stringify(body),
+    signal,
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(
+      `API call failed with status ${response.status}: ${await response.text()}`
+    );
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += value;
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      let event = "message";
+      const data: string[] = [];
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data.push(line.slice(6));
+      }
+      // Comment-only blocks are keep-alives
+      if (data.length === 0) continue;
+      const text = data.join("\n");
+      let parsed: any = text;
+      try {
+        parsed = JSON.parse(text);
+      } catch {
+        // plain-text payload
+      }
+      onEvent({ event, data: parsed });
+    }
+  }
+}
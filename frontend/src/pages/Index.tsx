@@ -22,6 +22,7 @@ import {
 } from "lucide-react";
 import { useToast } from "@/hooks/use-toast";
 import PRPreview from "@/components/PRPreview";
+import { postEventStream } from "@/lib/sse";
 
 interface FollowUpRequest {
   id: string;
@@ -41,8 +42,35 @@ interface PullRequest {
   createdAt: Date;
   followUps: FollowUpRequest[];
   isExpanded?: boolean;
+  stage?: string;
+  liveOutput?: string;
 }
 
+interface JobStatus {
+  job_id: string;
+  status: "queued" | "running" | "succeeded" | "failed" | "cancelled";
+  stage?: string | null;
+  pr_url?: string | null;
+  error?: string | null;
+}
+
+const PR_BOT_URL = "http://localhost:8000";
+const TRANSLATOR_URL = "http://localhost:8001";
+
+// The PR-Bot answers with a job id right away; poll it until the PR is ready
+const waitForJob = async (jobId: string): Promise<JobStatus> => {
+  for (;;) {
+    const res = await fetch(`${PR_BOT_URL}/jobs/${jobId}`);
+    if (!res.ok) throw new Error(await res.text());
+    const job: JobStatus = await res.json();
+    if (job.status !== "queued" && job.status !== "running") return job;
+    await new Promise((resolve) => setTimeout(resolve, 1500));
+  }
+};
+
+const prNumberFromUrl = (url: string) =>
+  parseInt(url.split("/").pop() || "0", 10);
+
 const Index: React.FC = () => {
   const [prompt, setPrompt] = useState("");
   const [isSubmitting, setIsSubmitting] = useState(false);
@@ -59,82 +87,79 @@ const Index: React.FC = () => {
     e.preventDefault();
     if (!prompt.trim()) return;
 
+    const newPR: PullRequest = {
+      id: Math.random().toString(36).substr(2, 9),
+      sessionId: "",
+      prompt,
+      status: "processing",
+      stage: "translate",
+      createdAt: new Date(),
+      followUps: [],
+      isExpanded: false,
+    };
+    const patchPR = (changes: Partial<PullRequest>) =>
+      setPullRequests((prs) =>
+        prs.map((pr) => (pr.id === newPR.id ? { ...pr, ...changes } : pr))
+      );
+    const appendOutput = (text: string) =>
+      setPullRequests((prs) =>
+        prs.map((pr) =>
+          pr.id === newPR.id
+            ? { ...pr, liveOutput: ((pr.liveOutput || "") + text).slice(-2000) }
+            : pr
+        )
+      );
+
     setIsSubmitting(true);
+    setPullRequests((prev) => [newPR, ...prev]);
+    setPrompt("");
     try {
-      const response = await fetch(
-        "http://localhost:8001/translate-and-forward/",
-        {
-          method: "POST",
-          headers: {
-            "Content-Type": "application/json",
-            Accept: "application/json",
-          },
-          body: JSON.stringify({ prompt }),
+      // Stage changes and LLM output arrive as Server-Sent Events
+      let finished = false;
+      await postEventStream(
+        `${TRANSLATOR_URL}/translate-and-forward/stream`,
+        { prompt: newPR.prompt },
+        ({ event, data }) => {
+          switch (event) {
+            case "stage":
+              patchPR({ stage: data.name, liveOutput: "" });
+              break;
+            case "token":
+              appendOutput(data.text);
+              break;
+            case "reset":
+              // The backend dropped the attempt streamed so far and starts over
+              patchPR({ liveOutput: "" });
+              break;
+            case "queued":
+              patchPR({ sessionId: data.session_id });
+              break;
+            case "done":
+              finished = true;
+              patchPR({
+                status: "completed",
+                stage: undefined,
+                liveOutput: undefined,
+                pullRequestUrl: data.pr_url ?? undefined,
+                prNumber: data.pr_url ? prNumberFromUrl(data.pr_url) : undefined,
+              });
+              break;
+            case "error":
+              finished = true;
+              throw new Error(data.error || "Pull request was not created.");
+          }
         }
       );
-      if (!response.ok) {
-        const errorText = await response.text();
-        throw new Error(
-          `API call failed with status ${response.status}: ${errorText}`
-        );
+      if (!finished) {
+        throw new Error("Stream ended before the pull request was created.");
       }
-      const data = await response.json();
-      console.log("API Response data:", data);
-
-      // 1) Extract the full PR URL
-      const urlMatch = data.message.match(/https?:\/\/\S+\/pull\/\d+/);
-      const pullRequestUrl = urlMatch ? urlMatch[0] : "";
-
-      // 2) Extract session_id if provided
-      let sessionId = data.session_id;
-      if (!sessionId) {
-        const sessMatch = data.message.match(/session_id=([\w-]+)/);
-        sessionId = sessMatch ? sessMatch[1] : "";
-      }
-
-      // 3) Derive the numeric PR number for preview
-      const prNumber = pullRequestUrl
-        ? parseInt(pullRequestUrl.split("/").pop() || "0", 10)
-        : undefined;
-
-      const newPR: PullRequest = {
-        id: Math.random().toString(36).substr(2, 9),
-        sessionId,
-        prompt,
-        status: "pending",
-        pullRequestUrl,
-        prNumber,
-        createdAt: new Date(),
-        followUps: [],
-        isExpanded: false,
-      };
-
-      setPullRequests((prev) => [newPR, ...prev]);
-      setPrompt("");
       toast({
-        title: "Request submitted!",
-        description: "Your pull request is being generated.",
+        title: "Pull request ready!",
+        description: "Your draft pull request has been created.",
       });
-
-      // If we got a PR URL immediately, mark it completed
-      if (pullRequestUrl) {
-        updatePRStatus(newPR.id, "completed");
-      } else {
-        // otherwise simulate a processing flow
-        setTimeout(() => updatePRStatus(newPR.id, "processing"), 2000);
-        setTimeout(() => {
-          const fakeUrl = `http://localhost:8001/preview/${newPR.id}`;
-          setPullRequests((prs) =>
-            prs.map((pr) =>
-              pr.id === newPR.id
-                ? { ...pr, status: "completed", pullRequestUrl: fakeUrl }
-                : pr
-            )
-          );
-        }, 8000);
-      }
     } catch (error: any) {
       console.error("Error in handleSubmit:", error);
+      patchPR({ status: "error", stage: undefined });
       const isNetworkError =
         error instanceof TypeError && error.message.includes("fetch");
       toast({
@@ -159,7 +184,7 @@ const Index: React.FC = () => {
       if (!pr) return;
 
       const response = await fetch(
-        "http://localhost:8001/translate-and-forward/",
+        `${TRANSLATOR_URL}/translate-and-forward/`,
         {
           method: "POST",
           headers: {
@@ -198,15 +223,17 @@ const Index: React.FC = () => {
 
       if (data.pullRequestUrl) {
         updateFollowUpStatus(prId, newFollowUp.id, "completed");
-      } else {
-        setTimeout(
-          () => updateFollowUpStatus(prId, newFollowUp.id, "processing"),
-          1500
-        );
-        setTimeout(
-          () => updateFollowUpStatus(prId, newFollowUp.id, "completed"),
-          6000
-        );
+      } else if (data.job_id) {
+        updateFollowUpStatus(prId, newFollowUp.id, "processing");
+        waitForJob(data.job_id)
+          .then((job) =>
+            updateFollowUpStatus(
+              prId,
+              newFollowUp.id,
+              job.status === "succeeded" ? "completed" : "error"
+            )
+          )
+          .catch(() => updateFollowUpStatus(prId, newFollowUp.id, "error"));
       }
     } catch (error: any) {
       console.error("Error in handleFollowUpSubmit:", error);
@@ -440,9 +467,16 @@ const Index: React.FC = () => {
                       <div className="flex items-center space-x-2 text-sm text-slate-400">
                         <Loader2 className="h-4 w-4 animate-spin" />
                         <span>
-                          Analyzing prompt and generating code changes...
+                          {pr.stage
+                            ? `Working on: ${pr.stage.replace("_", " ")}...`
+                            : "Analyzing prompt and generating code changes..."}
                         </span>
                       </div>
+                      {pr.liveOutput && (
+                        <pre className="mt-2 max-h-40 overflow-auto whitespace-pre-wrap text-xs text-slate-500 font-mono">
+                          {pr.liveOutput}
+                        </pre>
+                      )}
                       <div className="mt-2 w-full bg-slate-700 rounded-full h-2">
                         <div
                           className="h-2 rounded-full animate-pulse"
@@ -0,0 +1,320 @@
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+# Characters of chunk text sent per request; the outline of the rest is extra
+CHUNK_BUDGET_CHARS = int(os.getenv("CHUNK_BUDGET_CHARS", "8000"))
+
+CHUNK_RE = re.compile(r"^<<<CHUNK (.+?)>>>\n(.*?)\n?<<<END>>>$", re.MULTILINE | re.DOTALL)
+WORD_RE = re.compile(r"[a-z_][a-z0-9_]*")
+WITH_RE = re.compile(r"with(\s+recursive)?\b", re.IGNORECASE)
+SELECT_RE = re.compile(r"select\b", re.IGNORECASE)
+NAME_RE = re.compile(r'("[^"]+"|`[^`]+`|\w+)')
+AS_RE = re.compile(r"as\b", re.IGNORECASE)
+MATERIALIZED_RE = re.compile(r"(not\s+)?materialized\b", re.IGNORECASE)
+ITEM_RE = re.compile(r"\s*-\s*name:\s*['\"]?([^'\"#\s]+)")
+# Words that say what to do rather than where to do it
+STOPWORDS = {
+    "a", "add", "an", "and", "as", "be", "by", "change", "column", "columns", "cte", "field", "fields",
+    "file", "for", "from", "in", "into", "is", "it", "make", "model", "new", "of", "on", "or",
+    "please", "remove", "rename", "select", "sql", "sure", "that", "the", "this", "to", "update",
+    "with", "yaml", "yml",
+}
+
+
+@dataclass
+class Chunk:
+    name: str
+    start: int
+    end: int
+    text: str
+    # Chunks of one group (a YAML model and its columns) are selected together
+    group: str | None = None
+
+
+def _skip(sql: str, i: int) -> int | None:
+    """End of the string, comment or Jinja tag starting at ``i``, or None."""
+    two = sql[i:i + 2]
+    if two in ("{{", "{%", "{#"):
+        close = {"{{": "}}", "{%": "%}", "{#": "#}"}[two]
+        end = sql.find(close, i + 2)
+        return len(sql) if end < 0 else end + 2
+    if two == "--":
+        end = sql.find("\n", i)
+        return len(sql) if end < 0 else end
+    if two == "/*":
+        end = sql.find("*/", i + 2)
+        return len(sql) if end < 0 else end + 2
+    if sql[i] in "'\"`":
+        quote, j = sql[i], i + 1
+        while j < len(sql):
+            if sql[j] == quote:
+                if sql[j + 1:j + 2] == quote:
+                    j += 2
+                    continue
+                return j + 1
+            j += 1
+        return len(sql)
+    return None
+
+
+def _skip_space(sql: str, i: int) -> int:
+    while i < len(sql):
+        if sql[i].isspace():
+            i += 1
+        elif sql[i:i + 2] in ("--", "/*", "{#"):
+            i = _skip(sql, i)
+        else:
+            break
+    return i
+
+
+def _matching_paren(sql: str, open_idx: int) -> int:
+    depth, i = 0, open_idx
+    while i < len(sql):
+        end = _skip(sql, i)
+        if end is not None:
+            i = end
+            continue
+        if sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise ValueError("Unbalanced parentheses")
+
+
+def _top_level_with(sql: str) -> int | None:
+    """Index just after the top-level ``with`` keyword, if the query has one."""
+    depth, i = 0, 0
+    while i < len(sql):
+        end = _skip(sql, i)
+        if end is not None:
+            i = end
+            continue
+        c = sql[i]
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif depth == 0 and c in "wWsS" and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+            match = WITH_RE.match(sql, i)
+            if match:
+                return match.end()
+            if SELECT_RE.match(sql, i):
+                # A select before any with: there is nothing to split
+                return None
+        i += 1
+    return None
+
+
+def split_sql(sql: str) -> list[Chunk]:
+    """Header (config and ``with``), one chunk per CTE, then the final select."""
+    whole = [Chunk("file", 0, len(sql), sql)]
+    try:
+        i = _top_level_with(sql)
+        if i is None:
+            return whole
+        chunks = []
+        header_end = None
+        while True:
+            i = _skip_space(sql, i)
+            match = NAME_RE.match(sql, i)
+            if not match:
+                return whole
+            name_start, name = i, match.group(1).strip('"`')
+            header_end = name_start if header_end is None else header_end
+            i = _skip_space(sql, match.end())
+            if sql[i:i + 1] == "(":
+                # Column list: name (a, b) as (...)
+                i = _skip_space(sql, _matching_paren(sql, i) + 1)
+            match = AS_RE.match(sql, i)
+            if not match:
+                return whole
+            i = _skip_space(sql, match.end())
+            match = MATERIALIZED_RE.match(sql, i)
+            if match:
+                i = _skip_space(sql, match.end())
+            if sql[i:i + 1] != "(":
+                return whole
+            close = _matching_paren(sql, i)
+            chunks.append(Chunk(f"cte {name}", name_start, close + 1, sql[name_start:close + 1]))
+            i = _skip_space(sql, close + 1)
+            if sql[i:i + 1] != ",":
+                break
+            i += 1
+    except ValueError:
+        return whole
+    final_start = i
+    header = [Chunk("header", 0, header_end, sql[:header_end])] if sql[:header_end].strip() else []
+    final = Chunk("final select", final_start, len(sql), sql[final_start:])
+    return header + chunks + [final]
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def _item_name(line: str) -> str | None:
+    match = ITEM_RE.match(line)
+    return match.group(1) if match else None
+
+
+def split_yaml(text: str) -> list[Chunk]:
+    """Top-level header, then per model: its own keys and one chunk per column."""
+    lines = text.splitlines(keepends=True)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+
+    # (line index, name, group) where a new chunk starts
+    starts = [(0, "header", None)]
+    names = {}
+    model_indent = column_indent = None
+    model = None
+    in_columns = False
+    for n, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = _indent(line)
+        if indent == 0:
+            model_indent, model, in_columns = None, None, False
+            if not stripped.startswith("-") and n > 0 and starts[-1][2] is not None:
+                starts.append((n, "header", None))
+            continue
+        item = _item_name(line)
+        if item and (model_indent is None or indent == model_indent):
+            model_indent, model, in_columns, column_indent = indent, item, False, None
+            starts.append((n, f"model {item}", item))
+        elif model is None:
+            continue
+        elif item and in_columns and (column_indent is None or indent == column_indent):
+            column_indent = indent
+            starts.append((n, f"column {model}.{item}", model))
+        elif indent <= model_indent + 2 and not stripped.startswith("-"):
+            was_in_columns = in_columns
+            in_columns = stripped.startswith("columns:")
+            if was_in_columns:
+                starts.append((n, f"model {model} (rest)", model))
+
+    chunks = []
+    for k, (n, name, group) in enumerate(starts):
+        end_line = starts[k + 1][0] if k + 1 < len(starts) else len(lines)
+        if end_line <= n:
+            continue
+        count = names[name] = names.get(name, 0) + 1
+        label = name if count == 1 else f"{name} #{count}"
+        start, end = offsets[n], offsets[end_line]
+        chunks.append(Chunk(label, start, end, text[start:end], group))
+    return chunks
+
+
+def split_chunks(text: str, path: str) -> list[Chunk]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".sql":
+        return split_sql(text)
+    if ext in (".yml", ".yaml"):
+        return split_yaml(text)
+    return [Chunk("file", 0, len(text), text)]
+
+
+def _words(text: str) -> set[str]:
+    return set(WORD_RE.findall(text.lower())) - STOPWORDS
+
+
+def select_chunks(chunks: list[Chunk], prompt: str, budget: int = CHUNK_BUDGET_CHARS) -> list[Chunk]:
+    """
+    The chunks the prompt is about, best first, within ``budget`` characters.
+
+    Chunks the prompt names (a CTE, a model, a column) come first, followed
+    by the chunks that use them. If nothing is named, chunks are ranked by the
+    prompt words they contain, rarer words counting more. For YAML, the last
+    chunk of every selected model comes along so new columns have a place to go.
+    Returns an empty list when nothing matches.
+    """
+    wanted = _words(prompt)
+    if len(chunks) < 2 or not wanted:
+        return []
+    texts = [_words(chunk.text) & wanted for chunk in chunks]
+    named = [i for i, chunk in enumerate(chunks) if _words(chunk.name) & wanted]
+    if named:
+        anchors = set().union(*(_words(chunks[i].name) & wanted for i in named))
+        ranked = named + [i for i, found in enumerate(texts) if i not in named and found & anchors]
+    else:
+        df = Counter(word for found in texts for word in found)
+        scores = {i: sum(math.log(len(chunks) / df[w]) for w in found) for i, found in enumerate(texts) if found}
+        top = max(scores.values(), default=0.0)
+        if top <= 0:
+            return []
+        ranked = sorted((i for i, score in scores.items() if score >= top / 2), key=lambda i: -scores[i])
+
+    picked, used = set(), 0
+    for index in ranked:
+        size = len(chunks[index].text)
+        if picked and used + size > budget:
+            continue
+        picked.add(index)
+        used += size
+
+    groups = {chunks[i].group for i in picked if chunks[i].group}
+    for group in groups:
+        last = max(i for i, chunk in enumerate(chunks) if chunk.group == group)
+        if last not in picked and used + len(chunks[last].text) <= budget:
+            picked.add(last)
+            used += len(chunks[last].text)
+    if len(picked) == len(chunks):
+        return []
+    return [chunks[i] for i in sorted(picked)]
+
+
+def _line_range(text: str, chunk: Chunk) -> str:
+    first = text.count("\n", 0, chunk.start) + 1
+    last = first + chunk.text.rstrip("\n").count("\n")
+    return f"lines {first}-{last}"
+
+
+def render_chunk_request(text: str, path: str, chunks: list[Chunk], selected: list[Chunk]) -> str:
+    """Outline of the whole file followed by the full text of the selected chunks."""
+    shown = {chunk.name for chunk in selected}
+    outline = "\n".join(
+        f"{'*' if chunk.name in shown else '-'} {chunk.name} ({_line_range(text, chunk)})"
+        for chunk in chunks
+    )
+    body = "\n".join(f"<<<CHUNK {chunk.name}>>>\n{chunk.text.rstrip(chr(10))}\n<<<END>>>" for chunk in selected)
+    return f"File: {path}\nOutline (* = included below):\n{outline}\n\n{body}\n"
+
+
+def parse_chunk_reply(reply: str, selected: list[Chunk]) -> dict[str, str]:
+    """Updated chunk texts by name; raises ValueError for an empty or unexpected reply."""
+    allowed = {chunk.name for chunk in selected}
+    edits = {}
+    for name, body in CHUNK_RE.findall(reply):
+        name = name.strip()
+        if name not in allowed:
+            raise ValueError(f"Reply edits chunk '{name}', which was not sent")
+        edits[name] = body
+    if not edits:
+        raise ValueError("Reply contains no chunks")
+    return edits
+
+
+def splice_chunks(text: str, chunks: list[Chunk], edits: dict[str, str]) -> str:
+    """``text`` with every edited chunk replaced, keeping the glue between chunks."""
+    parts, pos = [], 0
+    for chunk in chunks:
+        parts.append(text[pos:chunk.start])
+        edited = edits.get(chunk.name)
+        if edited is None:
+            parts.append(chunk.text)
+        else:
+            # Keep the chunk's trailing whitespace so the next chunk still lines up
+            trailing = chunk.text[len(chunk.text.rstrip()):]
+            parts.append(edited.rstrip() + trailing)
+        pos = chunk.end
+    parts.append(text[pos:])
+    return "".join(parts)
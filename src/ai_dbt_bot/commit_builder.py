@@ -0,0 +1,87 @@
+from github import InputGitTreeElement
+
+# Blob mode for regular (non-executable) files
+FILE_MODE = "100644"
+
+READ_QUERY = """
+query($owner: String!, $name: String!, {params}) {{
+  repository(owner: $owner, name: $name) {{
+{fields}
+  }}
+}}
+"""
+
+
+class CommitBuilder:
+    """
+    Collects updated file contents for one branch and writes them as a single
+    commit through the Git Data API.
+
+    A commit costs the same handful of calls however many files it touches:
+    read the ref, read its commit, create one tree (contents are sent inline,
+    so GitHub creates the blobs server-side), create one commit, move the ref.
+    """
+
+    def __init__(self, repo, branch: str):
+        self.repo = repo
+        self.branch = branch
+        self.originals = {}
+        self.staged = {}
+
+    def read(self, paths: list[str]) -> dict[str, str]:
+        """Fetch the text of every path at the branch head in one GraphQL call."""
+        requested = list(dict.fromkeys(paths))
+        paths = [p for p in requested if p not in self.originals]
+        if paths:
+            owner, name = self.repo.full_name.split("/", 1)
+            variables = {"owner": owner, "name": name}
+            params, fields = [], []
+            for i, path in enumerate(paths):
+                variables[f"e{i}"] = f"{self.branch}:{path}"
+                params.append(f"$e{i}: String!")
+                fields.append(f"    f{i}: object(expression: $e{i}) {{ ... on Blob {{ text isTruncated isBinary }} }}")
+            query = READ_QUERY.format(params=", ".join(params), fields="\n".join(fields))
+            _, data = self.repo._requester.graphql_query(query, variables)
+            found = data["data"]["repository"]
+            for i, path in enumerate(paths):
+                blob = found.get(f"f{i}")
+                if blob is None:
+                    raise FileNotFoundError(f"File '{path}' not found on branch '{self.branch}'.")
+                if blob.get("isBinary"):
+                    raise ValueError(f"File '{path}' on branch '{self.branch}' is binary and cannot be edited.")
+                if blob.get("isTruncated") or blob.get("text") is None:
+                    # GraphQL cuts large blobs short; the contents API serves files up to 1 MB
+                    self.originals[path] = self._read_large(path)
+                else:
+                    self.originals[path] = blob["text"]
+        return {p: self.originals[p] for p in requested}
+
+    def _read_large(self, path: str) -> str:
+        contents = self.repo.get_contents(path, ref=self.branch)
+        if contents.encoding != "base64":
+            raise ValueError(f"File '{path}' on branch '{self.branch}' is too large to edit.")
+        return contents.decoded_content.decode("utf-8")
+
+    def stage(self, path: str, content: str) -> None:
+        # Unchanged files would only add noise to the tree
+        if self.originals.get(path) == content:
+            self.staged.pop(path, None)
+            return
+        self.staged[path] = content
+
+    def commit(self, message: str) -> str | None:
+        """Write every staged file as one commit; returns its SHA, or None if nothing changed."""
+        if not self.staged:
+            return None
+        ref = self.repo.get_git_ref(f"heads/{self.branch}")
+        parent = self.repo.get_git_commit(ref.object.sha)
+        elements = [
+            InputGitTreeElement(path=path, mode=FILE_MODE, type="blob", content=content)
+            for path, content in sorted(self.staged.items())
+        ]
+        tree = self.repo.create_git_tree(elements, base_tree=parent.tree)
+        commit = self.repo.create_git_commit(message, tree, [parent])
+        ref.edit(commit.sha)
+        self.originals.update(self.staged)
+        self.staged = {}
+        return commit.sha
@@ -1,28 +1,63 @@
 # in src/ai_dbt_bot/dbt_modifier.py
+import os
 from pathlib import Path
-import subprocess
+import re
 from typing import Tuple
+from .patch_engine import PatchError, apply_hunks, apply_to_tree, diff_lines, parse_patch
+
+# Set to write every patch to <repo>/last_diff.patch before it is applied
+PATCH_DEBUG = os.getenv("PATCH_DEBUG", "") not in ("", "0", "false")
 
 def apply_patch(repo_path: Path, diff_text: str) -> Tuple[bool, str]:
-    # DEBUG: dump the patch
-    debug_file = repo_path / "last_diff.patch"
-    debug_file.write_text(diff_text)
-
-    # try a dry-run check first
-    check = subprocess.run(
-        ["git", "apply", "--check", "-"],
-        cwd=repo_path,
-        input=diff_text.encode(),
-        capture_output=True,
-    )
-    if check.returncode != 0:
-        return False, check.stderr.decode()
-
-    # actually apply
-    p = subprocess.run(
-        ["git", "apply", "--unidiff-zero", "-"],
-        cwd=repo_path,
-        input=diff_text.encode(),
-        capture_output=True,
-    )
-    return (p.returncode == 0, p.stderr.decode() or p.stdout.decode())
+    """Apply a unified diff to the files under ``repo_path``, all hunks or none.
+
+    Returns ``(ok, message)``; the message names every rejected hunk.
+    """
+    if PATCH_DEBUG:
+        (Path(repo_path) / "last_diff.patch").write_text(diff_text)
+    try:
+        result = apply_to_tree(Path(repo_path), diff_text)
+    except PatchError as e:
+        return False, str(e)
+    return result.ok, result.summary()
+
+
+
+def normalize_diff(diff_text: str, path: str) -> str:
+    """Strip markdown fences and point the ---/+++ headers at ``path``."""
+    lines = [l for l in diff_text.strip().splitlines() if not l.startswith("```")]
+    # A removed SQL comment also starts with "--- "; only pairs outside a hunk body are headers
+    kinds = dict(diff_lines(lines))
+    out = []
+    for i, line in enumerate(lines):
+        if kinds.get(i) == "file":
+            line = f"--- a/{path}"
+        elif kinds.get(i - 1) == "file":
+            line = f"+++ b/{path}"
+        elif kinds[i] is None and line.startswith(("diff --git ", "index ")):
+            continue
+        out.append(line)
+    if "file" not in kinds.values():
+        out[:0] = [f"--- a/{path}", f"+++ b/{path}"]
+    return "\n".join(out) + "\n"
+
+
+def apply_patch_to_text(original: str, diff_text: str, path: str) -> Tuple[bool, str]:
+    """Apply a single-file diff to ``original`` with apply_patch semantics.
+
+    Returns ``(True, updated_text)`` or ``(False, error)``; a diff that
+    leaves the text as it was counts as a failure.
+    """
+    if not re.search(r"^@@ ", diff_text, flags=re.MULTILINE):
+        return False, "no hunks in diff"
+    try:
+        patches = parse_patch(normalize_diff(diff_text, path))
+    except PatchError as e:
+        return False, str(e)
+    hunks = [hunk for patch in patches for hunk in patch.hunks]
+    updated, _, rejected = apply_hunks(original, hunks, path)
+    if rejected:
+        return False, "\n".join(f"hunk #{r.hunk} ({r.header}) rejected: {r.reason}" for r in rejected)
+    if updated == original:
+        return False, "diff applied but changed nothing"
+    return True, updated
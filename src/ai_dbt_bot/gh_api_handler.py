@@ -1,11 +1,22 @@
+import functools
 import os
 import re
 import uuid
-import subprocess
-import difflib
 from dotenv import load_dotenv
-from github import Github
 import openai
+from .chunking import split_chunks, select_chunks, render_chunk_request, parse_chunk_reply, splice_chunks
+from .commit_builder import CommitBuilder
+from .dbt_modifier import apply_patch_to_text
+from .github_client import get_client, priority, HIGH
+from .llm_cache import ResponseCache
+from .llm_engine import safe_chat_completion, map_bounded
+from .manifest_index import ManifestIndex
+from .metrics import span
+from .preview_cache import PreviewCache
+from .repo_index import RepoTreeIndex
+from .session_store import open_session_store
+from .sql_formatter import SqlFormatter
+from .startup import lazy
 
 # Load environment variables
 load_dotenv()
@@ -16,70 +27,210 @@ openai.api_key = os.getenv("OPENAI_API_KEY")
 # Configure GitHub credentials
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 REPO_NAME    = os.getenv("GITHUB_REPO")
-if not GITHUB_TOKEN or not REPO_NAME:
-    raise EnvironmentError("GITHUB_TOKEN and GITHUB_REPO must be set in environment")
 
-# Initialize GitHub client
-gh   = Github(GITHUB_TOKEN, verify=False)
-repo = gh.get_repo(REPO_NAME)
-DEFAULT_BRANCH = repo.default_branch
 
-# In-memory session map
-session_pr_map = {}
+def _connect():
+    if not GITHUB_TOKEN or not REPO_NAME:
+        raise EnvironmentError("GITHUB_TOKEN and GITHUB_REPO must be set in environment")
+    # Shared rate-limit budget, see github_client.py
+    gh = get_client(GITHUB_TOKEN, verify=False)
+    return gh.get_repo(REPO_NAME)
+
+
+# Nothing below talks to GitHub or opens files at import time; each object is
+# built on first use, or ahead of time by WARM_UP_STEPS
+get_repo = lazy(_connect)
+
+
+def default_branch() -> str:
+    return get_repo().default_branch
+
+
+# Caches check the head on every use unless told otherwise; raise these once
+# webhook deliveries invalidate them
+CACHE_CHECK_DEFAULT = "0"
+
+# Tree of the default branch, shared by every session and re-fetched only when the head moves
+get_tree_index = lazy(lambda: RepoTreeIndex(
+    get_repo(), default_branch(),
+    check_interval=float(os.getenv("REPO_TREE_CHECK_SECONDS", CACHE_CHECK_DEFAULT)),
+))
+
+# dbt model -> SQL and schema YAML paths, from target/manifest.json when present
+manifest_index = ManifestIndex()
+
+# LLM responses keyed by model, system message, prompt and file content
+get_response_cache = lazy(ResponseCache)
+
+# Warm sqlfluff linter shared by all requests
+sql_formatter = SqlFormatter()
+
+# PR number -> changed files shown by /preview, revalidated with conditional requests
+get_preview_cache = lazy(lambda: PreviewCache(
+    get_repo(),
+    check_interval=float(os.getenv("PREVIEW_CHECK_SECONDS", CACHE_CHECK_DEFAULT)),
+))
+
+# Session id -> draft PR, kept across restarts (see SESSION_STORE_URL)
+get_session_store = lazy(open_session_store)
+
 # Confirmation keywords
 CONFIRM_KEYWORDS = {"confirm", "ready", "approve", "looks good"}
 
 
 def find_repo_file_paths(suffix: str) -> list:
-    tree = repo.get_git_tree(DEFAULT_BRANCH, recursive=True).tree
-    return [item.path for item in tree if item.path.lower().endswith(suffix.lower())]
+    return get_tree_index().paths(suffix, under_prefix=False)
 
 
 def run_sqlfluff_fix(sql_content: str, filename: str) -> str:
-    proc = subprocess.run(
-        ["sqlfluff", "fix", "-", "--dialect", "bigquery", "--stdin-filename", filename],
-        input=sql_content.encode(), stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    if proc.returncode != 0:
-        print(f"Warning: SQLFluff fix skipped for {filename}: {proc.stderr.decode()}")
-        return sql_content
-    return proc.stdout.decode()
+    with span("sqlfluff", path=filename):
+        return sql_formatter.fix(sql_content, filename)
+
+
+# "diff" asks the LLM for a unified diff and only falls back to a full rewrite
+# when the diff does not apply; "full" always asks for the whole file
+GENERATION_MODE = os.getenv("GENERATION_MODE", "diff")
+
+DIFF_INSTRUCTION = (
+    "Respond ONLY with a unified diff of this file: '--- a/{path}' and '+++ b/{path}' "
+    "headers followed by @@ hunks with 3 lines of unchanged context. "
+    "Do not output the unchanged rest of the file."
+)
+
 
+# Files at least this long are edited chunk by chunk: only the CTEs / YAML blocks
+# the request is about are sent, with an outline of the rest
+CHUNKED_EDIT_MIN_CHARS = int(os.getenv("CHUNKED_EDIT_MIN_CHARS", "12000"))
 
-def generate_updated_content(original: str, prompt: str, file_type: str, target_path: str) -> str:
+CHUNK_INSTRUCTION = (
+    "Only some chunks of the file are shown; the outline lists the rest, which must stay unchanged. "
+    "Respond ONLY with the chunks you change, each as a '<<<CHUNK name>>>' line, "
+    "the chunk's full updated text, then a '<<<END>>>' line. "
+    "New CTEs, columns or entries go inside the chunk they follow."
+)
+
+
+@functools.cache
+def load_system_message() -> str:
     with open(os.path.join(os.path.dirname(__file__), "system_message.txt"), "r", encoding="utf-8") as f:
-        static_message = f.read().strip()
-    system_message = (
-        f"{static_message} User request: '{prompt}'. Provide the full updated content of this file."
-    )
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system_message},
-            {"role": "user",   "content": original}
-        ],
-        temperature=0
-    )
-    updated = response.choices[0].message.content.strip()
+        return f.read().strip()
+
+
+def cached_completion(cache_system: str, system_message: str, prompt: str, content: str, on_token=None) -> str:
+    """One chat completion, served from ``response_cache`` when the same request was seen before."""
+    messages = [
+        {"role": "system", "content": system_message},
+        {"role": "user",   "content": content}
+    ]
+
+    def complete() -> str:
+        if on_token is None:
+            response = safe_chat_completion(model="gpt-4o-mini", messages=messages, temperature=0)
+            return response.choices[0].message.content.strip()
+        parts = []
+        for chunk in safe_chat_completion(model="gpt-4o-mini", messages=messages, temperature=0, stream=True):
+            text = chunk.choices[0].delta.get("content")
+            if text:
+                parts.append(text)
+                on_token(text)
+        return "".join(parts).strip()
+
+    response_cache = get_response_cache()
+    key = response_cache.key("gpt-4o-mini", cache_system, prompt, content)
+    result = response_cache.get(key)
+    if result is None:
+        result = complete()
+        response_cache.put(key, result)
+    elif on_token is not None:
+        on_token(result)
+    return result
+
+
+def generate_updated_content(original: str, prompt: str, file_type: str, target_path: str, on_token=None) -> str:
+    """Rewrite one file per the prompt; ``on_token`` receives the output as it streams in.
+
+    When a chunked edit or a diff does not apply, ``on_token(None)`` tells the
+    listener to discard what was streamed before the next attempt starts.
+    """
+    static_message = load_system_message()
+    updated = None
+    streamed = False
+
+    def emit(text):
+        nonlocal streamed
+        streamed = True
+        on_token(text)
+
+    def discard_streamed():
+        nonlocal streamed
+        if streamed:
+            on_token(None)
+            streamed = False
+
+    sink = on_token and emit
+
+    if len(original) >= CHUNKED_EDIT_MIN_CHARS:
+        chunks = split_chunks(original, target_path)
+        selected = select_chunks(chunks, prompt)
+        if selected:
+            reply = cached_completion(
+                f"{static_message}\n{CHUNK_INSTRUCTION}",
+                f"{static_message} User request: '{prompt}'. {CHUNK_INSTRUCTION}",
+                prompt, render_chunk_request(original, target_path, chunks, selected), sink,
+            )
+            try:
+                updated = splice_chunks(original, chunks, parse_chunk_reply(reply, selected)).strip()
+            except ValueError as e:
+                print(f"Warning: chunked edit of {target_path} failed, editing the whole file: {e}")
+                discard_streamed()
+
+    if updated is None and GENERATION_MODE == "diff" and original.strip():
+        instruction = DIFF_INSTRUCTION.format(path=target_path)
+        diff_text = cached_completion(
+            f"{static_message}\n{instruction}",
+            f"{static_message} User request: '{prompt}'. {instruction}",
+            prompt, original, sink,
+        )
+        ok, result = apply_patch_to_text(original, diff_text, target_path)
+        if ok:
+            updated = result.strip()
+        else:
+            print(f"Warning: patch for {target_path} did not apply, rewriting whole file: {result}")
+            discard_streamed()
+
+    if updated is None:
+        updated = cached_completion(
+            static_message,
+            f"{static_message} User request: '{prompt}'. Provide the full updated content of this file.",
+            prompt, original, sink,
+        )
     if file_type.lower() == 'sql':
         updated = run_sqlfluff_fix(updated, target_path)
     return updated
 
 
+SUMMARY_SYSTEM_MESSAGE = (
+    "You are a helpful assistant that writes concise PR titles "
+    "(max 60 chars) summarizing the request."
+)
+
+
 def generate_summary(prompt: str) -> str:
-    response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": (
-                "You are a helpful assistant that writes concise PR titles "
-                "(max 60 chars) summarizing the request."
-            )},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0,
-        max_tokens=20
-    )
-    title = response.choices[0].message.content.strip().strip('"')
+    def complete() -> str:
+        response = safe_chat_completion(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": SUMMARY_SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0,
+            max_tokens=20
+        )
+        return response.choices[0].message.content.strip().strip('"')
+
+    response_cache = get_response_cache()
+    key = response_cache.key("gpt-4o-mini", SUMMARY_SYSTEM_MESSAGE, prompt, max_tokens=20)
+    title = response_cache.get_or_create(key, complete)
     return title or "Update files"
 
 
@@ -87,6 +238,7 @@ def mark_pr_ready(pr) -> str:
     path = f"/repos/{REPO_NAME}/pulls/{pr.number}"
     payload = {"draft": False}
     headers = {"Accept": "application/vnd.github.shadow-cat-preview+json"}
+    repo = get_repo()
     repo._requester.requestJsonAndCheck(
         "PATCH",
         path,
@@ -97,89 +249,241 @@ def mark_pr_ready(pr) -> str:
     return updated.html_url
 
 
-def create_or_update_pr(session_id: str, analyst_prompt: str, file_names    : list[str] | None = None) -> str:
+def target_file_names(analyst_prompt: str, file_names: list[str] | None = None) -> list[str]:
+    # If the caller gave us explicit filenames, use those; otherwise fall back to regex
+    if file_names:
+        return list(file_names)
+    raw_files = re.findall(
+        r"\b[\w/\-\.]\.(?:sql|yml|yaml|md|py|json|csv)\b",
+        analyst_prompt,
+        flags=re.IGNORECASE
+    )
+    if not raw_files:
+        raise ValueError("No target files found; include file names with extensions.")
+    return list(raw_files)
+
+
+def resolve_targets(file_names: list[str]) -> list[tuple[str, str]]:
+    """Repository ``(path, extension)`` pairs for the requested names, without duplicates."""
+    with span("resolve", names=len(file_names)):
+        return _resolve_targets(file_names)
+
+
+def _resolve_targets(file_names: list[str]) -> list[tuple[str, str]]:
+    # Resolvers over files under models/, rebuilt only when the tree changes
+    tree_index   = get_tree_index()
+    sql_resolver = tree_index.resolver('.sql')
+    yml_resolver = tree_index.resolver('.yml', '.yaml')
+
+    targets = []
+    def add_target(path):
+        if all(path != p for p, _ in targets):
+            targets.append((path, os.path.splitext(path)[1]))
+
+    for name in file_names:
+        ext = os.path.splitext(name)[1].lower()
+        # A dbt model resolves to its SQL file and schema YAML in one manifest lookup,
+        # as long as the manifest still agrees with the repo tree
+        model = manifest_index.get(name) if ext in ('', '.sql', '.yml', '.yaml') else None
+        if model is not None and model.sql_path in sql_resolver.exact(model.sql_path):
+            yml_path = model.yml_path if model.yml_path and model.yml_path in yml_resolver.exact(model.yml_path) else None
+            if ext in ('', '.sql'):
+                add_target(model.sql_path)
+            if yml_path:
+                add_target(yml_path)
+            if ext in ('', '.sql') or yml_path:
+                continue
+
+        # Otherwise resolve by file name: exact name, path suffix, then fuzzy
+        resolver = sql_resolver if ext=='.sql' else yml_resolver
+        candidates = resolver.resolve(name, limit=1)
+        if not candidates:
+            raise FileNotFoundError(f"File '{os.path.basename(name)}' not found in models/ or via fuzzy match.")
+        add_target(candidates[0])
+    return targets
+
+
+def merge_prompts(prompts: list[str]) -> str:
+    """One instruction covering every prompt, so a file is generated once for all of them."""
+    prompts = list(dict.fromkeys(p.strip() for p in prompts if p.strip()))
+    if len(prompts) == 1:
+        return prompts[0]
+    numbered = "\n".join(f"{i}. {p}" for i, p in enumerate(prompts, 1))
+    return f"Apply all of the following changes:\n{numbered}"
+
+
+def new_session_branch() -> str:
+    repo        = get_repo()
+    branch_name = f"api/{uuid.uuid4().hex[:6]}"
+    main_ref    = repo.get_git_ref(f"heads/{default_branch()}")
+    repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=main_ref.object.sha)
+    return branch_name
+
+
+def delete_session_branch(branch_name: str) -> None:
+    """Remove a branch created for a request that failed, so it is not left behind."""
+    try:
+        get_repo().get_git_ref(f"heads/{branch_name}").delete()
+    except Exception as e:
+        print(f"Warning: could not delete branch {branch_name}: {e}")
+
+
+def commit_updates(branch_name: str, targets: list[tuple[str, str, str]], progress, on_token=None) -> str | None:
+    """Generate every ``(path, extension, prompt)`` target and write them as a single commit."""
+    # Read all targets at once, then write every update as a single commit
+    progress("read")
+    builder   = CommitBuilder(get_repo(), branch_name)
+    with span("contents_fetch", files=len(targets)):
+        originals = builder.read([path for path, _, _ in targets])
+    # Generate files concurrently; results keep the order of `targets`
+    progress("generate")
+    updates = map_bounded(
+        lambda target: generate_updated_content(
+            originals[target[0]], target[2], target[1].lstrip('.'), target[0],
+            on_token=on_token and (lambda text, path=target[0]: on_token(path, text)),
+        ),
+        targets,
+    )
+    for (path, _, _), updated in zip(targets, updates):
+        builder.stage(path, updated)
+    progress("commit")
+    changed = sorted(builder.staged)
+    # The LLM work is already paid for, so writes may dip into the reserved budget
+    with priority(HIGH), span("commit", files=len(changed)):
+        return builder.commit(
+            f"chore: update {', '.join(changed)} per request" if len(changed) < 4
+            else f"chore: update {len(changed)} files per request"
+        )
+
+
+def open_or_update_draft(sid: str, info: dict | None, branch_name: str, analyst_prompt: str, progress) -> str:
+    repo, session_store = get_repo(), get_session_store()
+    # Create draft PR if first commit
+    if info is None:
+        progress("pull_request")
+        with priority(HIGH), span("pr_create"):
+            pr = repo.create_pull(
+                title="(Draft) Pending changes…",
+                body ="Draft PR; reply 'confirm' to finalize.",
+                head =branch_name,
+                base =default_branch(),
+                draft=True
+            )
+        session_store.put(sid, {'branch':branch_name,'pr_number':pr.number,'pr_url':pr.html_url,'prompt':analyst_prompt})
+        return f"Draft PR created: {pr.html_url} (session_id={sid})"
+
+    # The PR itself is not re-read: webhooks end the session when it is closed
+    if 'pr_url' not in info:
+        info['pr_url'] = repo.get_pull(info['pr_number']).html_url
+    # Writing the session back refreshes its expiry
+    session_store.put(sid, info)
+    return f"Draft PR updated: {info['pr_url']} (session_id={sid})"
+
+
+def commit_to_draft(sid: str, info: dict | None, targets: list[tuple[str, str, str]], prompt: str,
+                    progress, on_token=None) -> str:
+    """Commit ``targets`` to the session's branch and open or refresh its draft PR.
+
+    A new session gets a new branch, which is deleted again if anything fails
+    before its draft PR exists.
+    """
+    if info is not None:
+        commit_updates(info['branch'], targets, progress, on_token)
+        return open_or_update_draft(sid, info, info['branch'], prompt, progress)
+
+    branch_name = new_session_branch()
+    try:
+        if commit_updates(branch_name, targets, progress, on_token) is None:
+            raise ValueError("The request produced no changes to commit.")
+        return open_or_update_draft(sid, info, branch_name, prompt, progress)
+    except BaseException:
+        delete_session_branch(branch_name)
+        raise
+
+
+def create_or_update_pr(
+    session_id: str,
+    analyst_prompt: str,
+    file_names: list[str] | None = None,
+    progress=lambda stage: None,
+    on_token=None,
+) -> str:
+    """Apply one analyst request to the session's draft PR, creating it if needed.
+
+    ``progress`` is called with the name of each pipeline stage as it starts;
+    ``on_token(path, text)`` receives generated file content as it streams in,
+    and ``on_token(path, None)`` when that file's streamed content is discarded.
+    """
     sid = session_id or str(uuid.uuid4())
-    pr = None
-    branch_name = None
-
-    # Load or create session
-    if sid in session_pr_map:
-        info = session_pr_map[sid]
-        branch_name = info['branch']
-        pr = repo.get_pull(info['pr_number'])
+
+    # Load the session
+    progress("session")
+    session_store = get_session_store()
+    info = session_store.get(sid)
+    if info is not None:
         original_prompt = info['prompt']
         # Confirmation
         if analyst_prompt.strip().lower() in CONFIRM_KEYWORDS:
             clean = re.sub(r'[^\w\s]', '', analyst_prompt).strip().lower()
             if clean in CONFIRM_KEYWORDS:
+                progress("mark_ready")
+                pr = get_repo().get_pull(info['pr_number'])
                 new_title = generate_summary(original_prompt) or pr.title
-                pr.edit(title=new_title)
-                ready_url = mark_pr_ready(pr)
-                session_pr_map.pop(sid)
+                with priority(HIGH), span("mark_ready"):
+                    pr.edit(title=new_title)
+                    ready_url = mark_pr_ready(pr)
+                session_store.pop(sid)
                 return f"PR #{pr.number} marked ready: {ready_url}"
-    else:
-        branch_name = f"api/{uuid.uuid4().hex[:6]}"
-        main_ref    = repo.get_git_ref(f"heads/{DEFAULT_BRANCH}")
-        repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=main_ref.object.sha)
 
-    # If the caller gave us explicit filenames, use those; otherwise fall back to regex
-    if file_names:
-        file_names = [os.path.basename(f) for f in file_names]
-    else:
-        raw_files = re.findall(
-            r"\b[\w/\-\.]\.(?:sql|yml|yaml|md|py|json|csv)\b",
-            analyst_prompt,
-            flags=re.IGNORECASE
-        )
-        file_names = [os.path.basename(f) for f in raw_files]
-    if not file_names:
-        raise ValueError("No target files found; include file names with extensions.")
+    # Resolve before creating a branch, so a bad name leaves nothing behind
+    file_names = target_file_names(analyst_prompt, file_names)
+    progress("resolve")
+    targets = resolve_targets(file_names)
+    return commit_to_draft(
+        sid, info, [(path, ext, analyst_prompt) for path, ext in targets], analyst_prompt, progress, on_token
+    )
 
-    # Available files under models/
-    sql_pool = [p for p in find_repo_file_paths('.sql') if p.startswith('models/')]
-    yml_pool = [p for p in find_repo_file_paths('.yml')] + [p for p in find_repo_file_paths('.yaml')]
-    yml_pool = [p for p in yml_pool if p.startswith('models/')]
-
-    # Update each file
-    for base in file_names:
-        stem, ext = os.path.splitext(base)
-        pool = sql_pool if ext.lower()=='.sql' else yml_pool
-        # exact match
-        candidates = [p for p in pool if os.path.basename(p).lower()==base.lower()]
-        # suffix match
-        if not candidates:
-            candidates = [p for p in pool if p.lower().endswith('/'+base.lower())]
-        # fuzzy match
-        if not candidates:
-            stems = [os.path.splitext(os.path.basename(p))[0] for p in pool]
-            match = difflib.get_close_matches(stem, stems, n=1)
-            if match:
-                candidates = [pool[stems.index(match[0])]]
-        if not candidates:
-            raise FileNotFoundError(f"File '{base}' not found in models/ or via fuzzy match.")
-        path = candidates[0]
-
-        content_file = repo.get_contents(path, ref=branch_name)
-        original     = content_file.decoded_content.decode()
-        updated      = generate_updated_content(original, analyst_prompt, ext.lstrip('.'), path)
-        repo.update_file(
-            path=path,
-            message=f"chore: update {path} per request",
-            content=updated,
-            sha=content_file.sha,
-            branch=branch_name
-        )
 
-    # Create draft PR if first commit
-    if pr is None:
-        pr = repo.create_pull(
-            title="(Draft) Pending changes…",
-            body ="Draft PR; reply 'confirm' to finalize.",
-            head =branch_name,
-            base =DEFAULT_BRANCH,
-            draft=True
-        )
-        session_pr_map[sid] = {'branch':branch_name,'pr_number':pr.number,'prompt':analyst_prompt}
-        return f"Draft PR created: {pr.html_url} (session_id={sid})"
+def create_batch_pr(
+    session_id: str,
+    requests: list[dict],
+    progress=lambda stage: None,
+    on_token=None,
+) -> str:
+    """Apply many ``{"analyst_prompt", "file_names"}`` requests as one commit on one draft PR.
+
+    Requests are grouped by the file they resolve to, and each file is
+    generated once with all of its instructions merged, so the cost follows
+    the number of distinct files rather than the number of requests.
+    """
+    sid = session_id or str(uuid.uuid4())
+
+    # Resolve everything before touching GitHub, so a bad name leaves no branch behind
+    progress("resolve")
+    prompts_by_path, exts = {}, {}
+    for request in requests:
+        prompt = request["analyst_prompt"]
+        for path, ext in resolve_targets(target_file_names(prompt, request.get("file_names"))):
+            prompts_by_path.setdefault(path, []).append(prompt)
+            exts[path] = ext
+
+    progress("session")
+    info = get_session_store().get(sid)
+    return commit_to_draft(
+        sid, info,
+        [(path, exts[path], merge_prompts(prompts)) for path, prompts in prompts_by_path.items()],
+        merge_prompts([r["analyst_prompt"] for r in requests]), progress, on_token,
+    )
+
 
-    return f"Draft PR updated: {pr.html_url} (session_id={sid})"
\ No newline at end of file
+# Run by the PR-Bot's startup hook (see STARTUP_WARMUP) so the first request
+# does not pay for connecting, the tree download or loading sqlfluff
+WARM_UP_STEPS = {
+    "github":         get_repo,
+    "tree":           lambda: get_tree_index().refresh(),
+    "manifest":       manifest_index.refresh,
+    "sessions":       get_session_store,
+    "llm_cache":      get_response_cache,
+    "system_message": load_system_message,
+    "sqlfluff":       sql_formatter.warm_up,
+}
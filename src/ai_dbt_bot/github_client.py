@@ -0,0 +1,233 @@
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from github import Github
+
+# GitHub Enterprise, or a local stand-in such as benchmarks/fakes.py
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+
+# Request priorities; lower runs first
+HIGH, NORMAL, LOW = 0, 5, 10
+
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "8"))
+# Share of the hourly budget kept back for HIGH priority requests
+GITHUB_RESERVE_FRACTION = float(os.getenv("GITHUB_RESERVE_FRACTION", "0.05"))
+# Below this share of the budget, requests are spaced out until the reset
+GITHUB_PACE_FRACTION = float(os.getenv("GITHUB_PACE_FRACTION", "0.2"))
+# Longest a request may be held back before giving up
+GITHUB_MAX_THROTTLE_SECONDS = float(os.getenv("GITHUB_MAX_THROTTLE_SECONDS", "60"))
+
+_priority = contextvars.ContextVar("github_priority", default=NORMAL)
+
+
+class RateLimitExhausted(RuntimeError):
+    """The remaining budget is reserved or spent and the reset is too far away to wait for."""
+
+    def __init__(self, resource: str, reset: float):
+        self.resource = resource
+        self.reset = reset
+        super().__init__(
+            f"GitHub {resource} rate limit exhausted; resets in {max(0, int(reset - time.time()))}s"
+        )
+
+
+@contextmanager
+def priority(level: int):
+    """Run the GitHub calls made inside the block at ``level``."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _resource(url: str) -> str:
+    return "graphql" if url.rstrip("/").endswith("/graphql") else "core"
+
+
+def _coalesce_key(verb: str, url: str, parameters, headers, input):
+    """Key for requests that can share one upstream call, or None for writes."""
+    if verb == "POST" and _resource(url) == "graphql" and isinstance(input, dict):
+        read = not input.get("query", "").lstrip().startswith("mutation")
+    else:
+        read = verb == "GET"
+    if not read:
+        return None
+    return json.dumps([verb, url, parameters, headers, input], sort_keys=True, default=str)
+
+
+class GitHubGateway:
+    """
+    Single path for every GitHub request made by the bot.
+
+    It reads the rate-limit headers of each response, spaces requests out
+    once the budget runs low and holds back all but HIGH priority work when
+    only the reserve is left. Waiting requests are admitted by priority, and
+    identical reads that are already in flight (the same tree, the same file
+    at the same ref) share one upstream call.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = GITHUB_MAX_CONCURRENCY,
+        reserve_fraction: float = GITHUB_RESERVE_FRACTION,
+        pace_fraction: float = GITHUB_PACE_FRACTION,
+        max_throttle: float = GITHUB_MAX_THROTTLE_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.reserve_fraction = reserve_fraction
+        self.pace_fraction = pace_fraction
+        self.max_throttle = max_throttle
+        self.stats = {"requests": 0, "coalesced": 0, "throttled_seconds": 0.0, "rejected": 0}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting = []
+        self._in_flight = 0
+        self._budget = {}
+        self._next_slot = {}
+        self._calls = {}
+
+    def _delay(self, resource: str, level: int, now: float) -> float:
+        """Seconds the next ``resource`` request at ``level`` has to wait."""
+        budget = self._budget.get(resource)
+        if budget is None:
+            return 0.0
+        reset_in = max(0.0, budget["reset"] - time.time())
+        if reset_in == 0.0:
+            return 0.0
+        reserve = budget["limit"] * self.reserve_fraction
+        usable = budget["remaining"] - (0 if level == HIGH else reserve)
+        if usable <= 0:
+            return reset_in
+        if budget["remaining"] >= budget["limit"] * self.pace_fraction:
+            return 0.0
+        return max(0.0, self._next_slot.get(resource, 0.0) - now)
+
+    def _acquire(self, resource: str, level: int) -> None:
+        with self._cond:
+            ticket = (level, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] == ticket and self._in_flight < self.max_concurrency:
+                        now = time.monotonic()
+                        delay = self._delay(resource, level, now)
+                        if delay <= 0:
+                            break
+                        if delay > self.max_throttle:
+                            self.stats["rejected"] += 1
+                            raise RateLimitExhausted(resource, self._budget[resource]["reset"])
+                        started = time.monotonic()
+                        self._cond.wait(delay)
+                        self.stats["throttled_seconds"] += time.monotonic() - started
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            budget = self._budget.get(resource)
+            if budget is not None:
+                # Count the request now; the response headers correct it
+                budget["remaining"] = max(0, budget["remaining"] - 1)
+                usable = max(1.0, budget["remaining"] - budget["limit"] * self.reserve_fraction)
+                spacing = max(0.0, budget["reset"] - time.time()) / usable
+                self._next_slot[resource] = time.monotonic() + spacing
+            self.stats["requests"] += 1
+            self._cond.notify_all()
+
+    def _release(self, resource: str, headers: dict | None) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if headers and "x-ratelimit-remaining" in headers:
+                resource = headers.get("x-ratelimit-resource", resource)
+                self._budget[resource] = {
+                    "limit": int(headers.get("x-ratelimit-limit", 5000)),
+                    "remaining": int(headers["x-ratelimit-remaining"]),
+                    "reset": float(headers.get("x-ratelimit-reset", 0)),
+                }
+            self._cond.notify_all()
+
+    def _send(self, send, verb, url, parameters, headers, input, *args, **kwargs):
+        resource = _resource(url)
+        self._acquire(resource, _priority.get())
+        response_headers = None
+        try:
+            result = send(verb, url, parameters, headers, input, *args, **kwargs)
+            response_headers = result[1]
+            return result
+        finally:
+            self._release(resource, response_headers)
+
+    def request(self, send, verb, url, parameters=None, headers=None, input=None, *args, **kwargs):
+        """Call ``send`` (a ``Requester.requestJson``) through the gateway."""
+        key = _coalesce_key(verb, url, parameters, headers, input)
+        if key is None:
+            return self._send(send, verb, url, parameters, headers, input, *args, **kwargs)
+        with self._cond:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return call.result()
+        try:
+            result = self._send(send, verb, url, parameters, headers, input, *args, **kwargs)
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._cond:
+                self._calls.pop(key, None)
+
+    def install(self, gh: Github) -> Github:
+        """Route every JSON request of ``gh`` through this gateway.
+
+        Only ``gh``'s own requester is patched: objects fetched with ``lazy=True``
+        get a fresh requester and would bypass the gateway.
+        """
+        requester = gh._Github__requester
+        send = requester.requestJson
+        requester.requestJson = lambda *args, **kwargs: self.request(send, *args, **kwargs)
+        return gh
+
+    def metrics(self) -> dict:
+        with self._cond:
+            return {
+                "budget": {resource: dict(budget) for resource, budget in self._budget.items()},
+                "queue_depth": len(self._waiting),
+                "in_flight": self._in_flight,
+                **self.stats,
+            }
+
+
+# Shared by every client the bot creates, so they draw on one budget
+gateway = GitHubGateway()
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(token: str | None = None, verify: bool = True) -> Github:
+    """Shared ``Github`` client for ``token`` whose requests go through ``gateway``."""
+    token = token or os.getenv("GITHUB_TOKEN")
+    with _clients_lock:
+        client = _clients.get((token, verify))
+        if client is None:
+            client = _clients[(token, verify)] = gateway.install(
+                Github(token, verify=verify, base_url=GITHUB_API_URL)
+            )
+        return client
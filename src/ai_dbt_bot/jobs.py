@@ -0,0 +1,205 @@
+import contextvars
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks, so a second worker is not detected
+    fcntl = None
+
+PR_URL_RE = re.compile(r"https?://\S+/pull/\d+")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    session_id: str | None = None
+    status: str = "queued"          # queued -> running -> succeeded | failed | cancelled
+    stages: list = field(default_factory=list)
+    result: str | None = None
+    pr_url: str | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    # Called as listener(event, data) on every stage change and when the job ends
+    listeners: list = field(default_factory=list, repr=False)
+    cancelled: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def check_cancelled(self) -> None:
+        if self.cancelled.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def stage(self, name: str) -> None:
+        self.check_cancelled()
+        now = time.time()
+        if self.stages and self.stages[-1]["finished_at"] is None:
+            self.stages[-1]["finished_at"] = now
+        self.stages.append({"name": name, "started_at": now, "finished_at": None})
+        # A failing listener (e.g. a closed stream) must not fail the job itself
+        for listener in self.listeners:
+            try:
+                listener("stage", {"job_id": self.id, "name": name})
+            except Exception:
+                pass
+
+    def finish(self, status: str) -> None:
+        self.finished_at = time.time()
+        if self.stages and self.stages[-1]["finished_at"] is None:
+            self.stages[-1]["finished_at"] = self.finished_at
+        self.status = status
+        for listener in self.listeners:
+            try:
+                listener("done" if status == "succeeded" else "error", self.to_dict())
+            except Exception:
+                pass
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id":      self.id,
+            "session_id":  self.session_id,
+            "status":      self.status,
+            "stage":       self.stages[-1]["name"] if self.stages else None,
+            "stages":      [dict(s) for s in self.stages],
+            "message":     self.result,
+            "pr_url":      self.pr_url,
+            "error":       self.error,
+            "created_at":  self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    Runs pipeline calls on a worker pool so request handlers can return at once.
+
+    The submitted function is called with a ``progress`` keyword argument that
+    records stage transitions on the job. Jobs sharing a ``key`` (the session
+    id) run one at a time, so follow-ups to one draft PR never race each other.
+    The worker threads start on first use, and again after ``shutdown``.
+    """
+
+    def __init__(self, max_workers: int = 4, max_finished: int = 1000):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._pool = None
+        self._jobs = OrderedDict()
+        # key -> jobs waiting for the running job with that key to finish
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, key: str | None = None, listener=None, job_id: str | None = None, **kwargs) -> Job:
+        """Queue ``fn(**kwargs)``; pass ``job_id`` (see ``new_id``) to announce the job before it can start."""
+        job = Job(id=job_id or self.new_id(), session_id=key)
+        if listener is not None:
+            job.listeners.append(listener)
+        # The job runs in the submitter's context, so it continues the request's trace
+        context = contextvars.copy_context()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+            if key in self._pending:
+                self._pending[key].append((job, fn, kwargs, context))
+                return job
+            if key:
+                self._pending[key] = deque()
+        self._get_pool().submit(context.run, self._run, job, key, fn, kwargs)
+        return job
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            return self._pool
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, key: str | None, fn, kwargs) -> None:
+        try:
+            job.check_cancelled()
+            job.status = "running"
+            result = fn(progress=job.stage, **kwargs)
+            job.result = result
+            match = PR_URL_RE.search(result or "")
+            job.pr_url = match.group(0) if match else None
+            job.finish("succeeded")
+        except JobCancelled as e:
+            job.error = str(e)
+            job.finish("cancelled")
+        except Exception as e:
+            job.error = str(e)
+            job.finish("failed")
+        finally:
+            if key:
+                self._start_next(key)
+
+    def _start_next(self, key: str) -> None:
+        with self._lock:
+            waiting = self._pending[key]
+            if not waiting:
+                del self._pending[key]
+                return
+            job, fn, kwargs, context = waiting.popleft()
+        self._get_pool().submit(context.run, self._run, job, key, fn, kwargs)
+
+    def _evict(self) -> None:
+        finished = [j.id for j in self._jobs.values() if j.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+class WorkerLock:
+    """
+    Exclusive lock on ``path``, held by the one process allowed to run jobs.
+
+    Job status and the one-at-a-time order of a session's jobs live in the
+    ``JobQueue`` of a single process. A second worker would answer 404 for
+    jobs it did not start and could run two follow-ups to one PR at once, so
+    it fails to start instead.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> None:
+        if fcntl is None:
+            return
+        f = open(self.path, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            raise RuntimeError(
+                f"Another process already runs PR-Bot jobs (lock {self.path}); run a single worker"
+            ) from None
+        self._file = f
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_PATH        = os.getenv("LLM_CACHE_PATH", "llm_cache.db")   # empty disables the disk tier
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_MAX_BYTES   = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of LLM responses.
+
+    Keys are derived from the model, a hash of the system message, the request
+    prompt and a hash of the file content, so a replayed request maps to the
+    same entry. A small LRU dict sits in front of an optional SQLite file;
+    entries expire after ``ttl`` and the disk tier is trimmed to ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        path: str | None = LLM_CACHE_PATH,
+        ttl: float = LLM_CACHE_TTL_SECONDS,
+        max_entries: int = LLM_CACHE_MAX_ENTRIES,
+        max_bytes: int = LLM_CACHE_MAX_BYTES,
+    ):
+        self.path = path or None
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._memory = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if self.path:
+            with self._conn() as conn:
+                conn.executescript("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key        TEXT PRIMARY KEY,
+                    value      TEXT NOT NULL,
+                    size       INTEGER NOT NULL,
+                    used_at    REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at);
+                """)
+
+    @staticmethod
+    def key(model: str, system: str, prompt: str, content: str = "", **params) -> str:
+        return sha256(json.dumps(
+            {
+                "model": model,
+                "system": sha256(system),
+                "prompt": prompt,
+                "content": sha256(content),
+                "params": params,
+            },
+            sort_keys=True,
+        ))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+        if self.path:
+            with self._conn() as conn:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at >= ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            if row is not None:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, row[1], row[0])
+                return row[0]
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self.stats["stores"] += 1
+            self._remember(key, now + self.ttl, value)
+        if self.path:
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, used_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value.encode()), now, now + self.ttl),
+                )
+                self._trim_disk(conn, now)
+
+    def get_or_create(self, key: str, create) -> str:
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.put(key, value)
+        return value
+
+    def _remember(self, key, expires_at, value) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _trim_disk(self, conn, now) -> None:
+        removed = conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            # Drop least recently used entries until the file fits again
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY used_at").fetchall():
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+        with self._lock:
+            self.stats["evictions"] += removed
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
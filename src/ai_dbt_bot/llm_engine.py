@@ -3,24 +3,79 @@ import ssl
 ssl._create_default_https_context = ssl._create_unverified_context
 os.environ["SSL_CERT_FILE"] = certifi.where()
 os.environ["REQUESTS_CA_BUNDLE"] = certifi.where()
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
 import openai
 from dotenv import load_dotenv
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
+from .metrics import span, record_span, LLM_TOKENS
 
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# Upper bound on LLM calls in flight for a single request
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+
 
 # Retry up to 5 times, doubling the wait each time (with a max of ~10s),
-# but only when a RateLimitError is raised.
+# but only when a RateLimitError is raised. The wait is randomised so that
+# calls made in parallel do not all retry at the same moment.
 @retry(
     stop=stop_after_attempt(5),
-    wait=wait_exponential(multiplier=1, min=1, max=10),
+    wait=wait_random_exponential(multiplier=1, min=1, max=10),
     retry=retry_if_exception_type(openai.error.RateLimitError),
 )
-def safe_chat_completion(**kwargs):
+def _chat_completion(**kwargs):
     return openai.ChatCompletion.create(**kwargs)
 
+
+def _timed_stream(kwargs):
+    model, chunks, started, error = kwargs.get("model"), 0, time.perf_counter(), False
+    try:
+        for chunk in _chat_completion(**kwargs):
+            # Streams carry no usage; every content delta is one token
+            chunks += 1
+            yield chunk
+    except BaseException:
+        error = True
+        raise
+    finally:
+        LLM_TOKENS.inc(chunks, model=model, kind="completion")
+        record_span("llm", time.perf_counter() - started, error=error, model=model, completion_tokens=chunks)
+
+
+def safe_chat_completion(**kwargs):
+    """``ChatCompletion.create`` with retries, timed as the ``llm`` stage with its token counts."""
+    if kwargs.get("stream"):
+        return _timed_stream(kwargs)
+    model = kwargs.get("model")
+    with span("llm", model=model) as attrs:
+        response = _chat_completion(**kwargs)
+        usage = getattr(response, "usage", None)
+        for kind in ("prompt", "completion"):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if tokens is not None:
+                attrs[f"{kind}_tokens"] = tokens
+                LLM_TOKENS.inc(tokens, model=model, kind=kind)
+    return response
+
+
+def map_bounded(fn, items, max_workers: int | None = None) -> list:
+    """Call ``fn`` on every item with at most ``max_workers`` running at once.
+
+    Results come back in the order of ``items``, whatever order the calls finish in.
+    """
+    items = list(items)
+    workers = max(1, min(max_workers or LLM_MAX_CONCURRENCY, len(items)))
+    if workers == 1:
+        return [fn(item) for item in items]
+    # Each call runs in a copy of the caller's context, so spans and the
+    # GitHub request priority carry over to the worker threads
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm") as pool:
+        return list(pool.map(lambda ctx, item: ctx.run(fn, item), contexts, items))
+
 def generate_dbt_patch(prompt: str) -> str:
     response = safe_chat_completion(
         model="gpt-4o-mini",
@@ -1,10 +1,51 @@
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from .gh_api_handler import create_or_update_pr
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Response, Request as HttpRequest
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from .gh_api_handler import (
+    create_or_update_pr, create_batch_pr, default_branch, get_preview_cache, get_session_store,
+    get_tree_index, sql_formatter, WARM_UP_STEPS,
+)
+from .github_client import gateway, priority, LOW
+from .jobs import JobQueue, JobCancelled, WorkerLock
+from .metrics import REGISTRY, CONTENT_TYPE, TraceMiddleware
+from .session_store import SESSION_STORE_URL
+from .startup import lazy, WarmUp, STARTUP_WARMUP
+from .streaming import Broadcaster, EventStream, SSE_HEADERS
+from .webhooks import WebhookProcessor, verify_signature
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+# Connects to GitHub, downloads the tree and loads sqlfluff ahead of the first request
+warm_up = WarmUp(WARM_UP_STEPS)
+
+# Jobs live in this process's memory, so only one worker per session store may run them
+_store_key = hashlib.sha256(f"{os.getcwd()}\0{SESSION_STORE_URL}".encode()).hexdigest()[:16]
+JOB_LOCK_PATH = os.getenv("JOB_LOCK_PATH", os.path.join(tempfile.gettempdir(), f"ai_dbt_bot-{_store_key}.lock"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    worker_lock = WorkerLock(JOB_LOCK_PATH)
+    worker_lock.acquire()
+    if STARTUP_WARMUP == "blocking":
+        await run_in_threadpool(warm_up.run)
+    elif STARTUP_WARMUP == "background":
+        warm_up.start()
+    try:
+        yield
+    finally:
+        # Stops the worker threads; the queue starts new ones if the app runs again
+        jobs.shutdown(wait=False)
+        sql_formatter.shutdown()
+        worker_lock.release()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,40 +53,186 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+# Requests forwarded by the translator continue its trace (see TRACE_PROPAGATION)
+app.add_middleware(TraceMiddleware)
 
 class Request(BaseModel):
     session_id: str | None = None
     file_names: list[str] | None = None      # <— new!
     analyst_prompt: str
 
-@app.post("/requests")
+class BatchItem(BaseModel):
+    analyst_prompt: str
+    file_names: list[str] | None = None
+
+class BatchRequest(BaseModel):
+    session_id: str | None = None
+    items: list[BatchItem] = Field(min_length=1)
+
+# Background workers running the PR pipeline; requests only enqueue work
+jobs = JobQueue(max_workers=int(os.getenv("JOB_WORKERS", "4")))
+
+@app.post("/requests", status_code=202)
 async def handle_request(req: Request):
-    try:
-        result = create_or_update_pr(
-            session_id    = req.session_id,
-            analyst_prompt= req.analyst_prompt,
-            file_names    = req.file_names   # pass it through
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    return {"message": result, "session_id": req.session_id}
+    # Allocate the session id up front so the caller can follow up right away
+    sid = req.session_id or str(uuid.uuid4())
+    job = jobs.submit(
+        create_or_update_pr,
+        key           = sid,
+        session_id    = sid,
+        analyst_prompt= req.analyst_prompt,
+        file_names    = req.file_names   # pass it through
+    )
+    return {
+        "message":    f"Request queued (job_id={job.id}, session_id={sid})",
+        "job_id":     job.id,
+        "session_id": sid,
+        "status_url": f"/jobs/{job.id}",
+    }
+
+@app.post("/requests/batch", status_code=202)
+async def handle_batch(req: BatchRequest):
+    """Many prompt/file pairs, generated once per distinct file into one branch and one PR."""
+    sid = req.session_id or str(uuid.uuid4())
+    job = jobs.submit(
+        create_batch_pr,
+        key        = sid,
+        session_id = sid,
+        requests   = [item.model_dump() for item in req.items],
+    )
+    return {
+        "message":    f"Batch of {len(req.items)} requests queued (job_id={job.id}, session_id={sid})",
+        "job_id":     job.id,
+        "session_id": sid,
+        "status_url": f"/jobs/{job.id}",
+    }
+
+@app.post("/requests/stream")
+async def stream_request(req: Request):
+    """Same as /requests, but streams stage changes and LLM output as Server-Sent Events.
+
+    Events: ``queued``, ``stage``, ``token`` ({file, text}), ``reset`` ({file})
+    when a file's streamed tokens are discarded for a new attempt, then ``done``
+    or ``error`` with the final job status. Closing the connection cancels the job.
+    """
+    sid = req.session_id or str(uuid.uuid4())
+    job = None
 
-from .gh_api_handler import repo  # Add this import at the top or before usage
+    def cancel():
+        if job is not None:
+            job.cancel()
+
+    stream = EventStream(on_close=cancel)
+
+    def on_token(path, text):
+        if stream.closed:
+            raise JobCancelled("Client disconnected")
+        if text is None:
+            stream.emit("reset", {"file": path})
+        else:
+            stream.emit("token", {"file": path, "text": text})
+
+    # "queued" goes out first: a worker may emit "stage" as soon as the job is submitted
+    job_id = jobs.new_id()
+    stream.emit("queued", {"job_id": job_id, "session_id": sid})
+    job = jobs.submit(
+        create_or_update_pr,
+        key           = sid,
+        listener      = stream.emit,
+        job_id        = job_id,
+        session_id    = sid,
+        analyst_prompt= req.analyst_prompt,
+        file_names    = req.file_names,
+        on_token      = on_token,
+    )
+    return StreamingResponse(stream.events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/ready")
+def ready():
+    """Answers as soon as requests are accepted; ``warm_up`` shows what is already loaded."""
+    return {"ready": True, "warm_up": {"mode": STARTUP_WARMUP, **warm_up.status()}}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    job.cancel()
+    return job.to_dict()
+
+@app.get("/metrics/github")
+def github_metrics():
+    """Remaining GitHub budget per resource, queue depth and coalesced reads."""
+    return gateway.metrics()
+
+REGISTRY.gauge(
+    "ai_dbt_bot_github_rate_limit_remaining", "GitHub requests left in the current window.",
+    lambda: {(resource,): budget["remaining"] for resource, budget in gateway.metrics()["budget"].items()},
+    ("resource",),
+)
+REGISTRY.gauge(
+    "ai_dbt_bot_github_queue_depth", "GitHub requests waiting for the gateway.",
+    lambda: gateway.metrics()["queue_depth"],
+)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-stage latency histograms, LLM token counts and GitHub budget, for Prometheus."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
 
 @app.get("/preview/{pr_number}")
-def preview_pr(pr_number: int):
+def preview_pr(pr_number: int, if_none_match: str | None = Header(default=None)):
     try:
-        pr = repo.get_pull(pr_number)
-        files = []
-        for f in pr.get_files():
-            files.append({
-                "filename":  f.filename,
-                "status":    f.status,
-                "additions": f.additions,
-                "deletions": f.deletions,
-                "patch":     f.patch,       # the unified-diff snippet
-            })
-        return {"files": files}
+        # Preview polling yields to the PR pipeline when the budget is tight
+        with priority(LOW):
+            etag, payload = get_preview_cache().get(pr_number)
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=str(e))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    # The frontend revalidates with the ETag it got last time
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+# Shared secret configured on the GitHub webhook; unset disables /webhooks/github
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
+
+# PR changes pushed by GitHub, fanned out to the frontends listening on /events
+broadcaster = Broadcaster()
+get_webhooks = lazy(lambda: WebhookProcessor(
+    get_session_store(), get_tree_index(), get_preview_cache(), broadcaster, default_branch(),
+))
+
+@app.post("/webhooks/github")
+async def github_webhook(
+    request: HttpRequest,
+    x_github_event: str = Header(),
+    x_hub_signature_256: str | None = Header(default=None),
+    x_github_delivery: str | None = Header(default=None),
+):
+    if not GITHUB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=404, detail="Webhooks are not configured")
+    body = await request.body()
+    if not verify_signature(GITHUB_WEBHOOK_SECRET, body, x_hub_signature_256):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    if x_github_event == "ping":
+        return {"event": "ping"}
+    # The session store may hit SQLite; keep it off the event loop
+    payload = json.loads(body)
+    return await run_in_threadpool(lambda: get_webhooks().handle(x_github_event, payload, x_github_delivery))
+
+@app.get("/events")
+async def pr_events(pr_number: int | None = None):
+    """Server-Sent Events for PR changes (``pull_request``, ``push``), optionally for one PR."""
+    match = None if pr_number is None else (lambda event, data: data.get("pr_number") == pr_number)
+    stream = broadcaster.subscribe(match)
+    return StreamingResponse(stream.events(), media_type="text/event-stream", headers=SSE_HEADERS)
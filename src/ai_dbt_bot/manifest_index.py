@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+
+DBT_MANIFEST_PATH = os.getenv("DBT_MANIFEST_PATH", "target/manifest.json")
+
+
+@dataclass
+class ModelFiles:
+    name: str
+    unique_id: str
+    sql_path: str
+    yml_path: str | None = None
+    downstream: list[str] = field(default_factory=list)
+    checksum: str | None = None
+
+    @property
+    def paths(self) -> list[str]:
+        return [self.sql_path] + ([self.yml_path] if self.yml_path else [])
+
+
+def _strip_project(patch_path: str | None) -> str | None:
+    # patch_path looks like "my_project://models/d_customers.yml"
+    if not patch_path:
+        return None
+    return patch_path.split("://", 1)[-1]
+
+
+class ManifestIndex:
+    """
+    Model name -> SQL file, schema YAML file and downstream models, read from
+    dbt's ``manifest.json`` (``dbt parse`` writes it to ``target/``).
+
+    The manifest is loaded on first use and re-read only when its mtime or
+    size changes; entries whose node checksum and YAML path are unchanged
+    are kept as they are.
+    """
+
+    def __init__(self, path: str = DBT_MANIFEST_PATH):
+        self.path = path
+        self.stats = {"loads": 0, "updated": 0, "removed": 0}
+        self._lock = threading.Lock()
+        self._signature = None
+        self._by_name = {}
+        self._by_id = {}
+
+    def refresh(self) -> bool:
+        """Reload if the manifest changed on disk; returns whether anything was reloaded."""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                changed = bool(self._by_id)
+                self._signature, self._by_name, self._by_id = None, {}, {}
+                return changed
+            signature = (st.st_mtime_ns, st.st_size)
+            if signature == self._signature:
+                return False
+            with open(self.path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            self._apply(manifest)
+            self._signature = signature
+            self.stats["loads"] += 1
+            return True
+
+    def _apply(self, manifest: dict) -> None:
+        nodes = {
+            uid: node for uid, node in manifest.get("nodes", {}).items()
+            if node.get("resource_type") == "model"
+        }
+        child_map = manifest.get("child_map", {})
+        by_id = {}
+        for uid, node in nodes.items():
+            checksum = (node.get("checksum") or {}).get("checksum")
+            yml_path = _strip_project(node.get("patch_path"))
+            downstream = sorted(
+                nodes[child]["name"] for child in child_map.get(uid, []) if child in nodes
+            )
+            current = self._by_id.get(uid)
+            if (
+                current is not None
+                and current.checksum == checksum
+                and current.yml_path == yml_path
+            ):
+                current.downstream = downstream
+                by_id[uid] = current
+                continue
+            by_id[uid] = ModelFiles(
+                name=node["name"],
+                unique_id=uid,
+                sql_path=node["original_file_path"],
+                yml_path=yml_path,
+                downstream=downstream,
+                checksum=checksum,
+            )
+            self.stats["updated"] += 1
+        self.stats["removed"] += len(set(self._by_id) - set(by_id))
+        self._by_id = by_id
+        self._by_name = {entry.name.lower(): entry for entry in by_id.values()}
+
+    def get(self, name: str) -> ModelFiles | None:
+        """Look up a model by name, or by any file name whose stem is the model name."""
+        self.refresh()
+        stem = os.path.splitext(os.path.basename(name))[0].lower()
+        return self._by_name.get(stem)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
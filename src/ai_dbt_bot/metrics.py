@@ -0,0 +1,216 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+# Honour and forward W3C ``traceparent`` headers between the two services
+TRACE_PROPAGATION = os.getenv("TRACE_PROPAGATION", "1") not in ("0", "false", "off")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+logger = logging.getLogger("ai_dbt_bot.spans")
+
+# (trace_id, span_id) of the span currently running in this context
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, n) for key, (counts, total, n) in self._series.items()}
+        for key, (counts, total, n) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _labels(self.labelnames + ("le",), key + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in values)
+        return lines
+
+
+class Gauge:
+    """Value read at scrape time from ``collect``: a number, or ``{label values: number}``."""
+
+    def __init__(self, name: str, help: str, collect, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = self.collect()
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines.extend(f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in sorted(values.items()))
+        return lines
+
+
+class Registry:
+    """Metrics of one process, rendered in the Prometheus text format by ``/metrics``."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, collect, labelnames=()) -> Gauge:
+        return self._add(Gauge(name, help, collect, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "ai_dbt_bot_stage_seconds", "Time spent in each pipeline stage.", ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "ai_dbt_bot_stage_errors_total", "Pipeline stages that raised.", ("stage",)
+)
+LLM_TOKENS = REGISTRY.counter(
+    "ai_dbt_bot_llm_tokens_total", "Tokens sent to and received from the LLM.", ("model", "kind")
+)
+
+
+def record_span(stage: str, seconds: float, trace=None, parent_id=None, error: bool = False, **attrs) -> None:
+    """
+    Export one finished span: histogram, error counter and a structured debug
+    log line. Without ``trace`` the span becomes a child of the current one,
+    which is how stages timed by hand (streams) are recorded.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if error:
+        STAGE_ERRORS.inc(stage=stage)
+    if logger.isEnabledFor(logging.DEBUG):
+        if trace is None:
+            current = _trace.get()
+            parent_id = current[1] if current else None
+            trace = (current[0] if current else None, secrets.token_hex(8))
+        trace_id, span_id = trace
+        logger.debug(json.dumps({
+            "stage": stage, "seconds": round(seconds, 6), "trace_id": trace_id,
+            "span_id": span_id, "parent_id": parent_id, "error": error, **attrs,
+        }, default=str))
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """Time the block as ``stage``; the yielded dict takes extra attributes such as token counts."""
+    parent = _trace.get()
+    trace = ((parent[0] if parent else secrets.token_hex(16)), secrets.token_hex(8))
+    token = _trace.set(trace)
+    started = time.perf_counter()
+    error = False
+    try:
+        yield attrs
+    except BaseException:
+        error = True
+        raise
+    finally:
+        _trace.reset(token)
+        record_span(stage, time.perf_counter() - started, trace, parent[1] if parent else None, error, **attrs)
+
+
+def traceparent() -> str | None:
+    """``traceparent`` header for an outgoing request, continuing the current trace."""
+    current = _trace.get()
+    if not TRACE_PROPAGATION or current is None:
+        return None
+    return f"00-{current[0]}-{current[1]}-01"
+
+
+@contextmanager
+def trace_context(header: str | None):
+    """Continue the trace from an incoming ``traceparent`` header, or start a new one."""
+    match = TRACEPARENT_RE.match(header or "") if TRACE_PROPAGATION else None
+    trace = (match.group(1), match.group(2)) if match else (secrets.token_hex(16), secrets.token_hex(8))
+    token = _trace.set(trace)
+    try:
+        yield trace[0]
+    finally:
+        _trace.reset(token)
+
+
+class TraceMiddleware:
+    """ASGI middleware running each HTTP request inside its trace context."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        header = dict(scope["headers"]).get(b"traceparent")
+        with trace_context(header.decode("latin-1") if header else None):
+            await self.app(scope, receive, send)
@@ -0,0 +1,71 @@
+import difflib
+import os
+from collections import Counter
+from itertools import chain
+
+# Same threshold difflib.get_close_matches uses by default
+FUZZY_CUTOFF = 0.6
+
+
+def _ngrams(text: str, n: int = 3) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class ModelResolver:
+    """
+    Prebuilt lookup from a requested file name to repository paths.
+
+    Exact names hit a basename hash map, partial paths (``marts/d_customers.sql``)
+    walk a trie of reversed path components, and anything else falls back to
+    fuzzy matching on the file stem, where a trigram index narrows the pool to
+    a handful of candidates before they are scored.
+    """
+
+    def __init__(self, paths: list[str]):
+        self.paths = list(paths)
+        self._by_basename = {}
+        self._suffix_trie = {}
+        self._stems = []
+        self._by_ngram = {}
+        for i, path in enumerate(self.paths):
+            lowered = path.lower()
+            self._by_basename.setdefault(os.path.basename(lowered), []).append(path)
+
+            node = self._suffix_trie
+            for part in reversed(lowered.split("/")):
+                node = node.setdefault(part, {})
+                node.setdefault("", []).append(path)
+
+            stem = os.path.splitext(os.path.basename(lowered))[0]
+            self._stems.append(stem)
+            for gram in _ngrams(stem):
+                self._by_ngram.setdefault(gram, []).append(i)
+
+    def exact(self, name: str) -> list[str]:
+        """Paths ending in ``name``; a directory that does not match falls back to the basename."""
+        name = name.lower().lstrip("./")
+        node = self._suffix_trie
+        for part in reversed(name.split("/")):
+            node = node.get(part)
+            if node is None:
+                return list(self._by_basename.get(os.path.basename(name), []))
+        return list(node[""])
+
+    def fuzzy(self, name: str, limit: int = 5, cutoff: float = FUZZY_CUTOFF) -> list[str]:
+        stem = os.path.splitext(os.path.basename(name.lower()))[0]
+        shared = Counter(chain.from_iterable(self._by_ngram.get(gram, ()) for gram in _ngrams(stem)))
+        # Only score the stems that share the most trigrams with the request
+        candidates = [i for i, _ in shared.most_common(max(50, limit * 10))]
+        scored = []
+        for i in candidates:
+            matcher = difflib.SequenceMatcher(None, stem, self._stems[i])
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                ratio = matcher.ratio()
+                if ratio >= cutoff:
+                    scored.append((-ratio, self.paths[i]))
+        return [path for _, path in sorted(scored)[:limit]]
+
+    def resolve(self, name: str, limit: int = 5) -> list[str]:
+        """Ranked matches for ``name``: exact or path-suffix hits first, else fuzzy ones."""
+        return self.exact(name)[:limit] or self.fuzzy(name, limit)
@@ -0,0 +1,351 @@
+import re
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+
+# Context lines that may be dropped from either end of a hunk that does not match as written
+PATCH_MAX_FUZZ = 2
+
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+NO_NEWLINE = "\\ No newline at end of file"
+
+
+class PatchError(ValueError):
+    """The text is not a unified diff."""
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    # (" " | "-" | "+", text) per line of the hunk body
+    lines: list[tuple[str, str]] = field(default_factory=list)
+    old_eof_newline: bool = True
+    new_eof_newline: bool = True
+
+    @property
+    def header(self) -> str:
+        return f"@@ -{self.old_start},{self.old_count} +{self.new_start},{self.new_count} @@"
+
+    def old_lines(self, fuzz: int = 0) -> list[str]:
+        return [text for tag, text in self._trimmed(fuzz) if tag != "+"]
+
+    def new_lines(self, fuzz: int = 0) -> list[str]:
+        return [text for tag, text in self._trimmed(fuzz) if tag != "-"]
+
+    def _trimmed(self, fuzz: int) -> list[tuple[str, str]]:
+        """The body without up to ``fuzz`` context lines at each end."""
+        lines = self.lines
+        for _ in range(fuzz):
+            if lines and lines[0][0] == " ":
+                lines = lines[1:]
+            if lines and lines[-1][0] == " ":
+                lines = lines[:-1]
+        return lines
+
+    def leading_context(self, fuzz: int) -> int:
+        """Context lines removed from the front by ``_trimmed(fuzz)``."""
+        dropped = 0
+        for tag, _ in self.lines[:fuzz]:
+            if tag != " ":
+                break
+            dropped += 1
+        return dropped
+
+
+@dataclass
+class FilePatch:
+    old_path: str | None
+    new_path: str | None
+    hunks: list[Hunk] = field(default_factory=list)
+
+    @property
+    def path(self) -> str:
+        return self.new_path or self.old_path
+
+
+@dataclass
+class Rejection:
+    path: str
+    hunk: int
+    header: str
+    reason: str
+
+
+@dataclass
+class AppliedHunk:
+    path: str
+    hunk: int
+    # Lines between where the header said the hunk goes and where it matched
+    offset: int
+    # Context lines dropped from each end to make it match
+    fuzz: int
+    loose: bool
+
+
+@dataclass
+class PatchResult:
+    # Updated text per path; None for deleted files
+    files: dict[str, str | None] = field(default_factory=dict)
+    applied: list[AppliedHunk] = field(default_factory=list)
+    rejected: list[Rejection] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.rejected
+
+    def summary(self) -> str:
+        if self.rejected:
+            return "\n".join(f"{r.path}: hunk #{r.hunk} ({r.header}) rejected: {r.reason}" for r in self.rejected)
+        fuzzy = sum(1 for a in self.applied if a.offset or a.fuzz or a.loose)
+        return f"applied {len(self.applied)} hunks to {len(self.files)} files" + (f" ({fuzzy} fuzzy)" if fuzzy else "")
+
+
+def _header_path(line: str) -> str | None:
+    path = line[4:].split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path[:2] in ("a/", "b/"):
+        path = path[2:]
+    # Paths are relative to the repository; never let a diff reach outside it
+    parts = PurePosixPath(path).parts
+    if not parts or path.startswith(("/", "\\")) or re.match(r"^[A-Za-z]:", path) or ".." in parts:
+        raise PatchError(f"Unsafe path in diff header: {line[4:].strip()!r}")
+    return path
+
+
+def diff_lines(lines: list[str]):
+    """
+    ``(index, kind)`` for every line of a diff: ``"file"`` for a ``---``/``+++``
+    header pair (reported once, at the ``---`` line), ``"hunk"``, ``"body"`` or
+    ``None`` for anything else.
+
+    A hunk body runs for as many lines as its header counts, and ``---``/``+++``
+    lines inside it are removed or added lines (SQL comments, usually), never
+    headers. Generated diffs often undercount, so body lines after that still
+    belong to the hunk until the next hunk or file header.
+    """
+    in_hunk, old_left, new_left = False, 0, 0
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        counted = old_left > 0 or new_left > 0
+        if not counted and line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            yield i, "file"
+            in_hunk = False
+            i += 2
+            continue
+        match = HUNK_RE.match(line)
+        if match:
+            _, old_count, _, new_count = match.groups()
+            in_hunk, old_left, new_left = True, int(old_count or 1), int(new_count or 1)
+            yield i, "hunk"
+        elif in_hunk and (line[:1] in (" ", "-", "+", "\\") or line == ""):
+            tag = line[:1] or " "
+            if tag in " -":
+                old_left -= 1
+            if tag in " +":
+                new_left -= 1
+            yield i, "body"
+        else:
+            if line.startswith(("diff ", "index ", "new file", "deleted file", "similarity", "rename ", "old mode", "new mode")):
+                in_hunk = False
+            # Prose between hunks is skipped, and so is a hunk's count once it is interrupted
+            old_left = new_left = 0
+            yield i, None
+        i += 1
+
+
+def parse_patch(diff_text: str) -> list[FilePatch]:
+    """
+    Every file section of a unified diff, with its hunks.
+
+    Hunk bodies are delimited as described in ``diff_lines``; the counts in
+    the headers are recomputed from the bodies, since generated diffs often
+    get them wrong.
+    """
+    patches, current, hunk = [], None, None
+    lines = diff_text.splitlines()
+    for i, kind in diff_lines(lines):
+        line = lines[i]
+        if kind == "file":
+            current = FilePatch(_header_path(line), _header_path(lines[i + 1]))
+            patches.append(current)
+            hunk = None
+        elif kind == "hunk":
+            if current is None:
+                raise PatchError("Hunk before any '---'/'+++' file header")
+            old_start, old_count, new_start, new_count = HUNK_RE.match(line).groups()
+            hunk = Hunk(int(old_start), int(old_count or 1), int(new_start), int(new_count or 1))
+            current.hunks.append(hunk)
+        elif kind == "body" and line.startswith(NO_NEWLINE[:2]):
+            if hunk.lines:
+                tag = hunk.lines[-1][0]
+                if tag in " -":
+                    hunk.old_eof_newline = False
+                if tag in " +":
+                    hunk.new_eof_newline = False
+        elif kind == "body":
+            # Editors and models alike drop the space of blank context lines
+            hunk.lines.append((line[0], line[1:]) if line else (" ", ""))
+
+    for patch in patches:
+        for hunk in patch.hunks:
+            while hunk.lines and hunk.lines[-1] == (" ", ""):
+                hunk.lines.pop()
+            hunk.old_count = len(hunk.old_lines())
+            hunk.new_count = len(hunk.new_lines())
+    patches = [patch for patch in patches if patch.hunks or patch.new_path is None]
+    if not patches:
+        raise PatchError("No hunks in diff")
+    return patches
+
+
+def _matches(lines: list[str], at: int, block: list[str], loose: bool) -> bool:
+    if at < 0 or at + len(block) > len(lines):
+        return False
+    if loose:
+        return all(a.strip() == b.strip() for a, b in zip(lines[at:at + len(block)], block))
+    return lines[at:at + len(block)] == block
+
+
+def _find(lines: list[str], block: list[str], expected: int, floor: int, loose: bool) -> int | None:
+    """Position of ``block`` at or after ``floor``, nearest to ``expected``."""
+    expected = max(floor, min(expected, len(lines) - len(block)))
+    for distance in range(len(lines) + 1):
+        before, after = expected - distance, expected + distance
+        if after <= len(lines) - len(block) and _matches(lines, after, block, loose):
+            return after
+        if distance and before >= floor and _matches(lines, before, block, loose):
+            return before
+        if after > len(lines) - len(block) and before < floor:
+            return None
+    return None
+
+
+def _split(text: str) -> tuple[list[str], bool]:
+    if text == "":
+        return [], True
+    trailing = text.endswith("\n")
+    return (text[:-1] if trailing else text).split("\n"), trailing
+
+
+def apply_hunks(text: str, hunks: list[Hunk], path: str = "", max_fuzz: int = PATCH_MAX_FUZZ):
+    """
+    ``text`` with ``hunks`` applied in order, plus what was applied and what was rejected.
+
+    A hunk is looked for where its header puts it, adjusted by how much earlier
+    hunks grew or shrank the file, then ever further away. If the body does not
+    match exactly, whitespace differences are ignored, then up to ``max_fuzz``
+    context lines are dropped from each end. Rejected hunks leave the text alone.
+    """
+    lines, trailing = _split(text)
+    applied, rejected = [], []
+    delta, floor = 0, 0
+    for number, hunk in enumerate(hunks, 1):
+        found = None
+        for fuzz in range(max_fuzz + 1):
+            old = hunk.old_lines(fuzz)
+            if fuzz and old == hunk.old_lines(fuzz - 1):
+                break
+            # For a pure insertion the header line is where the new lines go after
+            start = hunk.old_start if hunk.old_count == 0 else hunk.old_start - 1
+            expected = start + hunk.leading_context(fuzz) + delta
+            if not old:
+                # Nothing left to anchor on once fuzz has dropped all the context
+                if not fuzz and floor <= expected <= len(lines):
+                    found = (expected, fuzz, False)
+                break
+            for loose in (False, True):
+                at = _find(lines, old, expected, floor, loose)
+                if at is not None:
+                    found = (at, fuzz, loose)
+                    break
+            if found:
+                break
+        if found is None:
+            rejected.append(Rejection(path, number, hunk.header, "context does not match the file"))
+            continue
+        at, fuzz, loose = found
+        old, new = hunk.old_lines(fuzz), hunk.new_lines(fuzz)
+        lines[at:at + len(old)] = new
+        applied.append(AppliedHunk(path, number, at - expected, fuzz, loose))
+        delta += len(new) - len(old)
+        floor = at + len(new)
+        if floor >= len(lines):
+            if not hunk.new_eof_newline:
+                trailing = False
+            elif not hunk.old_eof_newline:
+                trailing = True
+    updated = "\n".join(lines) + ("\n" if trailing and lines else "")
+    return updated, applied, rejected
+
+
+def apply_patches(sources: dict[str, str], patches: list[FilePatch], max_fuzz: int = PATCH_MAX_FUZZ) -> PatchResult:
+    """
+    Apply every file patch to the texts in ``sources`` (by path), in memory.
+
+    ``files`` of the result holds the new text of every patched path; nothing
+    in ``sources`` is modified. Several patches for one path apply in turn.
+    """
+    result = PatchResult()
+    for patch in patches:
+        path = patch.path
+        if path in result.files:
+            current = result.files[path]
+        elif patch.old_path is None:
+            if path in sources:
+                result.rejected.append(Rejection(path, 0, "", "file already exists"))
+                continue
+            current = ""
+        else:
+            current = sources.get(patch.old_path)
+        if current is None:
+            result.rejected.extend(Rejection(path, n, h.header, "file not found") for n, h in enumerate(patch.hunks, 1))
+            continue
+        updated, applied, rejected = apply_hunks(current, patch.hunks, path, max_fuzz)
+        result.applied.extend(applied)
+        result.rejected.extend(rejected)
+        if patch.new_path is None:
+            result.files[patch.old_path] = None
+            continue
+        result.files[path] = updated
+        if patch.old_path and patch.old_path != path:
+            result.files[patch.old_path] = None
+    return result
+
+
+def _inside(root: Path, path: str) -> Path:
+    """``root / path``, refusing anything that resolves outside ``root`` (e.g. through a symlink)."""
+    target = (root / path).resolve()
+    if not target.is_relative_to(root.resolve()):
+        raise PatchError(f"Path outside the repository: {path}")
+    return target
+
+
+def apply_to_tree(root: Path, diff_text: str, max_fuzz: int = PATCH_MAX_FUZZ) -> PatchResult:
+    """
+    Apply a (multi-file) diff to the files under ``root``.
+
+    Every hunk is applied in memory first; files are written only when none
+    was rejected, so a failed patch leaves the tree exactly as it was.
+    """
+    root = Path(root)
+    patches = parse_patch(diff_text)
+    targets = {}
+    for patch in patches:
+        for path in (patch.old_path, patch.new_path):
+            if path and path not in targets:
+                targets[path] = _inside(root, path)
+    sources = {path: target.read_text() for path, target in targets.items() if target.is_file()}
+    result = apply_patches(sources, patches, max_fuzz)
+    if result.ok:
+        for path, text in result.files.items():
+            target = targets[path]
+            if text is None:
+                target.unlink(missing_ok=True)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_text(text)
+    return result
@@ -1,8 +1,7 @@
 import os
 import sys
-from github import Github
 from github.GithubException import GithubException
-import requests
+from ai_dbt_bot.github_client import get_client, priority, HIGH
 
 # ——— Configuration ———
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")  # Make sure this env var is set
@@ -10,32 +9,7 @@ OWNER        = "adhikarisidd17"
 REPO         = "ai-based-data-engineering"
 PR_NUMBER  = 39  # the PR number you want to mark ready
 
-# ——— Authenticate via PyGithub ———
-if not GITHUB_TOKEN:
-    sys.exit("❌ Please set the GITHUB_TOKEN environment variable with repo scope.")
-
-gh = Github(GITHUB_TOKEN,verify=False)
-
-# ——— Authenticate ———
-if not GITHUB_TOKEN:
-    sys.exit("❌ Please set the GITHUB_TOKEN environment variable.")
-
-gh = Github(GITHUB_TOKEN)
-
-# ——— 1. Authenticate and fetch the PR node ID ———
-try:
-    gh   = Github(GITHUB_TOKEN)
-    repo = gh.get_repo(f"{OWNER}/{REPO}")
-    pr   = repo.get_pull(PR_NUMBER)
-    if not pr.draft:
-        print(f"ℹ️ PR #{PR_NUMBER} is already ready for review.")
-        sys.exit(0)
-    pr_node_id = pr.node_id
-except GithubException as e:
-    sys.exit(f"🚨 GitHub error while fetching PR: {e.status} – {e.data}")
-
-# ——— 2. Prepare and send the GraphQL mutation ———
-mutation = """
+MUTATION = """
 mutation($prId: ID!) {
   markPullRequestReadyForReview(input: { pullRequestId: $prId }) {
     pullRequest {
@@ -46,43 +20,38 @@ mutation($prId: ID!) {
 }
 """
 
-headers = {
-    "Authorization": f"Bearer {GITHUB_TOKEN}"
-}
 
-payload = {
-    "query":     mutation,
-    "variables": {"prId": pr_node_id}
-}
+def mark_ready_for_review(repo, pr_number: int) -> dict | None:
+    """Take a draft PR out of draft; returns ``{number, isDraft}``, or None if it was not a draft.
 
-resp = requests.post("https://api.github.com/graphql", json=payload, headers=headers)
-
-# Handle HTTP errors
-try:
-    resp.raise_for_status()
-except requests.HTTPError as e:
-    print("🚨 HTTP error:", e, resp.text)
-    sys.exit(1)
-
-result = resp.json()
-
-# Handle GraphQL errors
-if "errors" in result:
-    print("🚨 GraphQL errors:")
-    for err in result["errors"]:
-        print(" •", err.get("message"))
-    sys.exit(1)
-
-# Ensure we have the expected payload
-payload = result.get("data", {}).get("markPullRequestReadyForReview")
-if not payload or "pullRequest" not in payload:
-    print("🚨 Unexpected response shape:", result)
-    sys.exit(1)
-
-pr_data = payload["pullRequest"]
-
-# ——— 3. Check the result ———
-if pr_data.get("isDraft") is False:
-    print(f"✅ PR #{pr_data['number']} is now ready for review!")
-else:
-    print("⚠️ Failed to mark PR ready for review:", pr_data)
\ No newline at end of file
+    Raises ``GithubException`` for REST and GraphQL errors alike.
+    """
+    pr = repo.get_pull(pr_number)
+    if not pr.draft:
+        return None
+    # The PR is already written; do not let queued background reads hold it up
+    with priority(HIGH):
+        _, result = repo._requester.graphql_query(MUTATION, {"prId": pr.node_id})
+    payload = (result.get("data") or {}).get("markPullRequestReadyForReview")
+    if not payload or "pullRequest" not in payload:
+        raise GithubException(500, result, None, "Unexpected response shape")
+    return payload["pullRequest"]
+
+
+if __name__ == "__main__":
+    # ——— Authenticate ———
+    if not GITHUB_TOKEN:
+        sys.exit("❌ Please set the GITHUB_TOKEN environment variable with repo scope.")
+
+    repo = get_client(GITHUB_TOKEN).get_repo(f"{OWNER}/{REPO}")
+    try:
+        pr_data = mark_ready_for_review(repo, PR_NUMBER)
+    except GithubException as e:
+        sys.exit(f"🚨 GitHub error: {e.status} – {e.data}")
+
+    if pr_data is None:
+        print(f"ℹ️ PR #{PR_NUMBER} is already ready for review.")
+    elif pr_data.get("isDraft") is False:
+        print(f"✅ PR #{pr_data['number']} is now ready for review!")
+    else:
+        print("⚠️ Failed to mark PR ready for review:", pr_data)
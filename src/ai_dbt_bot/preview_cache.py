@@ -0,0 +1,121 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from github import GithubException
+
+NEXT_LINK_RE = re.compile(r'<([^>]+)>;\s*rel="next"')
+
+
+@dataclass
+class PreviewEntry:
+    head_sha: str
+    base_sha: str
+    payload: dict
+    pr_etag: str | None = None
+    checked_at: float = field(default=0.0)
+
+    @property
+    def etag(self) -> str:
+        # The file list is fully determined by the two commits it compares
+        return f'"{self.head_sha}.{self.base_sha}"'
+
+
+class PreviewCache:
+    """
+    PR number -> file preview, cached per head commit.
+
+    Every lookup revalidates the pull request with ``If-None-Match``; GitHub
+    answers an unchanged PR with a 304 that does not count against the rate
+    limit. The file list is only paged through again when the head (or base)
+    commit actually moved.
+    """
+
+    def __init__(self, repo, max_entries: int = 256, check_interval: float = 0.0):
+        self.repo = repo
+        self.max_entries = max_entries
+        # Seconds during which an entry is served without asking GitHub again
+        self.check_interval = check_interval
+        self.stats = {"hits": 0, "not_modified": 0, "refreshes": 0}
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _get_json(self, url: str, etag: str | None = None, parameters: dict | None = None):
+        headers = {"If-None-Match": etag} if etag else None
+        status, resp_headers, body = self.repo._requester.requestJson(
+            "GET", url, parameters=parameters, headers=headers
+        )
+        if status == 304:
+            return status, resp_headers, None
+        data = json.loads(body) if body else None
+        if status >= 400:
+            raise GithubException(status, data, resp_headers)
+        return status, resp_headers, data
+
+    def _fetch_files(self, pr_number: int) -> list[dict]:
+        files = []
+        url, parameters = f"{self.repo.url}/pulls/{pr_number}/files", {"per_page": 100}
+        while url:
+            _, headers, page = self._get_json(url, parameters=parameters)
+            for f in page:
+                files.append({
+                    "filename":  f["filename"],
+                    "status":    f["status"],
+                    "additions": f["additions"],
+                    "deletions": f["deletions"],
+                    "patch":     f.get("patch"),       # absent for binary or huge files
+                })
+            match = NEXT_LINK_RE.search(headers.get("link", ""))
+            # The next link already carries per_page and page
+            url, parameters = (match.group(1) if match else None), None
+        return files
+
+    def get(self, pr_number: int) -> tuple[str, dict]:
+        """Return ``(etag, payload)`` for the PR's current head."""
+        with self._lock:
+            entry = self._entries.get(pr_number)
+            if entry is not None:
+                self._entries.move_to_end(pr_number)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at < self.check_interval:
+            self.stats["hits"] += 1
+            return entry.etag, entry.payload
+
+        status, headers, pull = self._get_json(
+            f"{self.repo.url}/pulls/{pr_number}", etag=entry.pr_etag if entry else None
+        )
+        if status == 304:
+            self.stats["not_modified"] += 1
+            entry.checked_at = now
+            return entry.etag, entry.payload
+
+        head_sha, base_sha = pull["head"]["sha"], pull["base"]["sha"]
+        if entry is not None and (entry.head_sha, entry.base_sha) == (head_sha, base_sha):
+            # The PR changed (title, labels, ...) but its diff did not
+            self.stats["hits"] += 1
+            entry.pr_etag, entry.checked_at = headers.get("etag"), now
+            return entry.etag, entry.payload
+
+        self.stats["refreshes"] += 1
+        entry = PreviewEntry(
+            head_sha=head_sha,
+            base_sha=base_sha,
+            payload={"head_sha": head_sha, "files": self._fetch_files(pr_number)},
+            pr_etag=headers.get("etag"),
+            checked_at=now,
+        )
+        with self._lock:
+            self._entries[pr_number] = entry
+            self._entries.move_to_end(pr_number)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry.etag, entry.payload
+
+    def invalidate(self, pr_number: int | None = None) -> None:
+        with self._lock:
+            if pr_number is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(pr_number, None)
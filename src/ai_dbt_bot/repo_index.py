@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from .metrics import span
+from .model_resolver import ModelResolver
+
+
+class RepoTreeIndex:
+    """
+    Shared, in-process index of a branch's git tree.
+
+    The recursive tree is downloaded once and kept keyed by the tree SHA of the
+    branch head; it is only fetched again when the head moves. Paths are split
+    by extension and by the ``models/`` prefix so lookups never rescan the tree.
+    """
+
+    def __init__(self, repo, branch: str, prefix: str = "models/", check_interval: float = 0.0):
+        self.repo = repo
+        self.branch = branch
+        self.prefix = prefix
+        # Seconds during which the head is trusted without asking GitHub again
+        self.check_interval = check_interval
+        self.stats = {"hits": 0, "misses": 0, "head_checks": 0}
+        self._lock = threading.Lock()
+        self._head_sha = None
+        self._tree_sha = None
+        self._checked_at = 0.0
+        self._all = {}
+        self._prefixed = {}
+        self._resolvers = {}
+
+    @property
+    def tree_sha(self) -> str | None:
+        return self._tree_sha
+
+    def _current_head(self) -> str:
+        self.stats["head_checks"] += 1
+        return self.repo.get_git_ref(f"heads/{self.branch}").object.sha
+
+    def _load(self, head_sha: str) -> None:
+        with span("tree_fetch") as attrs:
+            tree = self.repo.get_git_tree(head_sha, recursive=True)
+            attrs["entries"] = len(tree.tree)
+        by_ext, prefixed = {}, {}
+        for item in tree.tree:
+            if item.type != "blob":
+                continue
+            ext = os.path.splitext(item.path)[1].lower()
+            by_ext.setdefault(ext, []).append(item.path)
+            if item.path.startswith(self.prefix):
+                prefixed.setdefault(ext, []).append(item.path)
+        self._all, self._prefixed = by_ext, prefixed
+        self._resolvers = {}
+        self._head_sha, self._tree_sha = head_sha, tree.sha
+
+    def refresh(self, force: bool = False) -> str:
+        """Make sure the index matches the branch head and return its tree SHA."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._tree_sha and now - self._checked_at < self.check_interval:
+                self.stats["hits"] += 1
+                return self._tree_sha
+            head_sha = self._current_head()
+            self._checked_at = now
+            if force or head_sha != self._head_sha:
+                self.stats["misses"] += 1
+                self._load(head_sha)
+            else:
+                self.stats["hits"] += 1
+            return self._tree_sha
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._head_sha = self._tree_sha = None
+            self._checked_at = 0.0
+
+    def paths(self, *suffixes: str, under_prefix: bool = True) -> list[str]:
+        """All paths ending in one of ``suffixes``, optionally limited to the prefix."""
+        self.refresh()
+        source = self._prefixed if under_prefix else self._all
+        found = []
+        for suffix in suffixes:
+            found.extend(source.get(suffix.lower(), []))
+        return found
+
+    def resolver(self, *suffixes: str) -> ModelResolver:
+        """Name resolver over the prefixed paths with these suffixes, rebuilt only when the tree changes."""
+        self.refresh()
+        resolvers, prefixed = self._resolvers, self._prefixed
+        found = resolvers.get(suffixes)
+        if found is None:
+            paths = [p for suffix in suffixes for p in prefixed.get(suffix.lower(), [])]
+            found = resolvers[suffixes] = ModelResolver(paths)
+        return found
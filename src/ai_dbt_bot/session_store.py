@@ -0,0 +1,228 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+# Sessions not touched for this long are dropped (default: 7 days)
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+# e.g. "sqlite:///var/lib/ai-dbt-bot/sessions.db" or "memory://"
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "sqlite:///sessions.db")
+
+
+class SessionStore(ABC):
+    """
+    Maps a session id to its draft PR: ``{"branch", "pr_number", "pr_url", "prompt"}``.
+
+    Every write refreshes the session's expiry; expired sessions are invisible
+    to reads and are removed on the next write. Subclasses only implement the
+    storage, so another backend can be plugged in through ``open_session_store``.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_sessions: int | None = None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+
+    @abstractmethod
+    def get(self, session_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def put(self, session_id: str, info: dict) -> None:
+        ...
+
+    @abstractmethod
+    def pop(self, session_id: str) -> dict | None:
+        ...
+
+    @abstractmethod
+    def find_by_pr(self, pr_number: int) -> tuple[str, dict] | None:
+        ...
+
+    @abstractmethod
+    def find_by_branch(self, branch: str) -> tuple[str, dict] | None:
+        ...
+
+    @abstractmethod
+    def evict(self) -> int:
+        """Drop expired sessions, then the least recently used beyond ``max_sessions``."""
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+class MemorySessionStore(SessionStore):
+    """Single-process store; sessions are lost on restart."""
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_sessions: int | None = None):
+        super().__init__(ttl, max_sessions)
+        self._sessions = {}   # session_id -> (expires_at, info), oldest write first
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] < time.time():
+                return None
+            return dict(entry[1])
+
+    def put(self, session_id, info):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = (time.time() + self.ttl, dict(info))
+            self._evict_locked()
+
+    def pop(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None or entry[0] < time.time():
+                return None
+            return entry[1]
+
+    def _find(self, field, value):
+        now = time.time()
+        with self._lock:
+            for sid, (expires_at, info) in self._sessions.items():
+                if expires_at >= now and info.get(field) == value:
+                    return sid, dict(info)
+        return None
+
+    def find_by_pr(self, pr_number):
+        return self._find("pr_number", pr_number)
+
+    def find_by_branch(self, branch):
+        return self._find("branch", branch)
+
+    def evict(self):
+        with self._lock:
+            return self._evict_locked()
+
+    def _evict_locked(self):
+        now = time.time()
+        expired = [sid for sid, (expires_at, _) in self._sessions.items() if expires_at < now]
+        for sid in expired:
+            del self._sessions[sid]
+        removed = len(expired)
+        if self.max_sessions is not None:
+            while len(self._sessions) > self.max_sessions:
+                del self._sessions[next(iter(self._sessions))]
+                removed += 1
+        return removed
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Store shared by every worker process on a host through one SQLite file.
+
+    WAL mode lets readers proceed while another worker writes; each thread
+    keeps its own connection.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        branch     TEXT NOT NULL,
+        pr_number  INTEGER,
+        pr_url     TEXT,
+        prompt     TEXT,
+        updated_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_pr_number  ON sessions (pr_number);
+    CREATE INDEX IF NOT EXISTS sessions_branch     ON sessions (branch);
+    CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at);
+    """
+
+    def __init__(self, path: str, ttl: float = SESSION_TTL_SECONDS, max_sessions: int | None = None):
+        super().__init__(ttl, max_sessions)
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(self.SCHEMA)
+            # Databases created before pr_url was stored
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(sessions)")}
+            if "pr_url" not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN pr_url TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _info(row) -> dict:
+        info = {"branch": row["branch"], "pr_number": row["pr_number"], "prompt": row["prompt"]}
+        # Rows written before the PR URL was known leave it out, so callers look it up once
+        if row["pr_url"] is not None:
+            info["pr_url"] = row["pr_url"]
+        return info
+
+    def _find(self, where: str, value):
+        row = self._conn().execute(
+            f"SELECT * FROM sessions WHERE {where} = ? AND expires_at >= ? "
+            "ORDER BY updated_at DESC LIMIT 1",
+            (value, time.time()),
+        ).fetchone()
+        return row
+
+    def get(self, session_id):
+        row = self._find("session_id", session_id)
+        return self._info(row) if row else None
+
+    def put(self, session_id, info):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, branch, pr_number, pr_url, prompt, updated_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET branch=excluded.branch, "
+                "pr_number=excluded.pr_number, pr_url=excluded.pr_url, prompt=excluded.prompt, "
+                "updated_at=excluded.updated_at, expires_at=excluded.expires_at",
+                (session_id, info["branch"], info.get("pr_number"), info.get("pr_url"), info.get("prompt"),
+                 now, now + self.ttl),
+            )
+            self._evict(conn, now)
+
+    def pop(self, session_id):
+        with self._conn() as conn:
+            row = conn.execute(
+                "DELETE FROM sessions WHERE session_id = ? RETURNING *", (session_id,)
+            ).fetchone()
+        if row is None or row["expires_at"] < time.time():
+            return None
+        return self._info(row)
+
+    def find_by_pr(self, pr_number):
+        row = self._find("pr_number", pr_number)
+        return (row["session_id"], self._info(row)) if row else None
+
+    def find_by_branch(self, branch):
+        row = self._find("branch", branch)
+        return (row["session_id"], self._info(row)) if row else None
+
+    def evict(self):
+        with self._conn() as conn:
+            return self._evict(conn, time.time())
+
+    def _evict(self, conn, now) -> int:
+        removed = conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,)).rowcount
+        if self.max_sessions is not None:
+            removed += conn.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            ).rowcount
+        return removed
+
+
+def open_session_store(url: str = SESSION_STORE_URL, **kwargs) -> SessionStore:
+    if url.startswith("memory:"):
+        return MemorySessionStore(**kwargs)
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):], **kwargs)
+    raise ValueError(f"Unsupported SESSION_STORE_URL '{url}'")
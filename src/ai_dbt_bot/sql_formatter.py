@@ -0,0 +1,167 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+SQLFLUFF_DIALECT = os.getenv("SQLFLUFF_DIALECT", "bigquery")
+# 0 keeps the linter in this process; more runs fixes in parallel worker processes
+SQLFLUFF_WORKERS = int(os.getenv("SQLFLUFF_WORKERS", "2"))
+
+# One warm linter per process, built on first use
+_linters = {}
+
+
+def _linter(dialect: str):
+    linter = _linters.get(dialect)
+    if linter is None:
+        from sqlfluff.core import FluffConfig, Linter
+        linter = _linters[dialect] = Linter(config=FluffConfig(overrides={"dialect": dialect}))
+    return linter
+
+
+def _warm(dialect: str) -> None:
+    _linter(dialect).lint_string("select 1\n", fname="warmup.sql", fix=True)
+
+
+def fix_sql(sql: str, filename: str, dialect: str = SQLFLUFF_DIALECT) -> str:
+    """``sqlfluff fix`` on a string; raises ValueError when the SQL does not parse or template."""
+    result = _linter(dialect).lint_string(sql, fname=filename, fix=True)
+    if any(v.rule_code() in ("PRS", "TMP") for v in result.violations):
+        raise ValueError("; ".join(v.desc() for v in result.violations if v.rule_code() in ("PRS", "TMP")))
+    fixed, _ = result.fix_string()
+    return fixed
+
+
+class SqlFormatter:
+    """
+    Long-lived replacement for spawning ``sqlfluff fix`` per file.
+
+    The linter and dialect are loaded once, either in this process or in a
+    small pool of worker processes, and results are cached by content hash
+    so unchanged SQL is never linted twice.
+    """
+
+    def __init__(self, dialect: str = SQLFLUFF_DIALECT, workers: int = SQLFLUFF_WORKERS, cache_size: int = 1024):
+        self.dialect = dialect
+        self.workers = workers
+        self.cache_size = cache_size
+        self.stats = {"hits": 0, "misses": 0, "failures": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local_lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that already runs threads is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm,
+                    initargs=(self.dialect,),
+                )
+            return self._pool
+
+    def _drop_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Forget a pool whose worker died, so the next call starts a fresh one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fix_in_pool(self, files: list[tuple[str, str]], indices) -> dict:
+        """Outcome (fixed SQL or exception) per index; a broken pool is rebuilt and retried once."""
+        outcomes = {}
+        for _ in range(2):
+            pool = self._get_pool()
+            try:
+                futures = {i: pool.submit(fix_sql, files[i][0], files[i][1], self.dialect) for i in indices}
+            except BrokenProcessPool as e:
+                outcomes.update({i: e for i in indices})
+                self._drop_pool(pool)
+                continue
+            for i, future in futures.items():
+                try:
+                    outcomes[i] = future.result()
+                except Exception as e:
+                    outcomes[i] = e
+            indices = [i for i in indices if isinstance(outcomes[i], BrokenProcessPool)]
+            if not indices:
+                break
+            self._drop_pool(pool)
+        return outcomes
+
+    def _key(self, sql: str) -> str:
+        return hashlib.sha256(f"{self.dialect}\0{sql}".encode()).hexdigest()
+
+    def _cached(self, key: str) -> str | None:
+        with self._lock:
+            fixed = self._cache.get(key)
+            if fixed is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+            return fixed
+
+    def _store(self, key: str, fixed: str) -> None:
+        with self._lock:
+            self.stats["misses"] += 1
+            self._cache[key] = fixed
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def warm_up(self) -> None:
+        """Load the dialect (and start the workers) before the first request needs them."""
+        if self.workers > 0:
+            pool = self._get_pool()
+            for future in [pool.submit(_warm, self.dialect) for _ in range(self.workers)]:
+                future.result()
+        else:
+            with self._local_lock:
+                _warm(self.dialect)
+
+    def fix(self, sql: str, filename: str) -> str:
+        return self.fix_many([(sql, filename)])[0]
+
+    def fix_many(self, files: list[tuple[str, str]]) -> list[str]:
+        """Fix ``(sql, filename)`` pairs in parallel; results follow the input order."""
+        results = [None] * len(files)
+        pending = {}
+        for i, (sql, filename) in enumerate(files):
+            key = self._key(sql)
+            fixed = self._cached(key)
+            if fixed is not None:
+                results[i] = fixed
+            else:
+                pending[i] = key
+
+        if self.workers > 0 and pending:
+            outcomes = self._fix_in_pool(files, list(pending))
+        else:
+            outcomes = {}
+            for i in pending:
+                try:
+                    with self._local_lock:
+                        outcomes[i] = fix_sql(files[i][0], files[i][1], self.dialect)
+                except Exception as e:
+                    outcomes[i] = e
+
+        for i, outcome in outcomes.items():
+            sql, filename = files[i]
+            if isinstance(outcome, Exception):
+                print(f"Warning: SQLFluff fix skipped for {filename}: {outcome}")
+                with self._lock:
+                    self.stats["failures"] += 1
+                outcome = sql
+            self._store(pending[i], outcome)
+            results[i] = outcome
+        return results
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+
+# "background" warms clients after the server starts listening, "blocking"
+# warms them before it accepts requests, "off" leaves everything to first use
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
+
+
+def lazy(factory):
+    """Getter that builds ``factory()`` once, on first call, from whichever thread gets there first."""
+    lock = threading.Lock()
+    box = []
+
+    def get():
+        if not box:
+            with lock:
+                if not box:
+                    box.append(factory())
+        return box[0]
+
+    get.built = lambda: bool(box)
+    return get
+
+
+class WarmUp:
+    """
+    Runs named warm-up steps once, inline or on a background thread, and
+    records how long each took. A failing step is recorded and skipped, so
+    the service still starts; the work simply happens on first use instead.
+    """
+
+    def __init__(self, steps: dict):
+        self.steps = steps
+        self.state = "pending"
+        self.results = {}
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    def run(self) -> None:
+        with self._lock:
+            if self.state != "pending":
+                return
+            self.state = "running"
+        started = time.perf_counter()
+        for name, step in self.steps.items():
+            t0 = time.perf_counter()
+            try:
+                step()
+                self.results[name] = {"seconds": round(time.perf_counter() - t0, 4)}
+            except Exception as e:
+                self.results[name] = {"seconds": round(time.perf_counter() - t0, 4), "error": str(e)}
+        self.seconds = round(time.perf_counter() - started, 4)
+        self.state = "done"
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> dict:
+        return {"state": self.state, "seconds": self.seconds, "steps": dict(self.results)}
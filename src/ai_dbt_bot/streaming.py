@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+# Seconds between keep-alive comments while nothing else is sent
+HEARTBEAT_SECONDS = 15
+
+
+def format_sse(event: str, data) -> str:
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines = "".join(f"data: {line}\n" for line in payload.splitlines() or [""])
+    return f"event: {event}\n{lines}\n"
+
+
+class EventStream:
+    """
+    Bridges pipeline events raised on worker threads to a Server-Sent Events
+    response running on the event loop.
+
+    Must be created inside a request handler so it can capture the running
+    loop. ``emit`` is safe to call from any thread. The stream ends after a
+    ``done`` or ``error`` event; if the client goes away first, ``on_close``
+    is called so the producer can stop early.
+    """
+
+    TERMINAL = {"done", "error"}
+
+    def __init__(self, on_close=None):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self.on_close = on_close
+        self.closed = False
+
+    def emit(self, event: str, data) -> None:
+        if self.closed:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (event, data))
+        except RuntimeError:
+            # The loop is gone; nobody is listening any more
+            self.closed = True
+
+    async def events(self):
+        finished = False
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(self._queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event, data)
+                if event in self.TERMINAL:
+                    finished = True
+                    return
+        finally:
+            self.closed = True
+            if not finished and self.on_close is not None:
+                self.on_close()
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class Broadcaster:
+    """
+    Fans events out to every connected client, e.g. PR changes learned from
+    GitHub webhooks. ``publish`` is safe to call from any thread; a client
+    only receives the events its ``match`` accepts.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+
+    def subscribe(self, match=None) -> EventStream:
+        """Open a stream for one client; call inside the request handler."""
+        stream = EventStream(on_close=lambda: self._subscribers.pop(stream, None))
+        self._subscribers[stream] = match
+        return stream
+
+    def publish(self, event: str, data) -> int:
+        """Send ``event`` to every matching subscriber and return how many got it."""
+        sent = 0
+        for stream, match in list(self._subscribers.items()):
+            if stream.closed:
+                self._subscribers.pop(stream, None)
+            elif match is None or match(event, data):
+                stream.emit(event, data)
+                sent += 1
+        return sent
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
@@ -1,19 +1,62 @@
 # translator_service.py
 
+import asyncio
+import json
 import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
+import httpx
 import openai
-import requests
 from fastapi.middleware.cors import CORSMiddleware
+from ai_dbt_bot.metrics import REGISTRY, CONTENT_TYPE, TraceMiddleware, record_span, span, traceparent
+from ai_dbt_bot.streaming import format_sse, SSE_HEADERS
 load_dotenv()
 # Load env: OPENAI_API_KEY, TECHNICAL_SERVICE_URL, TECHNICAL_SERVICE_TOKEN
 openai.api_key = os.getenv("OPENAI_API_KEY")
 TECH_URL   = os.getenv("TECH_SERVICE_URL")   # e.g. "https://prbot.mycompany.com/requests"
 TECH_TOKEN = os.getenv("TECH_SERVICE_TOKEN")
 
-app = FastAPI(title="High-Level Translator")
+# "http" forwards to TECH_URL; "inprocess" calls the PR-Bot pipeline directly when
+# both apps are deployed in one process, skipping the network hop entirely
+FORWARD_MODE = os.getenv("TRANSLATOR_FORWARD_MODE", "http")
+
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+TECH_TIMEOUT_SECONDS   = float(os.getenv("TECH_TIMEOUT_SECONDS", "30"))
+# Extra attempts after the first one, with exponential backoff in between
+MAX_RETRIES            = int(os.getenv("TRANSLATOR_MAX_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS  = 0.5
+
+# Pooled, keep-alive clients shared by every request; created on startup
+clients: dict[str, httpx.AsyncClient] = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    clients["openai"] = httpx.AsyncClient(
+        base_url=openai.api_base,
+        headers={"Authorization": f"Bearer {openai.api_key}"},
+        timeout=OPENAI_TIMEOUT_SECONDS,
+        limits=limits,
+    )
+    clients["tech"] = httpx.AsyncClient(
+        headers={"Authorization": f"Bearer {TECH_TOKEN}"},
+        timeout=TECH_TIMEOUT_SECONDS,
+        limits=limits,
+    )
+    try:
+        yield
+    finally:
+        for client in clients.values():
+            await client.aclose()
+        clients.clear()
+
+
+app = FastAPI(title="High-Level Translator", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,14 +65,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TraceMiddleware)
 
 class HighLevelRequest(BaseModel):
     prompt: str
     session_id: str | None = None
 
-@app.post("/translate-and-forward")
-def translate_and_forward(req: HighLevelRequest):
-    # 1) Ask the LLM to map your high-level ask into a JSON payload
+def translation_messages(prompt: str) -> list[dict]:
     sys_msg = """
     You are a dbt‐savvy engineer. The user request is:
       \"\"\"{prompt}\"\"\"
@@ -37,37 +79,179 @@ def translate_and_forward(req: HighLevelRequest):
       - files: a list of dbt model file paths this affects
       - prompt: a technical instruction string describing exactly what to change in each file
     Do NOT wrap the JSON in any markdown or text.
-    """.format(prompt=req.prompt)
-
-    resp = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role":"system","content":sys_msg},
-            {"role":"user","content":req.prompt}
-        ],
-        temperature=0
-    )
+    """.format(prompt=prompt)
+    return [
+        {"role":"system","content":sys_msg},
+        {"role":"user","content":prompt}
+    ]
+
+
+def parse_translation(payload: str) -> tuple[list[str], str]:
+    # Parse the model’s output as JSON
     try:
-        # Parse the model’s output as JSON
-        payload = resp.choices[0].message.content
-        data = __import__("json").loads(payload)
-        files = data["files"]
-        technical_prompt = data["prompt"]
+        data = json.loads(payload)
+        return data["files"], data["prompt"]
     except Exception as e:
         raise HTTPException(500, f"Failed to parse LLM JSON: {e}\nOutput: {payload}")
 
-    # 2) Forward to PR-Bot
-    headers = {
-        "Authorization": f"Bearer {TECH_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    body = {
-        "session_id": req.session_id,
+
+def trace_headers() -> dict:
+    """``traceparent`` for the PR-Bot, so its spans join this request's trace."""
+    header = traceparent()
+    return {"traceparent": header} if header else {}
+
+
+def forward_body(session_id: str | None, files: list[str], technical_prompt: str) -> dict:
+    return {
+        "session_id": session_id,
         "file_names": files,
         "analyst_prompt": technical_prompt
     }
-    resp = requests.post(TECH_URL, json=body, headers=headers)
-    if not resp.ok:
-        raise HTTPException(resp.status_code, resp.text)
 
+
+async def send_with_retries(client: httpx.AsyncClient, request: httpx.Request, retry_statuses, stream=False):
+    """Send ``request``, retrying connection failures and ``retry_statuses`` up to MAX_RETRIES times."""
+    for attempt in range(MAX_RETRIES + 1):
+        last = attempt == MAX_RETRIES
+        try:
+            resp = await client.send(request, stream=stream)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+            if last:
+                raise HTTPException(502, f"Upstream unreachable: {e}")
+        else:
+            if resp.status_code not in retry_statuses or last:
+                return resp
+            await resp.aclose()
+        await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+
+async def translate(prompt: str) -> tuple[list[str], str]:
+    client = clients["openai"]
+    request = client.build_request("POST", "/chat/completions", json={
+        "model": "gpt-4o-mini",
+        "messages": translation_messages(prompt),
+        "temperature": 0,
+    })
+    with span("translate", model="gpt-4o-mini") as attrs:
+        resp = await send_with_retries(client, request, retry_statuses={429, 500, 502, 503, 504})
+        if resp.is_error:
+            raise HTTPException(502, f"OpenAI error {resp.status_code}: {resp.text}")
+        data = resp.json()
+        attrs.update({k: v for k, v in (data.get("usage") or {}).items() if k != "total_tokens"})
+    return parse_translation(data["choices"][0]["message"]["content"])
+
+
+async def stream_translation(prompt: str):
+    """Yield the translation as it is generated."""
+    client = clients["openai"]
+    request = client.build_request("POST", "/chat/completions", json={
+        "model": "gpt-4o-mini",
+        "messages": translation_messages(prompt),
+        "temperature": 0,
+        "stream": True,
+    })
+    resp = await send_with_retries(client, request, retry_statuses={429, 500, 502, 503, 504}, stream=True)
+    try:
+        if resp.is_error:
+            await resp.aread()
+            raise HTTPException(502, f"OpenAI error {resp.status_code}: {resp.text}")
+        async for line in resp.aiter_lines():
+            if not line.startswith("data: ") or line == "data: [DONE]":
+                continue
+            text = json.loads(line[len("data: "):])["choices"][0]["delta"].get("content")
+            if text:
+                yield text
+    finally:
+        await resp.aclose()
+
+
+async def forward(body: dict) -> dict:
+    with span("forward", mode=FORWARD_MODE):
+        if FORWARD_MODE == "inprocess":
+            from ai_dbt_bot import main as pr_bot
+            return await pr_bot.handle_request(pr_bot.Request(**body))
+        client = clients["tech"]
+        request = client.build_request("POST", TECH_URL, json=body, headers=trace_headers())
+        # Only retry when the PR-Bot cannot have started the request
+        resp = await send_with_retries(client, request, retry_statuses={429, 503})
+    if resp.is_error:
+        raise HTTPException(resp.status_code, resp.text)
     return resp.json()
+
+
+async def forward_stream(body: dict):
+    """Yield the PR-Bot's already SSE-framed /requests/stream output."""
+    if FORWARD_MODE == "inprocess":
+        from ai_dbt_bot import main as pr_bot
+        response = await pr_bot.stream_request(pr_bot.Request(**body))
+        try:
+            async for chunk in response.body_iterator:
+                yield chunk
+        finally:
+            # Closing the PR-Bot stream early cancels its job
+            await response.body_iterator.aclose()
+        return
+    client = clients["tech"]
+    request = client.build_request("POST", TECH_URL.rstrip("/") + "/stream", json=body, headers=trace_headers())
+    resp = await send_with_retries(client, request, retry_statuses={429, 503}, stream=True)
+    try:
+        if resp.is_error:
+            await resp.aread()
+            yield format_sse("error", {"status": "failed", "error": resp.text})
+            return
+        async for chunk in resp.aiter_bytes():
+            yield chunk
+    finally:
+        await resp.aclose()
+
+
+@app.get("/ready")
+async def ready():
+    return {"ready": bool(clients)}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.post("/translate-and-forward")
+async def translate_and_forward(req: HighLevelRequest):
+    # 1) Ask the LLM to map your high-level ask into a JSON payload
+    files, technical_prompt = await translate(req.prompt)
+
+    # 2) Forward to PR-Bot
+    return await forward(forward_body(req.session_id, files, technical_prompt))
+
+
+@app.post("/translate-and-forward/stream")
+async def translate_and_forward_stream(req: HighLevelRequest):
+    """Streams the translation tokens, then relays the PR-Bot's /requests/stream events."""
+    async def events():
+        # Streams are timed by hand: the generator may be closed from another context
+        yield format_sse("stage", {"name": "translate"})
+        parts, started = [], time.perf_counter()
+        try:
+            async for text in stream_translation(req.prompt):
+                parts.append(text)
+                yield format_sse("token", {"file": None, "text": text})
+            files, technical_prompt = parse_translation("".join(parts))
+        except HTTPException as e:
+            record_span("translate", time.perf_counter() - started, error=True)
+            yield format_sse("error", {"status": "failed", "error": e.detail})
+            return
+        record_span("translate", time.perf_counter() - started, completion_tokens=len(parts))
+        yield format_sse("translated", {"files": files, "prompt": technical_prompt})
+
+        yield format_sse("stage", {"name": "forward"})
+        started, error = time.perf_counter(), False
+        try:
+            async for chunk in forward_stream(forward_body(req.session_id, files, technical_prompt)):
+                yield chunk
+        except HTTPException as e:
+            error = True
+            yield format_sse("error", {"status": "failed", "error": e.detail})
+        finally:
+            record_span("forward", time.perf_counter() - started, error=error)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,67 @@
+"""
+Replay recorded GitHub webhook deliveries against a running PR-Bot.
+
+Each file holds one delivery: ``{"event": "pull_request", "payload": {...}}``
+(an optional ``"delivery"`` id is sent as ``X-GitHub-Delivery``). Files that
+contain a bare payload need ``--event``. Bodies are signed with
+``GITHUB_WEBHOOK_SECRET`` exactly as GitHub would sign them.
+
+    python -m ai_dbt_bot.webhook_replay recordings/*.json --url http://localhost:8000
+"""
+import argparse
+import json
+import os
+import sys
+import uuid
+import httpx
+from dotenv import load_dotenv
+from ai_dbt_bot.webhooks import sign
+
+
+def load_delivery(path: str, event: str | None = None) -> tuple[str, str, dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if "payload" in data and "event" in data:
+        return data["event"], data.get("delivery") or str(uuid.uuid4()), data["payload"]
+    if event is None:
+        raise ValueError(f"{path}: bare payload, pass --event")
+    return event, str(uuid.uuid4()), data
+
+
+def replay(client: httpx.Client, url: str, secret: str, event: str, delivery: str, payload: dict) -> httpx.Response:
+    body = json.dumps(payload).encode()
+    return client.post(
+        url.rstrip("/") + "/webhooks/github",
+        content=body,
+        headers={
+            "Content-Type": "application/json",
+            "X-GitHub-Event": event,
+            "X-GitHub-Delivery": delivery,
+            "X-Hub-Signature-256": sign(secret, body),
+        },
+    )
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--event", help="event name for files holding a bare payload")
+    parser.add_argument("--secret", default=os.getenv("GITHUB_WEBHOOK_SECRET"))
+    args = parser.parse_args(argv)
+    if not args.secret:
+        parser.error("set GITHUB_WEBHOOK_SECRET or pass --secret")
+
+    failed = 0
+    with httpx.Client(timeout=30) as client:
+        for path in args.files:
+            event, delivery, payload = load_delivery(path, args.event)
+            resp = replay(client, args.url, args.secret, event, delivery, payload)
+            print(f"{path}: {event} -> {resp.status_code} {resp.text}")
+            failed += resp.is_error
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
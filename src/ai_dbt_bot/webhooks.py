@@ -0,0 +1,119 @@
+import hashlib
+import hmac
+import threading
+from collections import deque
+
+# Actions after which the PR's files or state may have changed
+PR_CHANGE_ACTIONS = {
+    "opened", "reopened", "synchronize", "edited", "closed",
+    "ready_for_review", "converted_to_draft",
+}
+
+
+def sign(secret: str, body: bytes) -> str:
+    """Value GitHub sends in ``X-Hub-Signature-256`` for ``body``."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(sign(secret, body), signature)
+
+
+class WebhookProcessor:
+    """
+    Applies GitHub ``pull_request`` and ``push`` events to the bot's caches,
+    so PR state is pushed to us instead of being polled.
+
+    Closed PRs and deleted branches end their session, pushes to the default
+    branch invalidate the tree index, PR changes invalidate that PR's preview,
+    and every change is published to the connected frontends.
+    """
+
+    def __init__(self, session_store, tree_index, preview_cache, broadcaster, default_branch: str,
+                 max_deliveries: int = 1000):
+        self.session_store = session_store
+        self.tree_index = tree_index
+        self.preview_cache = preview_cache
+        self.broadcaster = broadcaster
+        self.default_branch = default_branch
+        self.stats = {"received": 0, "ignored": 0, "duplicates": 0}
+        # GitHub redelivers on timeouts; remember recent delivery ids
+        self._seen = deque(maxlen=max_deliveries)
+        # Deliveries are handled on threadpool threads
+        self._lock = threading.Lock()
+
+    def handle(self, event: str, payload: dict, delivery: str | None = None) -> dict:
+        """Apply one event; returns a summary of what it changed."""
+        with self._lock:
+            if delivery is not None:
+                if delivery in self._seen:
+                    self.stats["duplicates"] += 1
+                    return {"event": event, "duplicate": True}
+                self._seen.append(delivery)
+            self.stats["received"] += 1
+            if event not in ("pull_request", "push"):
+                self.stats["ignored"] += 1
+                return {"event": event, "ignored": True}
+        if event == "pull_request":
+            return self._pull_request(payload)
+        return self._push(payload)
+
+    def _ignored(self, summary: dict) -> dict:
+        with self._lock:
+            self.stats["ignored"] += 1
+        return {**summary, "ignored": True}
+
+    def _pull_request(self, payload: dict) -> dict:
+        action = payload.get("action")
+        pr = payload["pull_request"]
+        number = pr["number"]
+        summary = {"event": "pull_request", "action": action, "pr_number": number}
+        if action not in PR_CHANGE_ACTIONS:
+            return self._ignored(summary)
+
+        self.preview_cache.invalidate(number)
+        if action == "closed":
+            found = self.session_store.find_by_pr(number)
+            if found is not None:
+                self.session_store.pop(found[0])
+                summary["session_closed"] = found[0]
+
+        self.broadcaster.publish("pull_request", {
+            "action":    action,
+            "pr_number": number,
+            "head_sha":  pr["head"]["sha"],
+            "state":     "merged" if pr.get("merged") else pr.get("state"),
+            "draft":     pr.get("draft", False),
+            "url":       pr.get("html_url"),
+        })
+        return summary
+
+    def _push(self, payload: dict) -> dict:
+        ref = payload.get("ref", "")
+        branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else None
+        summary = {"event": "push", "branch": branch}
+        if branch is None:
+            return self._ignored(summary)
+
+        if branch == self.default_branch:
+            self.tree_index.invalidate()
+            summary["tree_invalidated"] = True
+
+        found = self.session_store.find_by_branch(branch)
+        if found is not None:
+            sid, info = found
+            summary["pr_number"] = info["pr_number"]
+            # pull_request "synchronize" covers the diff; a deleted branch ends the session
+            if payload.get("deleted"):
+                self.session_store.pop(sid)
+                summary["session_closed"] = sid
+
+        self.broadcaster.publish("push", {
+            "branch":   branch,
+            "head_sha": payload.get("after"),
+            "deleted":  payload.get("deleted", False),
+            **({"pr_number": summary["pr_number"]} if "pr_number" in summary else {}),
+        })
+        return summary
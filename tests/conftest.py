@@ -0,0 +1,14 @@
+# tests/conftest.py
+import time
+import pytest
+
+
+@pytest.fixture
+def wait_for():
+    """Waits (up to ``timeout`` seconds) for a queued job to finish, and returns it."""
+    def wait(job, timeout=2.0):
+        deadline = time.time() + timeout
+        while job.finished_at is None and time.time() < deadline:
+            time.sleep(0.01)
+        return job
+    return wait
@@ -0,0 +1,108 @@
+# tests/test_chunking.py
+import pytest
+from ai_dbt_bot.chunking import (
+    split_sql, split_yaml, split_chunks, select_chunks, render_chunk_request,
+    parse_chunk_reply, splice_chunks,
+)
+
+SQL = """{{ config(materialized='table') }}
+
+with customers as (
+    select id, name from {{ ref('stg_customers') }} -- keep (
+),
+
+orders as (
+    select customer_id, count(*) as n_orders
+    from {{ ref('stg_orders') }}
+    where status != ')'
+    group by 1
+)
+
+select c.id, c.name, o.n_orders
+from customers c
+left join orders o on o.customer_id = c.id
+"""
+
+YAML = """version: 2
+
+models:
+  - name: d_customers
+    description: Customers
+    columns:
+      - name: id
+        tests:
+          - unique
+      - name: name
+    tests:
+      - dbt_utils.recency
+  - name: d_orders
+    columns:
+      - name: id
+"""
+
+
+def test_split_sql_into_ctes():
+    chunks = split_sql(SQL)
+    assert [c.name for c in chunks] == ["header", "cte customers", "cte orders", "final select"]
+    assert chunks[2].text.endswith("group by 1\n)")
+    assert chunks[3].text.startswith("select c.id")
+    assert split_sql("select 1 from x") == split_chunks("select 1 from x", "models/x.sql")
+    assert [c.name for c in split_sql("select 1 from x")] == ["file"]
+
+
+def test_split_yaml_per_model_and_column():
+    chunks = split_yaml(YAML)
+    assert [c.name for c in chunks] == [
+        "header", "model d_customers", "column d_customers.id", "column d_customers.name",
+        "model d_customers (rest)", "model d_orders", "column d_orders.id",
+    ]
+    assert "".join(c.text for c in chunks) == YAML
+
+
+def test_only_relevant_chunks_are_sent():
+    chunks = split_sql(SQL)
+    selected = select_chunks(chunks, "Add the latest order date to the orders CTE")
+    # The final select mentions orders too, and is where a new column surfaces
+    assert [c.name for c in selected] == ["cte orders", "final select"]
+
+    request = render_chunk_request(SQL, "models/d_customers.sql", chunks, selected)
+    assert "* cte orders (lines 7-12)" in request and "- cte customers (lines 3-5)" in request
+    assert "stg_customers" not in request
+
+    assert select_chunks(chunks, "Reformat everything") == []
+
+
+def test_yaml_selection_brings_last_column():
+    chunks = split_yaml(YAML)
+    selected = select_chunks(chunks, "Document a new email column on d_orders")
+    assert [c.name for c in selected] == ["model d_orders", "column d_orders.id"]
+
+
+def test_splice_edited_chunks():
+    chunks = split_sql(SQL)
+    reply = (
+        "<<<CHUNK cte orders>>>\n"
+        "orders as (\n    select customer_id, count(*) as n_orders, max(ordered_at) as last_order_at\n"
+        "    from {{ ref('stg_orders') }}\n    group by 1\n)\n"
+        "<<<END>>>\n"
+    )
+    edits = parse_chunk_reply(reply, [chunks[2]])
+    updated = splice_chunks(SQL, chunks, edits)
+    assert "last_order_at" in updated
+    assert updated.startswith(SQL[:chunks[2].start])
+    assert updated.endswith(SQL[chunks[2].end:])
+
+    with pytest.raises(ValueError):
+        parse_chunk_reply("<<<CHUNK cte customers>>>\nx\n<<<END>>>", [chunks[2]])
+    with pytest.raises(ValueError):
+        parse_chunk_reply("no chunks here", [chunks[2]])
+
+
+def test_request_size_does_not_follow_file_size():
+    ctes = ",\n".join(f"cte_{i} as (\n    select {i} as n, 'padding padding padding' as p from src_{i}\n)" for i in range(400))
+    sql = f"with {ctes}\nselect * from cte_399\n"
+    chunks = split_sql(sql)
+    assert len(chunks) == 402
+    selected = select_chunks(chunks, "Cast n to bigint in cte_17", budget=2000)
+    assert [c.name for c in selected] == ["cte cte_17"]
+    assert len(render_chunk_request(sql, "models/big.sql", chunks, selected)) < len(sql) / 2
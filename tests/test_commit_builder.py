@@ -0,0 +1,103 @@
+# tests/test_commit_builder.py
+from types import SimpleNamespace
+import pytest
+from ai_dbt_bot.commit_builder import CommitBuilder
+
+
+class FakeRequester:
+    def __init__(self, files):
+        self.files = files
+        self.queries = 0
+
+    def graphql_query(self, query, variables):
+        self.queries += 1
+        repository = {}
+        for key, expr in variables.items():
+            if key.startswith("e"):
+                path = expr.split(":", 1)[1]
+                text = self.files.get(path)
+                # A dict stands for the blob as GraphQL returns it, flags included
+                repository["f" + key[1:]] = text if text is None or isinstance(text, dict) else {"text": text}
+        return {}, {"data": {"repository": repository}}
+
+
+class FakeRef:
+    def __init__(self, repo):
+        self.repo = repo
+        self.object = SimpleNamespace(sha="base")
+
+    def edit(self, sha):
+        self.repo.calls.append(("edit_ref", sha))
+
+
+class FakeRepo:
+    full_name = "org/dbt"
+
+    def __init__(self, files, contents=None):
+        self._requester = FakeRequester(files)
+        # Full text served by the contents API
+        self.contents = contents or {}
+        self.calls = []
+
+    def get_contents(self, path, ref):
+        self.calls.append(("get_contents", path, ref))
+        text = self.contents[path]
+        return SimpleNamespace(encoding="base64", decoded_content=text.encode())
+
+    def get_git_ref(self, ref):
+        self.calls.append(("get_ref", ref))
+        return FakeRef(self)
+
+    def get_git_commit(self, sha):
+        self.calls.append(("get_commit", sha))
+        return SimpleNamespace(sha=sha, tree="base-tree")
+
+    def create_git_tree(self, elements, base_tree):
+        self.calls.append(("create_tree", [e._identity["path"] for e in elements]))
+        return "new-tree"
+
+    def create_git_commit(self, message, tree, parents):
+        self.calls.append(("create_commit", message))
+        return SimpleNamespace(sha="new-commit")
+
+
+def test_many_files_single_commit():
+    files = {f"models/m{i}.sql": f"select {i}" for i in range(6)}
+    repo = FakeRepo(files)
+    builder = CommitBuilder(repo, "api/abc")
+
+    originals = builder.read(list(files))
+    assert originals == files
+    assert repo._requester.queries == 1
+
+    for path, text in originals.items():
+        builder.stage(path, text + " as x")
+    builder.stage("models/m0.sql", files["models/m0.sql"])  # unchanged again
+
+    assert builder.commit("chore: update") == "new-commit"
+    assert [c[0] for c in repo.calls] == [
+        "get_ref", "get_commit", "create_tree", "create_commit", "edit_ref",
+    ]
+    assert repo.calls[2][1] == [f"models/m{i}.sql" for i in range(1, 6)]
+    assert builder.commit("chore: nothing") is None
+
+
+def test_missing_file_raises():
+    builder = CommitBuilder(FakeRepo({}), "api/abc")
+    with pytest.raises(FileNotFoundError):
+        builder.read(["models/missing.sql"])
+
+
+def test_truncated_blobs_are_read_in_full_and_binary_ones_refused():
+    full = "select\n" + "  col,\n" * 100000 + "  last\nfrom big"
+    files = {
+        "models/big.sql": {"text": full[:1000], "isTruncated": True, "isBinary": False},
+        "seeds/logo.png": {"text": None, "isTruncated": False, "isBinary": True},
+    }
+    repo = FakeRepo(files, contents={"models/big.sql": full})
+    builder = CommitBuilder(repo, "api/abc")
+
+    assert builder.read(["models/big.sql"]) == {"models/big.sql": full}
+    assert ("get_contents", "models/big.sql", "api/abc") in repo.calls
+    with pytest.raises(ValueError, match="binary"):
+        builder.read(["seeds/logo.png"])
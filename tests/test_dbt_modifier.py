@@ -1,6 +1,5 @@
 # tests/test_dbt_modifier.py
-from pathlib import Path
-from ai_dbt_bot.dbt_modifier import apply_patch
+from ai_dbt_bot.dbt_modifier import apply_patch, apply_patch_to_text
 
 def test_apply_simple_patch(tmp_path):
     repo = tmp_path / "repo"
@@ -18,3 +17,52 @@ def test_apply_simple_patch(tmp_path):
     success, _ = apply_patch(repo, patch)
     assert success
     assert "SELECT 2" in (repo / "file.sql").read_text()
+
+
+def test_apply_patch_to_text_rewrites_headers():
+    original = "select\n  id,\n  name\nfrom\n  customers\n"
+    diff = (
+        "```diff\n"
+        "--- d_customers.sql\n"
+        "+++ d_customers.sql\n"
+        "@@ -1,5 +1,6 @@\n"
+        " select\n"
+        "   id,\n"
+        "-  name\n"
+        "+  name,\n"
+        "+  dob\n"
+        " from\n"
+        "   customers\n"
+        "```\n"
+    )
+    ok, updated = apply_patch_to_text(original, diff, "models/d_customers.sql")
+    assert ok
+    assert updated == "select\n  id,\n  name,\n  dob\nfrom\n  customers\n"
+
+
+def test_apply_patch_to_text_reports_failure():
+    ok, _ = apply_patch_to_text("select 1\n", "here is the whole file instead", "models/a.sql")
+    assert not ok
+    ok, _ = apply_patch_to_text("select 1\n", "@@ -1 +1 @@\n-select 2\n+select 3\n", "models/a.sql")
+    assert not ok
+
+
+def test_sql_comments_inside_hunks_are_not_headers():
+    original = "-- old note\nselect 1\n"
+    diff = (
+        "--- d_customers.sql\n"
+        "+++ d_customers.sql\n"
+        "@@ -1,2 +1,2 @@\n"
+        "--- old note\n"
+        "+++ new note\n"
+        " select 1\n"
+    )
+    ok, updated = apply_patch_to_text(original, diff, "models/d_customers.sql")
+    assert ok, updated
+    # The pair inside the body is a removed and an added line, not headers to rewrite
+    assert updated == "++ new note\nselect 1\n"
+
+
+def test_apply_patch_to_text_fails_without_changes():
+    ok, message = apply_patch_to_text("select 1\n", "@@ -1 +1 @@\n select 1\n", "models/a.sql")
+    assert not ok and "changed nothing" in message
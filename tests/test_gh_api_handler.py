@@ -0,0 +1,249 @@
+# tests/test_gh_api_handler.py
+import time
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from ai_dbt_bot import gh_api_handler, main
+from ai_dbt_bot.llm_cache import ResponseCache
+from ai_dbt_bot.manifest_index import ManifestIndex
+from ai_dbt_bot.repo_index import RepoTreeIndex
+from ai_dbt_bot.session_store import SQLiteSessionStore
+
+FILES = {
+    "models/d_customers.sql": "select id from customers",
+    "models/d_orders.sql": "select id from orders",
+    "models/schema.yml": "version: 2",
+}
+
+
+class FakeRef:
+    def __init__(self, repo, name):
+        self.repo, self.name = repo, name
+        self.object = SimpleNamespace(sha="head")
+
+    def edit(self, sha):
+        self.repo.calls.append(("edit_ref", self.name, sha))
+
+    def delete(self):
+        self.repo.calls.append(("delete_ref", self.name))
+        self.repo.branches.discard(self.name)
+
+
+class FakeRequester:
+    def __init__(self, files):
+        self.files = files
+
+    def graphql_query(self, query, variables):
+        repository = {}
+        for key, expr in variables.items():
+            if key.startswith("e"):
+                text = self.files.get(expr.split(":", 1)[1])
+                repository["f" + key[1:]] = None if text is None else {"text": text}
+        return {}, {"data": {"repository": repository}}
+
+
+class FakeRepo:
+    full_name = "org/dbt"
+    default_branch = "main"
+
+    def __init__(self, files):
+        self._requester = FakeRequester(files)
+        self.files = files
+        self.calls = []
+        self.branches = set()
+        self.pulls = 0
+        # Committed content per path, from every tree created
+        self.committed = {}
+
+    def get_git_ref(self, ref):
+        return FakeRef(self, ref[len("heads/"):])
+
+    def create_git_ref(self, ref, sha):
+        self.calls.append(("create_ref", ref))
+        self.branches.add(ref[len("refs/heads/"):])
+
+    def get_git_tree(self, sha, recursive):
+        tree = [SimpleNamespace(path=path, type="blob") for path in self.files]
+        return SimpleNamespace(sha="tree", tree=tree)
+
+    def get_git_commit(self, sha):
+        return SimpleNamespace(sha=sha, tree="base-tree")
+
+    def create_git_tree(self, elements, base_tree):
+        self.calls.append(("create_tree", sorted(e._identity["path"] for e in elements)))
+        self.committed.update({e._identity["path"]: e._identity["content"] for e in elements})
+        return "new-tree"
+
+    def create_git_commit(self, message, tree, parents):
+        self.calls.append(("create_commit", message))
+        return SimpleNamespace(sha="new-commit")
+
+    def create_pull(self, **kwargs):
+        self.pulls += 1
+        self.calls.append(("create_pull", kwargs["head"]))
+        return SimpleNamespace(number=self.pulls, html_url=f"https://github.com/org/dbt/pull/{self.pulls}")
+
+    def get_pull(self, number):
+        raise AssertionError("follow-ups should not re-read the PR")
+
+
+class FakeLLM:
+    """Stands in for the chat completion API; every file gets '-- edited' appended.
+
+    Set ``reply`` to answer with something else, e.g. a diff.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.suffix = "\n-- edited"
+        self.reply = None
+
+    def __call__(self, model, messages, stream=False, **kwargs):
+        system, content = messages[0]["content"], messages[1]["content"]
+        self.requests.append((system, content))
+        reply = self.reply or content + self.suffix
+        if stream:
+            parts = [reply[:len(reply) // 2], reply[len(reply) // 2:]]
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta={"content": part})]) for part in parts])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+@pytest.fixture
+def bot(monkeypatch, tmp_path):
+    repo, llm = FakeRepo(dict(FILES)), FakeLLM()
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(gh_api_handler, "get_repo", lambda: repo)
+    monkeypatch.setattr(gh_api_handler, "get_session_store", lambda: store)
+    monkeypatch.setattr(gh_api_handler, "get_tree_index", lambda: RepoTreeIndex(repo, "main"))
+    monkeypatch.setattr(gh_api_handler, "get_response_cache", lambda: ResponseCache(path=None))
+    monkeypatch.setattr(gh_api_handler, "manifest_index", ManifestIndex(str(tmp_path / "manifest.json")))
+    monkeypatch.setattr(gh_api_handler, "safe_chat_completion", llm)
+    monkeypatch.setattr(gh_api_handler, "run_sqlfluff_fix", lambda sql, filename: sql)
+    monkeypatch.setattr(gh_api_handler, "load_system_message", lambda: "system")
+    monkeypatch.setattr(gh_api_handler, "GENERATION_MODE", "full")
+    return SimpleNamespace(repo=repo, llm=llm, store=store)
+
+
+def test_follow_up_uses_stored_pr_url(bot):
+    first = gh_api_handler.create_or_update_pr("s1", "add dob", ["d_customers.sql"])
+    assert first == "Draft PR created: https://github.com/org/dbt/pull/1 (session_id=s1)"
+    assert bot.store.get("s1")["pr_url"] == "https://github.com/org/dbt/pull/1"
+
+    # FakeRepo.get_pull fails the test if the follow-up reads the PR again
+    second = gh_api_handler.create_or_update_pr("s1", "add email", ["d_customers.sql"])
+    assert second == "Draft PR updated: https://github.com/org/dbt/pull/1 (session_id=s1)"
+    assert bot.repo.pulls == 1
+
+
+def calls(repo, name):
+    return [call for call in repo.calls if call[0] == name]
+
+
+def test_merge_prompts_and_resolve_targets():
+    assert gh_api_handler.merge_prompts([" add dob "]) == "add dob"
+    assert gh_api_handler.merge_prompts(["add dob", "add email", "add dob", ""]) == (
+        "Apply all of the following changes:\n1. add dob\n2. add email"
+    )
+
+
+def test_resolve_targets_dedups_paths(bot):
+    targets = gh_api_handler.resolve_targets(["d_customers.sql", "models/d_customers.sql", "schema.yml"])
+    assert targets == [("models/d_customers.sql", ".sql"), ("models/schema.yml", ".yml")]
+
+
+def test_commit_updates_writes_one_commit(bot):
+    stages, tokens = [], []
+    sha = gh_api_handler.commit_updates(
+        "api/abc", [("models/d_customers.sql", ".sql", "add dob"), ("models/d_orders.sql", ".sql", "add total")],
+        stages.append, on_token=lambda path, text: tokens.append(path),
+    )
+    assert sha == "new-commit"
+    assert stages == ["read", "generate", "commit"]
+    assert calls(bot.repo, "create_tree") == [("create_tree", ["models/d_customers.sql", "models/d_orders.sql"])]
+    assert sorted(set(tokens)) == ["models/d_customers.sql", "models/d_orders.sql"]
+
+
+def test_batch_generates_each_file_once(bot):
+    requests = [
+        {"analyst_prompt": "add dob", "file_names": ["d_customers.sql"]},
+        {"analyst_prompt": "add email", "file_names": ["d_customers.sql"]},
+        {"analyst_prompt": "add total", "file_names": ["d_orders.sql", "models/d_orders.sql"]},
+        {"analyst_prompt": "add dob", "file_names": ["d_customers.sql"]},
+    ]
+    result = gh_api_handler.create_batch_pr("b1", requests)
+
+    assert result == "Draft PR created: https://github.com/org/dbt/pull/1 (session_id=b1)"
+    assert len(bot.llm.requests) == 2
+    customers = next(system for system, content in bot.llm.requests if "customers" in content)
+    assert "1. add dob\n2. add email" in customers
+    assert len(calls(bot.repo, "create_ref")) == 1
+    assert len(calls(bot.repo, "create_commit")) == 1
+    assert bot.repo.pulls == 1
+
+    # A follow-up batch commits to the same branch and PR
+    followup = gh_api_handler.create_batch_pr("b1", [{"analyst_prompt": "add phone", "file_names": ["d_orders.sql"]}])
+    assert followup == "Draft PR updated: https://github.com/org/dbt/pull/1 (session_id=b1)"
+    assert len(calls(bot.repo, "create_ref")) == 1 and bot.repo.pulls == 1
+    assert len(calls(bot.repo, "create_commit")) == 2
+
+
+def test_failed_requests_leave_no_branch(bot):
+    with pytest.raises(FileNotFoundError):
+        gh_api_handler.create_or_update_pr("s1", "add dob", ["missing.sql"])
+    with pytest.raises(FileNotFoundError):
+        gh_api_handler.create_batch_pr("s1", [{"analyst_prompt": "add dob", "file_names": ["missing.sql"]}])
+    assert calls(bot.repo, "create_ref") == []
+
+    bot.llm.suffix = ""
+    with pytest.raises(ValueError, match="no changes"):
+        gh_api_handler.create_or_update_pr("s1", "add dob", ["d_customers.sql"])
+    assert len(calls(bot.repo, "create_ref")) == 1 and bot.repo.branches == set()
+    assert bot.store.get("s1") is None
+
+
+def test_batch_endpoint_runs_the_job(bot, monkeypatch):
+    monkeypatch.setattr(main, "STARTUP_WARMUP", "off")
+    with TestClient(main.app) as client:
+        queued = client.post("/requests/batch", json={"session_id": "b2", "items": [
+            {"analyst_prompt": "add dob", "file_names": ["d_customers.sql"]},
+            {"analyst_prompt": "add total", "file_names": ["d_orders.sql"]},
+        ]}).json()
+        deadline = time.time() + 5
+        while (job := client.get(queued["status_url"]).json())["status"] not in ("succeeded", "failed"):
+            assert time.time() < deadline
+            time.sleep(0.01)
+    assert queued["session_id"] == "b2"
+    assert job["status"] == "succeeded", job
+    assert job["pr_url"] == "https://github.com/org/dbt/pull/1"
+    assert len(bot.llm.requests) == 2
+
+
+def test_streamed_diff_is_discarded_before_the_rewrite(bot, monkeypatch):
+    monkeypatch.setattr(gh_api_handler, "GENERATION_MODE", "diff")
+    tokens = []
+    # The fake LLM answers with the file instead of a diff, so the patch does not apply
+    gh_api_handler.commit_updates(
+        "api/abc", [("models/d_customers.sql", ".sql", "add dob")], lambda stage: None,
+        on_token=lambda path, text: tokens.append(text),
+    )
+    assert len(bot.llm.requests) == 2
+    reset = tokens.index(None)
+    assert reset > 0 and None not in tokens[reset + 1:]
+    assert "".join(tokens[reset + 1:]) == "select id from customers\n-- edited"
+
+
+def test_diff_mode_commits_the_patched_file(bot, monkeypatch):
+    monkeypatch.setattr(gh_api_handler, "GENERATION_MODE", "diff")
+    bot.llm.reply = (
+        "```diff\n--- a/models/d_customers.sql\n+++ b/models/d_customers.sql\n"
+        "@@ -1 +1 @@\n-select id from customers\n+select id, dob from customers\n```"
+    )
+    tokens = []
+    gh_api_handler.commit_updates(
+        "api/abc", [("models/d_customers.sql", ".sql", "add dob")], lambda stage: None,
+        on_token=lambda path, text: tokens.append(text),
+    )
+    assert len(bot.llm.requests) == 1
+    assert "unified diff" in bot.llm.requests[0][0]
+    assert None not in tokens
+    assert bot.repo.committed == {"models/d_customers.sql": "select id, dob from customers"}
@@ -0,0 +1,75 @@
+# tests/test_github_client.py
+import threading
+import time
+import pytest
+from ai_dbt_bot.github_client import GitHubGateway, RateLimitExhausted, priority, HIGH, LOW
+
+
+def rate_headers(remaining, limit=5000, reset_in=3600, resource="core"):
+    return {
+        "x-ratelimit-limit": str(limit),
+        "x-ratelimit-remaining": str(remaining),
+        "x-ratelimit-reset": str(int(time.time() + reset_in)),
+        "x-ratelimit-resource": resource,
+    }
+
+
+def test_identical_reads_share_one_call():
+    gateway = GitHubGateway()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def send(verb, url, parameters, headers, input, *args):
+        calls.append(url)
+        started.set()
+        release.wait(5)
+        return 200, rate_headers(4000), '{"sha": "t1"}'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(gateway.request(send, "GET", "/repos/a/b/git/trees/t1")))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(gateway.request(send, "GET", "/repos/a/b/git/trees/t1")))
+    follower.start()
+    while gateway.stats["coalesced"] == 0:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert calls == ["/repos/a/b/git/trees/t1"]
+    assert results[0] == results[1]
+    assert gateway.metrics()["budget"]["core"]["remaining"] == 4000
+
+
+def test_writes_and_mutations_are_not_coalesced():
+    gateway = GitHubGateway()
+    calls = []
+
+    def send(verb, url, parameters, headers, input, *args):
+        calls.append(verb)
+        return 200, {}, "{}"
+
+    gateway.request(send, "PATCH", "/repos/a/b/pulls/1", input={"title": "x"})
+    gateway.request(send, "POST", "/graphql", input={"query": "mutation { x }"})
+    gateway.request(send, "PATCH", "/repos/a/b/pulls/1", input={"title": "x"})
+    assert calls == ["PATCH", "POST", "PATCH"]
+    assert gateway.stats["coalesced"] == 0
+
+
+def test_reserve_is_kept_for_high_priority():
+    gateway = GitHubGateway(reserve_fraction=0.05, max_throttle=1)
+
+    def send(verb, url, parameters, headers, input, *args):
+        return 200, rate_headers(100), "{}"
+
+    gateway.request(send, "GET", "/rate")
+    assert gateway.metrics()["budget"]["core"]["remaining"] == 100
+
+    # 100 left of 5000 is inside the 250 reserve: only HIGH work may spend it
+    with priority(LOW), pytest.raises(RateLimitExhausted):
+        gateway.request(send, "GET", "/repos/a/b")
+    assert gateway.metrics()["queue_depth"] == 0
+
+    with priority(HIGH):
+        assert gateway.request(send, "PATCH", "/repos/a/b/pulls/1")[0] == 200
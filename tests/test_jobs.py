@@ -0,0 +1,106 @@
+# tests/test_jobs.py
+import threading
+import time
+import pytest
+from ai_dbt_bot.jobs import JobQueue, WorkerLock
+
+
+def test_job_records_stages_and_pr_url(wait_for):
+    queue = JobQueue(max_workers=2)
+
+    def pipeline(progress, session_id, prompt):
+        progress("generate")
+        progress("commit")
+        return f"Draft PR created: https://github.com/org/repo/pull/7 (session_id={session_id})"
+
+    job = wait_for(queue.submit(pipeline, key="s1", session_id="s1", prompt="add col"))
+    assert job.status == "succeeded"
+    assert job.pr_url == "https://github.com/org/repo/pull/7"
+    assert [s["name"] for s in job.to_dict()["stages"]] == ["generate", "commit"]
+    assert all(s["finished_at"] is not None for s in job.stages)
+    assert queue.get(job.id) is job
+
+
+def test_failed_job_keeps_error(wait_for):
+    queue = JobQueue(max_workers=1)
+
+    def pipeline(progress):
+        raise FileNotFoundError("File 'x.sql' not found")
+
+    job = wait_for(queue.submit(pipeline))
+    assert job.status == "failed"
+    assert "x.sql" in job.error
+
+
+def test_same_session_runs_in_order(wait_for):
+    queue = JobQueue(max_workers=4)
+    release = threading.Event()
+    order = []
+
+    def pipeline(progress, n):
+        if n == 0:
+            release.wait(1)
+        order.append(n)
+        return ""
+
+    first = queue.submit(pipeline, key="s1", n=0)
+    second = queue.submit(pipeline, key="s1", n=1)
+    other = wait_for(queue.submit(pipeline, key="s2", n=2))
+    assert other.status == "succeeded" and second.status == "queued"
+    release.set()
+    wait_for(first), wait_for(second)
+    assert order == [2, 0, 1]
+
+
+def test_cancel_stops_at_next_stage_and_notifies_listeners(wait_for):
+    queue = JobQueue(max_workers=1)
+    started = threading.Event()
+    events = []
+
+    def pipeline(progress):
+        progress("generate")
+        started.set()
+        time.sleep(0.05)
+        progress("commit")
+        return "never"
+
+    job = queue.submit(pipeline, listener=lambda event, data: events.append(event))
+    started.wait(1)
+    job.cancel()
+    wait_for(job)
+    assert job.status == "cancelled"
+    assert events == ["stage", "error"]
+
+
+def test_failing_listener_does_not_fail_the_job(wait_for):
+    queue = JobQueue(max_workers=1)
+
+    def listener(event, data):
+        raise RuntimeError("stream closed")
+
+    def pipeline(progress):
+        progress("generate")
+        return "done"
+
+    job_id = queue.new_id()
+    job = wait_for(queue.submit(pipeline, listener=listener, job_id=job_id))
+    assert job.id == job_id
+    assert job.status == "succeeded" and job.result == "done"
+
+
+def test_worker_lock_admits_one_process_at_a_time(tmp_path):
+    first, second = WorkerLock(str(tmp_path / "jobs.lock")), WorkerLock(str(tmp_path / "jobs.lock"))
+    first.acquire()
+    with pytest.raises(RuntimeError, match="single worker"):
+        second.acquire()
+    first.release()
+    second.acquire()
+    second.release()
+
+
+def test_queue_restarts_after_shutdown(wait_for):
+    queue = JobQueue(max_workers=1)
+    assert wait_for(queue.submit(lambda progress: "first")).status == "succeeded"
+    queue.shutdown()
+    # An app that starts again (or the next test client) reuses the module-level queue
+    assert wait_for(queue.submit(lambda progress: "second")).result == "second"
@@ -0,0 +1,49 @@
+# tests/test_llm_cache.py
+import time
+from ai_dbt_bot.llm_cache import ResponseCache
+
+
+def test_key_depends_on_every_input():
+    base = ResponseCache.key("gpt-4o-mini", "system", "add col", "select 1")
+    assert base == ResponseCache.key("gpt-4o-mini", "system", "add col", "select 1")
+    assert base != ResponseCache.key("gpt-4o", "system", "add col", "select 1")
+    assert base != ResponseCache.key("gpt-4o-mini", "system v2", "add col", "select 1")
+    assert base != ResponseCache.key("gpt-4o-mini", "system", "drop col", "select 1")
+    assert base != ResponseCache.key("gpt-4o-mini", "system", "add col", "select 2")
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    path = str(tmp_path / "cache.db")
+    calls = []
+    cache = ResponseCache(path=path)
+    create = lambda: calls.append(1) or "updated"
+
+    assert cache.get_or_create("k", create) == "updated"
+    assert cache.get_or_create("k", create) == "updated"
+    assert len(calls) == 1
+    assert cache.stats["memory_hits"] == 1 and cache.stats["misses"] == 1
+
+    # A fresh process only has the disk tier
+    restarted = ResponseCache(path=path)
+    assert restarted.get("k") == "updated"
+    assert restarted.stats["disk_hits"] == 1
+    assert restarted.get("k") == "updated"
+    assert restarted.stats["memory_hits"] == 1
+    assert restarted.hit_rate() == 1.0
+
+
+def test_ttl_and_size_eviction(tmp_path):
+    cache = ResponseCache(path=None, ttl=0.05, max_entries=2)
+    cache.put("a", "1")
+    time.sleep(0.1)
+    assert cache.get("a") is None
+
+    cache = ResponseCache(path=None, max_entries=2)
+    for k in "abc":
+        cache.put(k, k)
+    assert cache.get("a") is None and cache.get("c") == "c"
+
+    disk = ResponseCache(path=str(tmp_path / "small.db"), max_entries=0, max_bytes=10)
+    disk.put("a", "x" * 6)
+    disk.put("b", "y" * 6)
+    assert disk.get("a") is None and disk.get("b") == "y" * 6
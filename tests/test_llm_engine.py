@@ -1,9 +1,29 @@
 # tests/test_llm_engine.py
 import re
+import threading
+import time
 from ai_dbt_bot.llm_engine import generate_dbt_patch
+from ai_dbt_bot.llm_engine import map_bounded
 
 def test_patch_format():
     # For simplicity, we simulate by monkeypatching openai.ChatCompletion
     patch = generate_dbt_patch("Add foo")
     assert "diff --git" in patch
     assert re.search(r"\+.*foo", patch)
+
+def test_map_bounded_keeps_order_and_limit():
+    lock = threading.Lock()
+    running = peak = 0
+
+    def work(i):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02 * (5 - i))
+        with lock:
+            running -= 1
+        return i * 10
+
+    assert map_bounded(work, range(5), max_workers=2) == [0, 10, 20, 30, 40]
+    assert peak == 2
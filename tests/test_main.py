@@ -0,0 +1,33 @@
+# tests/test_main.py
+from fastapi.testclient import TestClient
+from ai_dbt_bot import gh_api_handler, main
+from ai_dbt_bot.webhooks import sign
+
+
+def test_import_and_startup_stay_offline(monkeypatch):
+    monkeypatch.setattr(main, "STARTUP_WARMUP", "off")
+    with TestClient(main.app) as client:
+        body = client.get("/ready").json()
+        assert body["ready"] and body["warm_up"]["mode"] == "off"
+        # Validation happens before anything touches GitHub
+        assert client.post("/requests/batch", json={"items": []}).status_code == 422
+        metrics = client.get("/metrics").text
+        assert "# TYPE ai_dbt_bot_stage_seconds histogram" in metrics
+        assert "ai_dbt_bot_github_queue_depth 0" in metrics
+    assert not gh_api_handler.get_repo.built()
+    assert not gh_api_handler.get_session_store.built()
+
+
+def test_webhook_signature_is_checked(monkeypatch):
+    monkeypatch.setattr(main, "STARTUP_WARMUP", "off")
+    monkeypatch.setattr(main, "GITHUB_WEBHOOK_SECRET", "s3cret")
+    body = b'{"zen": "Design for failure."}'
+    with TestClient(main.app) as client:
+        bad = client.post("/webhooks/github", content=body, headers={
+            "X-GitHub-Event": "ping", "X-Hub-Signature-256": sign("other", body),
+        })
+        good = client.post("/webhooks/github", content=body, headers={
+            "X-GitHub-Event": "ping", "X-Hub-Signature-256": sign("s3cret", body),
+        })
+    assert bad.status_code == 401
+    assert good.json() == {"event": "ping"}
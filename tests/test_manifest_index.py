@@ -0,0 +1,67 @@
+# tests/test_manifest_index.py
+import json
+import os
+from ai_dbt_bot.manifest_index import ManifestIndex
+
+
+def model(name, sql, yml=None, checksum="c1"):
+    return {
+        "resource_type": "model",
+        "name": name,
+        "original_file_path": sql,
+        "patch_path": f"bica://{yml}" if yml else None,
+        "checksum": {"name": "sha256", "checksum": checksum},
+    }
+
+
+def write_manifest(path, nodes, child_map):
+    path.write_text(json.dumps({"nodes": nodes, "child_map": child_map}))
+    # make sure the change is visible even on coarse mtime filesystems
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_lookup_returns_sql_yml_and_downstream(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    write_manifest(
+        manifest,
+        {
+            "model.bica.d_customers": model("d_customers", "models/d_customers.sql", "models/d_customers.yml"),
+            "model.bica.f_orders": model("f_orders", "models/marts/f_orders.sql"),
+            "test.bica.not_null": {"resource_type": "test", "name": "not_null"},
+        },
+        {"model.bica.d_customers": ["model.bica.f_orders", "test.bica.not_null"]},
+    )
+    index = ManifestIndex(str(manifest))
+    entry = index.get("d_customers.sql")
+    assert entry.paths == ["models/d_customers.sql", "models/d_customers.yml"]
+    assert entry.downstream == ["f_orders"]
+    assert index.get("D_CUSTOMERS") is entry
+    assert index.get("unknown.sql") is None
+    assert len(index) == 2
+
+
+def test_refresh_only_rebuilds_changed_models(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    nodes = {
+        "model.bica.a": model("a", "models/a.sql", "models/a.yml"),
+        "model.bica.b": model("b", "models/b.sql"),
+    }
+    write_manifest(manifest, nodes, {})
+    index = ManifestIndex(str(manifest))
+    a = index.get("a")
+    assert index.stats == {"loads": 1, "updated": 2, "removed": 0}
+    assert index.refresh() is False
+
+    nodes["model.bica.b"] = model("b", "models/b.sql", checksum="c2")
+    del nodes["model.bica.a"]
+    nodes["model.bica.c"] = model("c", "models/c.sql")
+    write_manifest(manifest, nodes, {})
+    assert index.refresh() is True
+    assert index.stats == {"loads": 2, "updated": 4, "removed": 1}
+    assert index.get("a") is None and a.name == "a"
+
+
+def test_missing_manifest_is_empty(tmp_path):
+    index = ManifestIndex(str(tmp_path / "missing.json"))
+    assert index.get("d_customers") is None
@@ -0,0 +1,55 @@
+# tests/test_metrics.py
+import pytest
+from ai_dbt_bot.jobs import JobQueue
+from ai_dbt_bot.llm_engine import map_bounded
+from ai_dbt_bot.metrics import Registry, span, trace_context, traceparent, STAGE_SECONDS, STAGE_ERRORS
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.histogram("stage_seconds", "Stage time.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        hist.observe(value, stage='say "hi"')
+    registry.gauge("queue", "Queue depth.", lambda: 7)
+
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="say \\"hi\\"",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="say \\"hi\\"",le="1"} 3' in lines
+    assert 'stage_seconds_bucket{stage="say \\"hi\\"",le="+Inf"} 4' in lines
+    assert 'stage_seconds_count{stage="say \\"hi\\""} 4' in lines
+    assert "# TYPE queue gauge" in lines and "queue 7" in lines
+
+
+def _count(stage):
+    return dict(STAGE_SECONDS._series).get((stage,), [None, 0.0, 0])[2]
+
+
+def test_spans_nest_and_count_errors():
+    before = _count("test_outer"), dict(STAGE_ERRORS._values).get(("test_inner",), 0)
+    with trace_context("00-" + "a" * 32 + "-" + "b" * 16 + "-01") as trace_id:
+        assert trace_id == "a" * 32
+        with span("test_outer"):
+            outer = traceparent()
+            with pytest.raises(RuntimeError), span("test_inner"):
+                assert traceparent() != outer
+                raise RuntimeError("boom")
+            assert traceparent() == outer
+    assert outer.startswith("00-" + "a" * 32)
+    assert _count("test_outer") == before[0] + 1
+    assert STAGE_ERRORS._values[("test_inner",)] == before[1] + 1
+    assert traceparent() is None
+
+    # A malformed header starts a fresh trace instead of failing the request
+    with trace_context("not-a-trace") as trace_id:
+        assert len(trace_id) == 32 and trace_id != "a" * 32
+
+
+def test_trace_follows_work_to_other_threads(wait_for):
+    queue = JobQueue(max_workers=2)
+    with trace_context(None) as trace_id:
+        job = queue.submit(lambda progress: traceparent(), key="s1")
+        blocked = queue.submit(lambda progress: traceparent(), key="s1")
+        seen = map_bounded(lambda item: traceparent(), range(3), max_workers=3)
+    results = [wait_for(job).result, wait_for(blocked).result, *seen]
+    queue.shutdown()
+    assert all(trace_id in result for result in results)
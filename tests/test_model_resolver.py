@@ -0,0 +1,36 @@
+# tests/test_model_resolver.py
+import time
+from ai_dbt_bot.model_resolver import ModelResolver
+
+PATHS = [
+    "models/d_customers.sql",
+    "models/marts/f_orders.sql",
+    "models/staging/f_orders.sql",
+    "models/staging/stg_customers.sql",
+]
+
+
+def test_exact_and_suffix_matches():
+    resolver = ModelResolver(PATHS)
+    assert resolver.resolve("D_Customers.sql") == ["models/d_customers.sql"]
+    assert resolver.resolve("marts/f_orders.sql") == ["models/marts/f_orders.sql"]
+    assert sorted(resolver.resolve("f_orders.sql")) == ["models/marts/f_orders.sql", "models/staging/f_orders.sql"]
+    # wrong directory still finds the file by name
+    assert resolver.resolve("models/dims/d_customers.sql") == ["models/d_customers.sql"]
+
+
+def test_fuzzy_matches_are_ranked():
+    resolver = ModelResolver(PATHS)
+    assert resolver.resolve("d_customer.sql", limit=1) == ["models/d_customers.sql"]
+    assert resolver.resolve("customers.sql")[0] == "models/d_customers.sql"
+    assert resolver.resolve("zzzz.sql") == []
+
+
+def test_fuzzy_lookup_is_fast_on_large_pools():
+    paths = [f"models/area_{i % 40}/model_{i}_{i * 7919 % 1000}.sql" for i in range(10_000)]
+    paths.append("models/marts/d_customers.sql")
+    resolver = ModelResolver(paths)
+    start = time.perf_counter()
+    for _ in range(100):
+        assert resolver.resolve("d_customer.sql", limit=1) == ["models/marts/d_customers.sql"]
+    assert (time.perf_counter() - start) / 100 < 0.01
@@ -0,0 +1,98 @@
+# tests/test_patch_engine.py
+from ai_dbt_bot import dbt_modifier
+from ai_dbt_bot.patch_engine import apply_patches, apply_to_tree, parse_patch
+
+SQL = "select\n  id,\n  name\nfrom customers\n"
+
+
+def test_hunks_apply_with_offset_and_fuzz():
+    original = "-- header\n-- more header\n" + SQL + "\nunion all\n\nselect 2\n"
+    diff = (
+        "--- a/models/c.sql\n+++ b/models/c.sql\n"
+        "@@ -1,4 +1,5 @@\n"
+        " select\n   id,\n-  name\n+  name,\n+  dob\n from customers\n"
+        "@@ -8,3 +9,3 @@\n"
+        " union all\n"
+        "-select 2\n+select 3\n"
+        " -- this context line is not in the file\n"
+    )
+    result = apply_patches({"models/c.sql": original}, parse_patch(diff))
+    assert result.ok, result.summary()
+    assert result.files["models/c.sql"] == original.replace("  name\n", "  name,\n  dob\n").replace("select 2", "select 3")
+    first, second = result.applied
+    assert (first.offset, first.fuzz) == (2, 0)
+    assert second.fuzz == 1
+
+
+def test_rejected_hunk_leaves_the_tree_alone(tmp_path):
+    (tmp_path / "a.sql").write_text("select 1\n")
+    (tmp_path / "b.sql").write_text("select 2\n")
+    diff = (
+        "--- a/a.sql\n+++ b/a.sql\n@@ -1 +1 @@\n-select 1\n+select 10\n"
+        "--- a/b.sql\n+++ b/b.sql\n@@ -1 +1 @@\n-select 99\n+select 20\n"
+    )
+    ok, message = dbt_modifier.apply_patch(tmp_path, diff)
+    assert not ok
+    assert "b.sql: hunk #1" in message and "a.sql" not in message
+    assert (tmp_path / "a.sql").read_text() == "select 1\n"
+    # The debug dump is opt-in
+    assert not (tmp_path / "last_diff.patch").exists()
+
+
+def test_new_deleted_and_unterminated_files(tmp_path):
+    (tmp_path / "old.sql").write_text("select 1\n")
+    (tmp_path / "keep.sql").write_text("select 1\n-- note")
+    diff = (
+        "--- /dev/null\n+++ b/models/new.sql\n@@ -0,0 +1,2 @@\n+select\n+  1\n"
+        "--- a/old.sql\n+++ /dev/null\n@@ -1 +0,0 @@\n-select 1\n"
+        "--- a/keep.sql\n+++ b/keep.sql\n@@ -1,2 +1,2 @@\n select 1\n--- note\n\\ No newline at end of file\n+-- changed\n"
+    )
+    result = apply_to_tree(tmp_path, diff)
+    assert result.ok, result.summary()
+    assert (tmp_path / "models/new.sql").read_text() == "select\n  1\n"
+    assert not (tmp_path / "old.sql").exists()
+    assert (tmp_path / "keep.sql").read_text() == "select 1\n-- changed\n"
+
+
+def test_many_files_in_one_pass():
+    sources = {f"models/m_{i}.sql": SQL for i in range(60)}
+    diff = "".join(
+        f"--- a/{path}\n+++ b/{path}\n@@ -3,2 +3,3 @@\n   name\n+  , loaded_at\n from customers\n"
+        for path in sources
+    )
+    result = apply_patches(sources, parse_patch(diff))
+    assert result.ok and len(result.applied) == 60
+    assert all("loaded_at" in text for text in result.files.values())
+    assert sources["models/m_0.sql"] == SQL
+
+
+def test_paths_outside_the_tree_are_refused(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (tmp_path / "secret.sql").write_text("select 1\n")
+    (repo / "link.sql").symlink_to(tmp_path / "secret.sql")
+    for diff in (
+        "--- /dev/null\n+++ b/../escaped.sql\n@@ -0,0 +1 @@\n+select 1\n",
+        "--- /dev/null\n+++ /tmp/escaped.sql\n@@ -0,0 +1 @@\n+select 1\n",
+        "--- a/../secret.sql\n+++ b/stolen.sql\n@@ -1 +1 @@\n select 1\n",
+        "--- a/link.sql\n+++ b/link.sql\n@@ -1 +1 @@\n-select 1\n+select 2\n",
+    ):
+        ok, message = dbt_modifier.apply_patch(repo, diff)
+        assert not ok, diff
+    assert not (tmp_path / "escaped.sql").exists()
+    assert not (repo / "stolen.sql").exists()
+    assert (tmp_path / "secret.sql").read_text() == "select 1\n"
+
+
+def test_hunk_counts_delimit_comment_lines():
+    diff = (
+        "--- a/models/a.sql\n+++ b/models/a.sql\n"
+        "@@ -1,2 +1,2 @@\n--- old\n+++ new\n select 1\n"
+        "--- a/models/b.sql\n+++ b/models/b.sql\n"
+        "@@ -1 +1 @@\n-select 2\n+select 3\n"
+    )
+    a, b = parse_patch(diff)
+    assert (a.path, b.path) == ("models/a.sql", "models/b.sql")
+    assert a.hunks[0].lines == [("-", "-- old"), ("+", "++ new"), (" ", "select 1")]
+    result = apply_patches({"models/a.sql": "-- old\nselect 1\n", "models/b.sql": "select 2\n"}, [a, b])
+    assert result.files == {"models/a.sql": "++ new\nselect 1\n", "models/b.sql": "select 3\n"}
@@ -0,0 +1,67 @@
+# tests/test_preview_cache.py
+import json
+import pytest
+from github import GithubException
+from types import SimpleNamespace
+from ai_dbt_bot.preview_cache import PreviewCache
+
+REPO_URL = "https://api.github.com/repos/acme/dbt"
+
+
+class FakeRequester:
+    def __init__(self):
+        self.head = "h1"
+        self.pull_etag = '"p1"'
+        self.calls = []
+
+    def requestJson(self, verb, url, parameters=None, headers=None):
+        self.calls.append(url)
+        if url.endswith("/pulls/7"):
+            if headers and headers.get("If-None-Match") == self.pull_etag:
+                return 304, {}, ""
+            pull = {"head": {"sha": self.head}, "base": {"sha": "b1"}}
+            return 200, {"etag": self.pull_etag}, json.dumps(pull)
+        if url.endswith("/pulls/7/files"):
+            page = [{"filename": "models/a.sql", "status": "modified", "additions": 1, "deletions": 0, "patch": "+x"}]
+            return 200, {"link": f'<{REPO_URL}/pulls/7/files?page=2>; rel="next"'}, json.dumps(page)
+        if url.endswith("files?page=2"):
+            page = [{"filename": "models/a.yml", "status": "added", "additions": 3, "deletions": 0}]
+            return 200, {}, json.dumps(page)
+        return 404, {}, json.dumps({"message": "Not Found"})
+
+
+def make_cache():
+    requester = FakeRequester()
+    return PreviewCache(SimpleNamespace(url=REPO_URL, _requester=requester)), requester
+
+
+def test_unchanged_pr_is_served_from_cache():
+    cache, requester = make_cache()
+    etag, payload = cache.get(7)
+    assert [f["filename"] for f in payload["files"]] == ["models/a.sql", "models/a.yml"]
+    assert payload["files"][1]["patch"] is None
+    assert len(requester.calls) == 3
+
+    assert cache.get(7) == (etag, payload)
+    assert len(requester.calls) == 4
+    assert cache.stats["not_modified"] == 1
+
+    # Metadata changed but the head did not: no need to page through the files
+    requester.pull_etag = '"p2"'
+    assert cache.get(7)[0] == etag
+    assert len(requester.calls) == 5
+
+
+def test_new_head_refetches_files():
+    cache, requester = make_cache()
+    etag, _ = cache.get(7)
+    requester.head, requester.pull_etag = "h2", '"p2"'
+    new_etag, payload = cache.get(7)
+    assert new_etag != etag and payload["head_sha"] == "h2"
+    assert cache.stats["refreshes"] == 2
+
+
+def test_missing_pr_raises():
+    cache, _ = make_cache()
+    with pytest.raises(GithubException):
+        cache.get(8)
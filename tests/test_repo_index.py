@@ -0,0 +1,59 @@
+# tests/test_repo_index.py
+from types import SimpleNamespace
+from ai_dbt_bot.repo_index import RepoTreeIndex
+
+
+class FakeRepo:
+    def __init__(self, paths):
+        self.head = "c1"
+        self.paths = paths
+        self.tree_calls = 0
+
+    def get_git_ref(self, ref):
+        return SimpleNamespace(object=SimpleNamespace(sha=self.head))
+
+    def get_git_tree(self, sha, recursive=False):
+        self.tree_calls += 1
+        items = [SimpleNamespace(path=p, type="blob") for p in self.paths]
+        items.append(SimpleNamespace(path="models", type="tree"))
+        return SimpleNamespace(sha=f"tree-{sha}", tree=items)
+
+
+def test_tree_fetched_once_per_head():
+    repo = FakeRepo(["models/a.sql", "models/a.yml", "models/b.yaml", "macros/m.sql"])
+    index = RepoTreeIndex(repo, "main")
+
+    assert index.paths(".sql") == ["models/a.sql"]
+    assert sorted(index.paths(".yml", ".yaml")) == ["models/a.yml", "models/b.yaml"]
+    assert sorted(index.paths(".sql", under_prefix=False)) == ["macros/m.sql", "models/a.sql"]
+    assert repo.tree_calls == 1
+    assert index.stats["misses"] == 1 and index.stats["hits"] == 2
+
+    repo.head = "c2"
+    repo.paths.append("models/c.sql")
+    assert sorted(index.paths(".sql")) == ["models/a.sql", "models/c.sql"]
+    assert repo.tree_calls == 2
+    assert index.tree_sha == "tree-c2"
+
+
+def test_check_interval_skips_head_lookup():
+    repo = FakeRepo(["models/a.sql"])
+    index = RepoTreeIndex(repo, "main", check_interval=60)
+    index.paths(".sql")
+    index.paths(".sql")
+    assert index.stats["head_checks"] == 1
+
+    index.invalidate()
+    index.paths(".sql")
+    assert index.stats["head_checks"] == 2
+
+
+def test_resolver_rebuilt_only_when_tree_changes():
+    repo = FakeRepo(["models/a.sql", "models/b.yml"])
+    index = RepoTreeIndex(repo, "main")
+    first = index.resolver(".sql")
+    assert index.resolver(".sql") is first
+    assert first.resolve("a.sql") == ["models/a.sql"]
+
+    repo.head = "c2"
+    assert index.resolver(".sql") is not first
@@ -0,0 +1,77 @@
+# tests/test_session_store.py
+import sqlite3
+import time
+import pytest
+from ai_dbt_bot.session_store import MemorySessionStore, SQLiteSessionStore, SessionStore, open_session_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemorySessionStore(**kwargs)
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"), **kwargs)
+    return make
+
+
+def test_put_get_pop(make_store):
+    store = make_store()
+    store.put("s1", {"branch": "api/abc", "pr_number": 12, "prompt": "add col"})
+    assert store.get("s1") == {"branch": "api/abc", "pr_number": 12, "prompt": "add col"}
+    assert "s1" in store
+    assert store.find_by_pr(12)[0] == "s1"
+    assert store.find_by_branch("api/abc")[0] == "s1"
+    assert store.pop("s1")["pr_number"] == 12
+    assert store.get("s1") is None and store.find_by_pr(12) is None
+
+
+def test_expired_sessions_are_evicted(make_store):
+    store = make_store(ttl=0.05)
+    store.put("old", {"branch": "api/old", "pr_number": 1, "prompt": "p"})
+    time.sleep(0.1)
+    assert store.get("old") is None
+    store.put("new", {"branch": "api/new", "pr_number": 2, "prompt": "p"})
+    assert store.evict() == 0
+    assert store.get("new") is not None
+
+
+def test_max_sessions_drops_least_recent(make_store):
+    store = make_store(max_sessions=2)
+    for i in range(3):
+        store.put(f"s{i}", {"branch": f"api/{i}", "pr_number": i, "prompt": "p"})
+        time.sleep(0.01)
+    assert store.get("s0") is None
+    assert store.get("s1") and store.get("s2")
+
+
+def test_sqlite_store_shared_between_instances(tmp_path):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    open_session_store(url).put("s1", {"branch": "api/abc", "pr_number": 3, "prompt": "p"})
+    assert open_session_store(url).get("s1")["branch"] == "api/abc"
+
+
+def test_sqlite_store_keeps_pr_url_and_migrates_old_databases(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, branch TEXT NOT NULL, pr_number INTEGER, "
+        "prompt TEXT, updated_at REAL NOT NULL, expires_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO sessions VALUES ('old', 'api/old', 1, 'p', 0, 1e12)")
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(path)
+    assert "pr_url" not in store.get("old")
+    store.put("s1", {"branch": "api/abc", "pr_number": 2, "pr_url": "https://x/pull/2", "prompt": "p"})
+    assert store.get("s1")["pr_url"] == "https://x/pull/2"
+    assert store.find_by_pr(2)[1]["pr_url"] == "https://x/pull/2"
+
+
+def test_incomplete_backend_fails_on_construction():
+    class GetOnly(SessionStore):
+        def get(self, session_id):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        GetOnly()
@@ -0,0 +1,48 @@
+# tests/test_sql_formatter.py
+import os
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from ai_dbt_bot.sql_formatter import SqlFormatter
+
+pytest.importorskip("sqlfluff")
+
+
+def test_fix_is_cached_by_content():
+    formatter = SqlFormatter(workers=0)
+    first = formatter.fix("SELECT a,b from t\n", "models/t.sql")
+    assert first == "SELECT\n    a,\n    b\nFROM t\n"
+    assert formatter.fix("SELECT a,b from t\n", "models/other.sql") == first
+    assert formatter.stats == {"hits": 1, "misses": 1, "failures": 0}
+
+
+def test_unparsable_sql_is_returned_unchanged():
+    formatter = SqlFormatter(workers=0)
+    assert formatter.fix("selec id from where\n", "models/bad.sql") == "selec id from where\n"
+    assert formatter.stats["failures"] == 1
+    formatter.fix("selec id from where\n", "models/bad.sql")
+    assert formatter.stats["hits"] == 1
+
+
+def test_fix_many_in_worker_processes_keeps_order():
+    formatter = SqlFormatter(workers=2)
+    try:
+        fixed = formatter.fix_many([
+            ("select b from u\n", "models/u.sql"),
+            ("SELECT a,b from t\n", "models/t.sql"),
+        ])
+    finally:
+        formatter.shutdown()
+    assert fixed == ["select b from u\n", "SELECT\n    a,\n    b\nFROM t\n"]
+
+
+def test_broken_pool_is_rebuilt():
+    formatter = SqlFormatter(workers=1)
+    try:
+        broken = formatter._get_pool()
+        # A worker that dies (e.g. killed for memory) breaks the whole pool
+        with pytest.raises(BrokenProcessPool):
+            broken.submit(os._exit, 1).result()
+        assert formatter.fix("SELECT a,b from t\n", "models/t.sql") == "SELECT\n    a,\n    b\nFROM t\n"
+        assert formatter._pool is not broken and formatter.stats["failures"] == 0
+    finally:
+        formatter.shutdown()
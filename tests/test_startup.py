@@ -0,0 +1,35 @@
+# tests/test_startup.py
+import threading
+from ai_dbt_bot.startup import lazy, WarmUp
+
+
+def test_lazy_builds_once_across_threads():
+    calls = []
+    get = lazy(lambda: calls.append(1) or object())
+    assert not get.built()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and len({id(r) for r in results}) == 1
+    assert get.built()
+
+
+def test_warm_up_records_failures_and_continues():
+    done = []
+
+    def broken():
+        raise EnvironmentError("GITHUB_TOKEN missing")
+
+    warm_up = WarmUp({"github": broken, "sqlfluff": lambda: done.append("sqlfluff")})
+    assert warm_up.status()["state"] == "pending"
+    warm_up.start().join()
+    warm_up.run()   # a second run is a no-op
+
+    status = warm_up.status()
+    assert status["state"] == "done" and done == ["sqlfluff"]
+    assert status["steps"]["github"]["error"] == "GITHUB_TOKEN missing"
+    assert "error" not in status["steps"]["sqlfluff"]
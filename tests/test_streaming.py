@@ -0,0 +1,89 @@
+# tests/test_streaming.py
+import asyncio
+import json
+import threading
+import httpx
+from fastapi.testclient import TestClient
+from ai_dbt_bot import translator_service
+from ai_dbt_bot.streaming import Broadcaster, EventStream, format_sse
+
+
+def test_format_sse():
+    assert format_sse("stage", {"name": "commit"}) == 'event: stage\ndata: {"name": "commit"}\n\n'
+    assert format_sse("token", "a\nb") == "event: token\ndata: a\ndata: b\n\n"
+
+
+def test_events_from_worker_thread_until_done():
+    async def run():
+        stream = EventStream()
+
+        def worker():
+            stream.emit("stage", {"name": "generate"})
+            stream.emit("token", {"file": "models/a.sql", "text": "select"})
+            stream.emit("done", {"status": "succeeded"})
+
+        threading.Thread(target=worker).start()
+        return [chunk async for chunk in stream.events()]
+
+    chunks = asyncio.run(run())
+    assert [c.split("\n")[0] for c in chunks] == ["event: stage", "event: token", "event: done"]
+
+
+def test_closing_early_calls_on_close():
+    closed = []
+
+    async def run():
+        stream = EventStream(on_close=lambda: closed.append(True))
+        stream.emit("stage", {"name": "generate"})
+        events = stream.events()
+        await events.__anext__()
+        await events.aclose()
+        return stream
+
+    stream = asyncio.run(run())
+    assert closed == [True] and stream.closed
+
+
+def test_translator_stream_relays_pr_bot_events(monkeypatch):
+    def openai_handler(request):
+        assert json.loads(request.read())["stream"] is True
+        chunks = ['{"files": ["d_customers.sql"], ', '"prompt": "add dob"}']
+        body = "".join(
+            "data: " + json.dumps({"choices": [{"delta": {"content": c}}]}) + "\n\n" for c in chunks
+        ) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=body)
+
+    forwarded = {}
+    def tech_handler(request):
+        forwarded.update(url=str(request.url), body=json.loads(request.read()))
+        return httpx.Response(200, text=format_sse("done", {"status": "succeeded"}))
+
+    monkeypatch.setattr(translator_service, "TECH_URL", "http://prbot/requests")
+    with TestClient(translator_service.app) as client:
+        translator_service.clients["openai"] = httpx.AsyncClient(
+            base_url="http://openai/v1", transport=httpx.MockTransport(openai_handler))
+        translator_service.clients["tech"] = httpx.AsyncClient(transport=httpx.MockTransport(tech_handler))
+        resp = client.post("/translate-and-forward/stream", json={"prompt": "Add dob"})
+
+    events = [line[len("event: "):] for line in resp.text.splitlines() if line.startswith("event: ")]
+    assert events == ["stage", "token", "token", "translated", "stage", "done"]
+    assert forwarded["url"] == "http://prbot/requests/stream"
+    assert forwarded["body"]["file_names"] == ["d_customers.sql"]
+
+
+def test_broadcaster_filters_and_forgets_closed_clients():
+    async def run():
+        broadcaster = Broadcaster()
+        broadcaster.subscribe()
+        only_seven = broadcaster.subscribe(lambda event, data: data.get("pr_number") == 7)
+        assert broadcaster.publish("pull_request", {"pr_number": 8}) == 1
+        assert broadcaster.publish("pull_request", {"pr_number": 7}) == 2
+
+        events = only_seven.events()
+        first = await events.__anext__()
+        await events.aclose()
+        assert len(broadcaster) == 1
+        return first
+
+    first = asyncio.run(run())
+    assert first == format_sse("pull_request", {"pr_number": 7})
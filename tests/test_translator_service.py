@@ -0,0 +1,94 @@
+# tests/test_translator_service.py
+import json
+import sys
+import types
+import httpx
+from fastapi.testclient import TestClient
+from ai_dbt_bot import translator_service
+from ai_dbt_bot.metrics import STAGE_SECONDS
+
+
+def openai_reply(request):
+    content = json.dumps({"files": ["models/d_customers.sql"], "prompt": "Add dob column"})
+    return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+
+def run(tech_handler, monkeypatch):
+    monkeypatch.setattr(translator_service, "TECH_URL", "http://prbot/requests")
+    monkeypatch.setattr(translator_service, "RETRY_BACKOFF_SECONDS", 0)
+    with TestClient(translator_service.app) as client:
+        translator_service.clients["openai"] = httpx.AsyncClient(
+            base_url="http://openai/v1", transport=httpx.MockTransport(openai_reply))
+        translator_service.clients["tech"] = httpx.AsyncClient(transport=httpx.MockTransport(tech_handler))
+        return client.post("/translate-and-forward", json={"prompt": "Add a dob KPI"})
+
+
+def test_forward_retries_busy_pr_bot(monkeypatch):
+    attempts = []
+
+    def tech(request):
+        attempts.append(json.loads(request.read()))
+        if len(attempts) == 1:
+            return httpx.Response(503)
+        return httpx.Response(202, json={"job_id": "j1", "session_id": "s1"})
+
+    resp = run(tech, monkeypatch)
+    assert resp.status_code == 200
+    assert resp.json() == {"job_id": "j1", "session_id": "s1"}
+    assert len(attempts) == 2
+    assert attempts[0]["file_names"] == ["models/d_customers.sql"]
+
+
+def test_forward_does_not_retry_client_errors(monkeypatch):
+    attempts = []
+
+    def tech(request):
+        attempts.append(1)
+        return httpx.Response(400, text="bad request")
+
+    resp = run(tech, monkeypatch)
+    assert resp.status_code == 400
+    assert len(attempts) == 1
+
+
+def test_inprocess_mode_skips_http(monkeypatch):
+    async def handle_request(req):
+        return {"job_id": "local", "session_id": req.session_id}
+
+    class Request:
+        def __init__(self, **body):
+            self.session_id = body["session_id"]
+
+    fake_main = types.SimpleNamespace(handle_request=handle_request, Request=Request)
+    monkeypatch.setitem(sys.modules, "ai_dbt_bot.main", fake_main)
+    monkeypatch.setattr(sys.modules["ai_dbt_bot"], "main", fake_main, raising=False)
+    monkeypatch.setattr(translator_service, "FORWARD_MODE", "inprocess")
+
+    forwards = dict(STAGE_SECONDS._series).get(("forward",), [None, 0.0, 0])[2]
+    resp = run(lambda request: httpx.Response(500), monkeypatch)
+    assert resp.json() == {"job_id": "local", "session_id": None}
+    # The in-process hop is timed like the HTTP one
+    assert STAGE_SECONDS._series[("forward",)][2] == forwards + 1
+
+
+def test_forward_continues_the_callers_trace(monkeypatch):
+    seen = []
+
+    def tech(request):
+        seen.append(request.headers.get("traceparent"))
+        return httpx.Response(202, json={"job_id": "j1", "session_id": "s1"})
+
+    monkeypatch.setattr(translator_service, "TECH_URL", "http://prbot/requests")
+    with TestClient(translator_service.app) as client:
+        translator_service.clients["openai"] = httpx.AsyncClient(
+            base_url="http://openai/v1", transport=httpx.MockTransport(openai_reply))
+        translator_service.clients["tech"] = httpx.AsyncClient(transport=httpx.MockTransport(tech))
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        resp = client.post("/translate-and-forward", json={"prompt": "Add a dob KPI"},
+                           headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+        metrics = client.get("/metrics")
+    assert resp.status_code == 200
+    assert seen[0].startswith(f"00-{trace_id}-") and "00f067aa0ba902b7" not in seen[0]
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'ai_dbt_bot_stage_seconds_count{stage="forward"}' in metrics.text
+    assert 'ai_dbt_bot_stage_seconds_count{stage="translate"}' in metrics.text
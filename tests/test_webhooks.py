@@ -0,0 +1,93 @@
+# tests/test_webhooks.py
+import json
+from concurrent.futures import ThreadPoolExecutor
+from ai_dbt_bot.session_store import MemorySessionStore
+from ai_dbt_bot.webhooks import WebhookProcessor, sign, verify_signature
+from ai_dbt_bot.webhook_replay import load_delivery
+
+
+class Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def invalidate(self, *args):
+        self.calls.append(args)
+
+    def publish(self, event, data):
+        self.calls.append((event, data))
+
+
+def make_processor():
+    store = MemorySessionStore()
+    store.put("s1", {"branch": "api/abc123", "pr_number": 7, "prompt": "add column"})
+    tree, previews, broadcaster = Recorder(), Recorder(), Recorder()
+    processor = WebhookProcessor(store, tree, previews, broadcaster, default_branch="main")
+    return processor, store, tree, previews, broadcaster
+
+
+def pull_request(action, number=7, merged=False):
+    return {
+        "action": action,
+        "pull_request": {"number": number, "head": {"sha": "h2"}, "state": "closed" if action == "closed" else "open",
+                         "merged": merged, "draft": True, "html_url": f"https://github.com/acme/dbt/pull/{number}"},
+    }
+
+
+def test_signature():
+    body = b'{"zen": "Keep it logically awesome."}'
+    assert verify_signature("s3cret", body, sign("s3cret", body))
+    assert not verify_signature("s3cret", body, sign("other", body))
+    assert not verify_signature("s3cret", body, None)
+    assert not verify_signature("", body, sign("", body))
+
+
+def test_closed_pr_ends_session_and_notifies():
+    processor, store, _, previews, broadcaster = make_processor()
+    processor.handle("pull_request", pull_request("synchronize"))
+    assert "s1" in store
+    assert previews.calls == [(7,)]
+
+    summary = processor.handle("pull_request", pull_request("closed", merged=True), delivery="d1")
+    assert summary["session_closed"] == "s1" and "s1" not in store
+    assert broadcaster.calls[-1] == ("pull_request", {
+        "action": "closed", "pr_number": 7, "head_sha": "h2", "state": "merged",
+        "draft": True, "url": "https://github.com/acme/dbt/pull/7",
+    })
+
+    # Redelivery of the same event is ignored
+    assert processor.handle("pull_request", pull_request("closed"), delivery="d1")["duplicate"]
+    assert len(previews.calls) == 2
+
+
+def test_push_to_default_branch_invalidates_tree():
+    processor, store, tree, _, broadcaster = make_processor()
+    assert processor.handle("push", {"ref": "refs/heads/main", "after": "c2"})["tree_invalidated"]
+    assert tree.calls == [()]
+
+    summary = processor.handle("push", {"ref": "refs/heads/api/abc123", "after": "0" * 40, "deleted": True})
+    assert summary["pr_number"] == 7 and "s1" not in store
+    assert tree.calls == [()]
+    assert broadcaster.calls[-1][1]["pr_number"] == 7
+
+    assert processor.handle("push", {"ref": "refs/tags/v1"})["ignored"]
+    assert processor.handle("issues", {})["ignored"]
+
+
+def test_load_recorded_delivery(tmp_path):
+    recorded = tmp_path / "closed.json"
+    recorded.write_text(json.dumps({"event": "pull_request", "delivery": "d9", "payload": pull_request("closed")}))
+    assert load_delivery(str(recorded)) == ("pull_request", "d9", pull_request("closed"))
+
+    bare = tmp_path / "push.json"
+    bare.write_text(json.dumps({"ref": "refs/heads/main"}))
+    event, _, payload = load_delivery(str(bare), event="push")
+    assert event == "push" and payload == {"ref": "refs/heads/main"}
+
+
+def test_concurrent_redeliveries_are_applied_once():
+    processor, _, _, previews, _ = make_processor()
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: processor.handle("pull_request", pull_request("synchronize"), "d1"), range(32)))
+    assert sum(not r.get("duplicate") for r in results) == 1
+    assert previews.calls == [(7,)]
+    assert processor.stats == {"received": 1, "ignored": 0, "duplicates": 31}